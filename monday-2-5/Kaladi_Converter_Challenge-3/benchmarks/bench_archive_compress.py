@@ -0,0 +1,98 @@
+"""Serial vs block-parallel compression in ArchiveConverter.
+
+Run from the project root:
+
+    python benchmarks/bench_archive_compress.py [--size-mb 1024] [--workers N] [--formats zip,gz,bz2]
+
+Builds a tar of a mixed-content tree (log-like text, CSV, already-compressed
+random data and sparse binaries) in a temp directory, then converts it with
+one worker and with --workers workers at each compression level. Timings
+and member counts come from the converter's ProgressReporter.
+"""
+import argparse
+import io
+import os
+import sys
+import tarfile
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from converters.archive_converter import COMPRESSION_LEVELS, ArchiveConverter
+from converters.progress import ProgressReporter
+
+def make_tree_tar(path, size_bytes, seed=0):
+    """Write a tar of mixed files totalling about `size_bytes`."""
+    rng = np.random.default_rng(seed)
+    words = [b"GET", b"POST", b"/api/v1/items", b"200", b"404", b"user", b"session", b"latency_ms", b"ok", b"error"]
+    written = 0
+    index = 0
+    with tarfile.open(path, 'w') as tar:
+        while written < size_bytes:
+            kind = index % 4
+            file_size = int(min(rng.integers(256 * 1024, 8 * 1024 * 1024), size_bytes - written)) or 1
+            if kind == 0:
+                # Log-like text
+                picks = rng.integers(0, len(words), file_size // 6 + 1)
+                data = b" ".join(words[i] for i in picks)[:file_size]
+            elif kind == 1:
+                # Numeric CSV
+                rows = rng.normal(size=(file_size // 40 + 1, 3))
+                data = "\n".join(f"{a:.5f},{b:.5f},{c:.5f}" for a, b, c in rows).encode()[:file_size]
+            elif kind == 2:
+                # Incompressible, like media or existing archives
+                data = rng.bytes(file_size)
+            else:
+                # Mostly zeros with some noise, like sparse binaries
+                array = np.zeros(file_size, dtype=np.uint8)
+                array[rng.integers(0, file_size, file_size // 50)] = rng.integers(0, 255, file_size // 50, dtype=np.uint8)
+                data = array.tobytes()
+            info = tarfile.TarInfo(f"tree/dir{index % 16:02d}/file{index:05d}.dat")
+            info.size = len(data)
+            tar.addfile(info, io.BytesIO(data))
+            written += len(data)
+            index += 1
+    return index
+
+def timed_convert(input_path, output_format, level, workers, output_path):
+    """Return the reporter's stats for one conversion plus the output size."""
+    with open(input_path, 'rb') as reader, open(output_path, 'wb') as writer:
+        reporter = ProgressReporter()
+        ArchiveConverter().convert_stream(reader, writer, output_format, compression_level=level, workers=workers,
+                                          progress=reporter)
+        reporter.finish()
+        return reporter.stats(), writer.tell()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size-mb", type=int, default=1024, help="size of the generated tree")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="workers for the parallel runs")
+    parser.add_argument("--formats", default="zip,gz,bz2", help="comma-separated output formats")
+    parser.add_argument("--levels", default="Fast,Normal,Maximum", help="comma-separated compression levels")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        input_path = os.path.join(work_dir, "tree.tar")
+        start = time.perf_counter()
+        file_count = make_tree_tar(input_path, args.size_mb * 1024 * 1024)
+        input_size = os.path.getsize(input_path)
+        print(f"{file_count} files, {input_size / 1e6:.0f} MB tar ({time.perf_counter() - start:.1f}s to build), "
+              f"{args.workers} workers on {os.cpu_count()} CPUs")
+
+        print(f"{'output':<8}{'level':<9}{'level#':>7}{'1 worker (s)':>14}{'parallel (s)':>14}"
+              f"{'speedup':>9}{'MB/s':>8}{'files/s':>9}{'ratio':>7}")
+        for output_format in args.formats.split(','):
+            for level in args.levels.split(','):
+                output_path = os.path.join(work_dir, f"out.{output_format}")
+                serial, _ = timed_convert(input_path, output_format, level, 1, output_path)
+                parallel, output_size = timed_convert(input_path, output_format, level, args.workers, output_path)
+                print(f"{output_format:<8}{level:<9}{COMPRESSION_LEVELS[level]:>7}{serial['elapsed']:>14.2f}"
+                      f"{parallel['elapsed']:>14.2f}{serial['elapsed'] / parallel['elapsed']:>8.1f}x"
+                      f"{parallel['uncompressed_bytes'] / 1e6 / parallel['elapsed']:>8.0f}"
+                      f"{parallel['done'] / parallel['elapsed']:>9.0f}{output_size / input_size:>7.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""Per-file latency of AudioConverter before and after the in-memory pipeline.
+
+Run from the project root:
+
+    python benchmarks/bench_audio.py [--seconds 30] [--repeat 3]
+
+"Before" replays the old temp-file pipeline (write upload to disk, sf.read
+from the path, sf.write to a path, sleep, read back); "after" is the current
+AudioConverter.convert_stream working on in-memory buffers.
+"""
+import argparse
+import io
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+import soundfile as sf
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from converters.audio_converter import AudioConverter
+
+def make_fixture(input_format, seconds, sample_rate=44100):
+    """Return an in-memory stereo test tone in the given format."""
+    t = np.arange(int(seconds * sample_rate)) / sample_rate
+    tone = 0.2 * np.sin(2 * np.pi * 440 * t)
+    data = np.stack([tone, np.roll(tone, 100)], axis=1)
+    buffer = io.BytesIO()
+    sf.write(buffer, data, sample_rate, format=input_format.upper())
+    buffer.name = f"fixture.{input_format}"
+    return buffer
+
+def legacy_convert(input_file, output_format, sample_rate=44100):
+    """The temp-file pipeline AudioConverter used before, minus the Streamlit logging."""
+    temp_dir = tempfile.mkdtemp()
+    temp_input_path = os.path.join(temp_dir, f"input.{input_file.name.split('.')[-1]}")
+    temp_output_path = os.path.join(temp_dir, f"output.{output_format}")
+    try:
+        with open(temp_input_path, 'wb') as f:
+            f.write(input_file.getvalue())
+        data, input_samplerate = sf.read(temp_input_path)
+        if input_samplerate != sample_rate:
+            from scipy import signal
+            data = signal.resample(data, round(len(data) * float(sample_rate) / input_samplerate))
+        sf.write(temp_output_path, data, sample_rate)
+        time.sleep(1)
+        with open(temp_output_path, 'rb') as f:
+            return f.read()
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+def current_convert(input_file, output_format, sample_rate=44100):
+    writer = io.BytesIO()
+    AudioConverter().convert_stream(input_file, writer, output_format, sample_rate=sample_rate)
+    return writer.getvalue()
+
+def best_of(func, input_file, output_format, repeat):
+    timings = []
+    for _ in range(repeat):
+        input_file.seek(0)
+        start = time.perf_counter()
+        func(input_file, output_format)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--seconds", type=float, default=30, help="length of each fixture")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per case; the best is reported")
+    args = parser.parse_args()
+
+    print(f"{'conversion':<14}{'before (s)':>12}{'after (s)':>12}{'speedup':>10}")
+    for input_format, output_format in [('wav', 'flac'), ('flac', 'wav'), ('wav', 'wav'), ('flac', 'flac')]:
+        fixture = make_fixture(input_format, args.seconds)
+        before = best_of(legacy_convert, fixture, output_format, args.repeat)
+        after = best_of(current_convert, fixture, output_format, args.repeat)
+        print(f"{input_format + '->' + output_format:<14}{before:>12.3f}{after:>12.3f}{before / after:>9.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""Credit round trips per click, and correctness under concurrent spending, offline.
+
+Run from the project root:
+
+    python benchmarks/bench_credit_ledger.py [--rtt-ms 40] [--clicks 20] [--threads 8]
+
+Uses the SQLite stand-in backend behind a simulated network round trip.
+"before" replays what CreditManager used to do for one click: two balance
+reads while rendering the page, then use_credit's read and unconditional
+update. "after" is the same click through CreditLedger. The concurrency
+test has several sessions spend one credit each at the same time and
+checks that the balance went down by exactly the credits handed out.
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from converters.credit_ledger import BalanceCache, CreditLedger, SQLiteBackend
+
+FREE_LIMIT = 5
+
+class RemoteBackend:
+    """A backend with a network round trip added to every call, counting the calls."""
+
+    def __init__(self, backend, rtt):
+        self.backend = backend
+        self.rtt = rtt
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def _round_trip(self):
+        with self._lock:
+            self.calls += 1
+        time.sleep(self.rtt)
+
+    def fetch(self, user_id):
+        self._round_trip()
+        return self.backend.fetch(user_id)
+
+    def insert(self, row):
+        self._round_trip()
+        return self.backend.insert(row)
+
+    def compare_and_set(self, user_id, expected, values, privileged=False):
+        self._round_trip()
+        return self.backend.compare_and_set(user_id, expected, values, privileged)
+
+def legacy_click(backend, user_id):
+    """The old flow: read twice to render, then read-modify-write without a condition."""
+    backend.fetch(user_id)
+    backend.fetch(user_id)
+    row = backend.fetch(user_id)
+    if row['free_credits_used'] < FREE_LIMIT:
+        values = {"free_credits_used": row['free_credits_used'] + 1}
+    elif row['paid_credits'] > 0:
+        values = {"paid_credits": row['paid_credits'] - 1}
+    else:
+        raise ValueError("No credits left")
+    backend.compare_and_set(user_id, {}, values)
+
+def ledger_click(ledger, user_id):
+    ledger.balance(user_id)
+    ledger.balance(user_id)
+    ledger.reserve(user_id, None, 1)
+
+def fresh_backend(rtt, paid_credits):
+    backend = SQLiteBackend()
+    backend.insert({"id": "user", "email": None, "free_credits_used": 0, "paid_credits": paid_credits})
+    return RemoteBackend(backend, rtt)
+
+def spent(backend):
+    row = backend.backend.fetch("user")
+    return row['free_credits_used'] + (1000 - row['paid_credits'])
+
+def sequential(rtt, clicks):
+    print(f"{'flow':<8}{'ms/click':>10}{'round trips/click':>19}")
+    for label, make_click in [
+        ("before", lambda backend: lambda: legacy_click(backend, "user")),
+        ("after", lambda backend: (lambda ledger: lambda: ledger_click(ledger, "user"))(
+            CreditLedger(backend, FREE_LIMIT, cache=BalanceCache()))),
+    ]:
+        backend = fresh_backend(rtt, 1000)
+        click = make_click(backend)
+        started = time.perf_counter()
+        for _ in range(clicks):
+            click()
+        elapsed = time.perf_counter() - started
+        print(f"{label:<8}{elapsed / clicks * 1000:>10.1f}{backend.calls / clicks:>19.1f}")
+
+def concurrent(rtt, threads):
+    print(f"\n{threads} sessions spending one credit each at once:")
+    for label, click_for in [
+        ("before", lambda backend: lambda: legacy_click(backend, "user")),
+        # Separate caches: each session stands for a different app process
+        ("after", lambda backend: lambda: ledger_click(CreditLedger(backend, FREE_LIMIT, cache=BalanceCache()),
+                                                       "user")),
+    ]:
+        backend = fresh_backend(rtt, 1000)
+        errors = []
+
+        def session(click=click_for(backend)):
+            try:
+                click()
+            except Exception as e:
+                errors.append(e)
+
+        workers = [threading.Thread(target=session) for _ in range(threads)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        charged = spent(backend)
+        served = threads - len(errors)
+        verdict = "ok" if charged == served else f"LOST {served - charged} updates"
+        print(f"{label:<8}served {served}, charged {charged}, {backend.calls} round trips: {verdict}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rtt-ms", type=float, default=40, help="simulated round trip to the database")
+    parser.add_argument("--clicks", type=int, default=20)
+    parser.add_argument("--threads", type=int, default=8, help="concurrent sessions in the race test")
+    args = parser.parse_args()
+
+    sequential(args.rtt_ms / 1000, args.clicks)
+    concurrent(args.rtt_ms / 1000, args.threads)
+
+if __name__ == "__main__":
+    main()
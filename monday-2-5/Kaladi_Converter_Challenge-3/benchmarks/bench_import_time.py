@@ -0,0 +1,85 @@
+"""Import cost of each converter module on top of Streamlit.
+
+Run from the project root:
+
+    python benchmarks/bench_import_time.py [--repeat 5] [--budget-ms 100]
+
+Each module is imported in a fresh interpreter under `python -X importtime`
+after `import streamlit`, which every page loads anyway, so the figure is
+what the converter adds to a page's cold start. Exits non-zero if a module
+goes over the budget or loads one of the heavy backends at import time, so
+eager imports cannot creep back unnoticed.
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MODULES = [
+    "converters.base_converter",
+    "converters.archive_converter",
+    "converters.audio_converter",
+    "converters.document_converter",
+    "converters.image_converter",
+    "converters.spreadsheet_converter",
+    "converters.video_converter",
+]
+
+# Backends that must only load on first use of a format pair
+HEAVY_BACKENDS = {
+    "moviepy", "imageio", "proglog", "skimage", "scipy", "svglib", "reportlab", "pdf2image", "docx", "PyPDF2",
+    "docx2pdf", "comtypes", "pythoncom", "pandas", "openpyxl", "pyarrow", "py7zr", "soundfile", "numpy",
+}
+
+IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+def import_profile(module):
+    """Return (cumulative microseconds, [(microseconds, name), ...] loaded) for importing `module`."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import streamlit; import {module}"],
+        cwd=ROOT, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"importing {module} failed:\n{result.stderr[-2000:]}")
+
+    entries = []
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            entries.append((int(match.group(2)), len(match.group(3)), match.group(4)))
+    # Modules are listed as they finish, so streamlit's own tree ends with its top-level line
+    first = next(i for i, (_, depth, name) in enumerate(entries) if depth == 1 and name == "streamlit") + 1
+    loaded = entries[first:]
+    total = sum(cumulative for cumulative, depth, _ in loaded if depth == 1)
+    return total, [(cumulative, name) for cumulative, _, name in loaded]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5, help="runs per module; the fastest is reported")
+    parser.add_argument("--budget-ms", type=float, default=100, help="largest import cost allowed per module")
+    args = parser.parse_args()
+
+    failures = []
+    print(f"{'module':<36}{'import (ms)':>12}  slowest imports")
+    for module in MODULES:
+        runs = [import_profile(module) for _ in range(args.repeat)]
+        total, loaded = min(runs, key=lambda run: run[0])
+        slowest = sorted((entry for entry in loaded if entry[1] != module), reverse=True)[:3]
+        print(f"{module:<36}{total / 1000:>12.1f}  "
+              + ", ".join(f"{name} {cumulative / 1000:.0f}ms" for cumulative, name in slowest))
+
+        heavy = sorted({name.split('.')[0] for _, name in loaded} & HEAVY_BACKENDS)
+        if heavy:
+            failures.append(f"{module} imports {', '.join(heavy)} at module level")
+        if total / 1000 > args.budget_ms:
+            failures.append(f"{module} takes {total / 1000:.0f}ms to import (budget {args.budget_ms:.0f}ms)")
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""Background-removal latency for a 12 MP photo on CPU.
+
+Run from the project root (the models are downloaded to ~/.u2net on first use):
+
+    python benchmarks/bench_rembg.py [--models u2netp silueta u2net] [--threads 0] [--repeat 3]
+
+For each model:
+  before   - what main.py did: rembg.remove() with a new session per call
+  session  - the cached session from get_session(), inference at full size
+  after    - remove_background(): cached session, downscaled to MAX_SIDE,
+             mask scaled back up
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from converters.background_remover import MAX_SIDE, MODELS, get_session, remove_background
+
+def make_photo(width=4000, height=3000):
+    """A 12 MP stand-in for a product photo: a noisy gradient with a round subject."""
+    rng = np.random.default_rng(0)
+    y, x = np.mgrid[0:height, 0:width]
+    background = np.stack([x * 200 // width, y * 200 // height, np.full_like(x, 180)], axis=-1)
+    subject = ((x - width / 2) / (width / 4)) ** 2 + ((y - height / 2) / (height / 3)) ** 2 < 1
+    pixels = np.where(subject[..., None], [200, 40, 30], background)
+    pixels = pixels + rng.integers(-12, 12, pixels.shape)
+    return Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8))
+
+def timed(function, repeat):
+    runs = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        runs.append(time.perf_counter() - started)
+    return statistics.median(runs)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--models", nargs="+", default=list(MODELS), choices=list(MODELS))
+    parser.add_argument("--threads", type=int, default=0, help="onnxruntime intra-op threads; 0 = all cores")
+    parser.add_argument("--max-side", type=int, default=MAX_SIDE)
+    parser.add_argument("--repeat", type=int, default=3, help="runs per case; the median is reported")
+    args = parser.parse_args()
+
+    from rembg import new_session, remove
+
+    photo = make_photo()
+    print(f"{photo.size[0]}x{photo.size[1]} photo, {os.cpu_count()} CPUs, threads={args.threads or 'auto'}")
+    print(f"{'model':<10}{'before (s)':>12}{'session (s)':>13}{'after (s)':>11}{'speed-up':>10}")
+    for model in args.models:
+        # Loads the model outside the timings, including the download on a first run
+        get_session(model, args.threads)
+        before = timed(lambda: remove(photo, session=new_session(model)), args.repeat)
+        cached = timed(lambda: remove_background(photo, model, 0, args.threads), args.repeat)
+        after = timed(lambda: remove_background(photo, model, args.max_side, args.threads), args.repeat)
+        print(f"{model:<10}{before:>12.2f}{cached:>13.2f}{after:>11.2f}{before / after:>9.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""Bitmap-to-SVG tracing speed on a synthetic scan.
+
+Run from the project root:
+
+    python benchmarks/bench_svg_trace.py [--size 4000]
+
+Compares the old per-point string-concatenation path emitter with the
+vectorized ImageConverter._bitmap_to_svg, then shows the effect of the
+downscale-before-trace and simplification options.
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+from PIL import Image, ImageDraw
+from skimage import measure
+from skimage.filters import threshold_otsu
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from converters.image_converter import ImageConverter
+
+def make_scan(size, seed=0):
+    """Dark shapes and speckle noise on a light page, like a scanned drawing."""
+    rng = np.random.default_rng(seed)
+    image = Image.new('L', (size, size), 235)
+    draw = ImageDraw.Draw(image)
+    for _ in range(size * 2):
+        x, y = rng.integers(0, size, 2)
+        w, h = rng.integers(2, size // 80, 2)
+        if rng.random() < 0.5:
+            draw.ellipse([x, y, x + w, y + h], fill=30)
+        else:
+            draw.rectangle([x, y, x + w, y + h], fill=30)
+    noise = rng.normal(0, 12, (size, size))
+    return Image.fromarray(np.clip(np.asarray(image) + noise, 0, 255).astype(np.uint8))
+
+def legacy_bitmap_to_svg(image, simplify_tolerance=2.0):
+    """The previous tracer: per-point f-string concatenation for every path."""
+    if image.mode != 'L':
+        image = image.convert('L')
+    data = np.array(image)
+    binary = data > threshold_otsu(data)
+    svg_paths = []
+    for contour in measure.find_contours(binary, 0.5):
+        if simplify_tolerance > 0:
+            contour = measure.approximate_polygon(contour, tolerance=simplify_tolerance)
+        path_data = "M "
+        for i, point in enumerate(contour):
+            if i == 0:
+                path_data += f"{point[1]:.1f},{point[0]:.1f} "
+            else:
+                path_data += f"L {point[1]:.1f},{point[0]:.1f} "
+        path_data += "Z"
+        svg_paths.append(f'<path d="{path_data}" fill="black"/>')
+    return ''.join(svg_paths).encode('utf-8')
+
+def timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return time.perf_counter() - start, result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", type=int, default=4000, help="width and height of the scan in pixels")
+    args = parser.parse_args()
+
+    scan = make_scan(args.size)
+    converter = ImageConverter()
+
+    # Contour finding is shared by both emitters, so time it on its own too
+    data = np.asarray(scan)
+    contour_time, contours = timed(measure.find_contours, data > threshold_otsu(data), 0.5)
+    print(f"{args.size}x{args.size} scan, {len(contours)} contours ({contour_time:.2f}s to find)")
+
+    cases = [
+        ("legacy emitter", legacy_bitmap_to_svg, {}),
+        ("vectorized", converter._bitmap_to_svg, {}),
+        ("legacy emitter, tolerance 0", legacy_bitmap_to_svg, {"simplify_tolerance": 0}),
+        ("vectorized, tolerance 0", converter._bitmap_to_svg, {"simplify_tolerance": 0}),
+        ("vectorized, trace at 1/2", converter._bitmap_to_svg, {"trace_scale": 0.5}),
+        ("vectorized, trace at 1/4", converter._bitmap_to_svg, {"trace_scale": 0.25}),
+    ]
+    print(f"{'case':<28}{'seconds':>10}{'output MB':>12}")
+    for label, func, options in cases:
+        seconds, svg = timed(func, scan, **options)
+        print(f"{label:<28}{seconds:>10.2f}{len(svg) / 1e6:>12.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,99 @@
-from .base_converter import BaseConverter
+from .base_converter import BaseConverter, CHUNK_SIZE
 import zipfile
-import py7zr
 import rarfile
 import tarfile
 import io
 import streamlit as st
 import os
-import tempfile
+import queue
 import shutil
+import struct
+import tempfile
+import threading
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from .parallel_compress import (BLOCK_SIZE, DICT_SIZE, OrderedPipeline, ParallelBz2Writer,
+                                ParallelGzipWriter, deflate_block, run_task)
+from .progress import ProgressReporter
+
+# py7zr and its codecs load on the first 7z conversion (see sevenzip_stream)
+
+# Compression levels offered in the UI; 0 stores without compressing
+COMPRESSION_LEVELS = {
+    "Store": 0,
+    "Fast": 1,
+    "Normal": 6,
+    "Maximum": 9
+}
+
+class _Member:
+    """One regular file in an input archive, opened lazily as a stream."""
+
+    def __init__(self, name, size, mtime, open_stream, zip_info=None, raw_chunks=None):
+        self.name = name
+        self.size = size
+        self.mtime = mtime
+        self.open = open_stream
+        # For zip input: the member's header and a reader of its compressed bytes
+        self.zip_info = zip_info
+        self.raw_chunks = raw_chunks
+
+    def is_deflated(self):
+        """True if the member is stored as plain deflate data that can be copied as is."""
+        return (self.zip_info is not None and self.zip_info.compress_type == zipfile.ZIP_DEFLATED
+                and not self.zip_info.flag_bits & 0x1)
+
+def _iter_raw_zip_member(fp, info):
+    """Yield the compressed bytes of a zip member without decompressing them."""
+    fp.seek(info.header_offset)
+    header = fp.read(zipfile.sizeFileHeader)
+    if len(header) != zipfile.sizeFileHeader or header[:4] != zipfile.stringFileHeader:
+        raise zipfile.BadZipFile(f"Bad local header for {info.filename}")
+    fields = struct.unpack(zipfile.structFileHeader, header)
+    # Skip the file name and extra field, whose lengths are the last two fields
+    fp.seek(fields[-2] + fields[-1], os.SEEK_CUR)
+    remaining = info.compress_size
+    while remaining:
+        chunk = fp.read(min(CHUNK_SIZE, remaining))
+        if not chunk:
+            raise zipfile.BadZipFile(f"Truncated data for {info.filename}")
+        remaining -= len(chunk)
+        yield chunk
+
+class _ZipEntryWriter:
+    """Writes one zip member whose compressed data arrives in pieces.
+
+    The local header is written with placeholder sizes and rewritten once
+    the CRC and sizes are known, so the output must be seekable.
+    """
+
+    def __init__(self, zip_out, name, date_time):
+        self.zip_out = zip_out
+        self.zinfo = zipfile.ZipInfo(name, date_time)
+        self.zinfo.compress_type = zipfile.ZIP_DEFLATED
+        self.zinfo.external_attr = 0o644 << 16
+        self.zinfo.CRC = 0
+        self.zinfo.file_size = 0
+        self.zinfo.compress_size = 0
+
+    def start(self):
+        self.zinfo.header_offset = self.zip_out.fp.tell()
+        # Always use the zip64 header so the rewrite has the same length
+        self.zip_out.fp.write(self.zinfo.FileHeader(zip64=True))
+
+    def write(self, data):
+        self.zip_out.fp.write(data)
+        self.zinfo.compress_size += len(data)
+
+    def finish(self):
+        end = self.zip_out.fp.tell()
+        self.zip_out.fp.seek(self.zinfo.header_offset)
+        self.zip_out.fp.write(self.zinfo.FileHeader(zip64=True))
+        self.zip_out.fp.seek(end)
+        self.zip_out.filelist.append(self.zinfo)
+        self.zip_out.NameToInfo[self.zinfo.filename] = self.zinfo
+        self.zip_out.start_dir = end
 
 class ArchiveConverter(BaseConverter):
     def __init__(self):
@@ -24,77 +110,236 @@ class ArchiveConverter(BaseConverter):
             'bz2': ['zip', 'rar', '7z', 'tar', 'gz']
         }
 
-    def convert(self, input_file, output_format, compression_level="Normal", password=None, split_size=None):
-        # Create temporary directory for extraction
-        with tempfile.TemporaryDirectory() as temp_dir:
-            # Create temporary file for input
-            with tempfile.NamedTemporaryFile(delete=False) as temp_input:
-                temp_input.write(input_file.getvalue())
-                temp_input_path = temp_input.name
+    def convert_stream(self, reader, writer, output_format, compression_level="Normal", password=None, split_size=None,
+                       workers=None, progress=None):
+        """Re-pack an archive member by member; progress counts the members written."""
+        input_format = self._get_input_format(reader)
+        # Copy the input to a temporary file in blocks
+        temp_input_path = self._spool_to_file(reader)
+
+        try:
+            reporter = ProgressReporter.of(progress, unit="members")
+            members = self._count_members(self._iter_members(temp_input_path, input_format, password, reporter),
+                                          reporter)
+            level = COMPRESSION_LEVELS.get(compression_level, COMPRESSION_LEVELS["Normal"])
+            # Already-deflated zip members go into .tar.gz as they are unless the smallest output was asked for
+            passthrough = compression_level != "Maximum"
 
+            # Compression runs block-parallel across a process pool
+            workers = workers or os.cpu_count() or 1
+            executor = ProcessPoolExecutor(max_workers=workers) if workers > 1 and output_format != 'tar' else None
             try:
-                # Extract the input archive
-                input_format = input_file.name.split('.')[-1].lower()
-                
-                if input_format == 'zip':
-                    with zipfile.ZipFile(temp_input_path, 'r') as zip_ref:
-                        if password:
-                            zip_ref.setpassword(password.encode())
-                        zip_ref.extractall(temp_dir)
-                elif input_format == 'rar':
-                    with rarfile.RarFile(temp_input_path, 'r') as rar_ref:
-                        if password:
-                            rar_ref.setpassword(password.encode())
-                        rar_ref.extractall(temp_dir)
-                elif input_format == '7z':
-                    with py7zr.SevenZipFile(temp_input_path, 'r') as sz_ref:
-                        if password:
-                            sz_ref.setpassword(password.encode())
-                        sz_ref.extractall(temp_dir)
-                elif input_format in ['tar', 'gz', 'bz2']:
-                    with tarfile.open(temp_input_path, 'r:*') as tar_ref:
-                        tar_ref.extractall(temp_dir)
-
-                # Create output archive
-                output = io.BytesIO()
-                
+                # Re-pack member by member, straight into the writer
                 if output_format == 'zip':
-                    compression = {
-                        "Store": zipfile.ZIP_STORED,
-                        "Fast": zipfile.ZIP_DEFLATED,
-                        "Normal": zipfile.ZIP_DEFLATED,
-                        "Maximum": zipfile.ZIP_DEFLATED
-                    }.get(compression_level, zipfile.ZIP_DEFLATED)
-                    
-                    with zipfile.ZipFile(output, 'w', compression=compression) as zip_out:
-                        for root, dirs, files in os.walk(temp_dir):
-                            for file in files:
-                                file_path = os.path.join(root, file)
-                                arcname = os.path.relpath(file_path, temp_dir)
-                                zip_out.write(file_path, arcname)
-                
+                    self._write_zip(members, writer, level, executor, workers * 2)
+
                 elif output_format == '7z':
-                    with py7zr.SevenZipFile(output, 'w') as sz_out:
-                        sz_out.writeall(temp_dir, os.path.basename(temp_dir))
-                
+                    self._write_7z(members, writer, level)
+
                 elif output_format in ['tar', 'gz', 'bz2']:
-                    mode = {
-                        'tar': 'w',
-                        'gz': 'w:gz',
-                        'bz2': 'w:bz2'
-                    }.get(output_format, 'w')
-                    
-                    with tarfile.open(fileobj=output, mode=mode) as tar_out:
-                        for root, dirs, files in os.walk(temp_dir):
-                            for file in files:
-                                file_path = os.path.join(root, file)
-                                arcname = os.path.relpath(file_path, temp_dir)
-                                tar_out.add(file_path, arcname)
-
-                output.seek(0)
-                return output.getvalue()
+                    self._write_tar(members, writer, output_format, level, passthrough, executor, workers * 2)
+
+                else:
+                    raise ValueError(f"Writing {output_format} archives is not supported")
+            finally:
+                if executor is not None:
+                    executor.shutdown(cancel_futures=True)
 
+        finally:
+            # Clean up temporary input file
+            if os.path.exists(temp_input_path):
+                os.unlink(temp_input_path)
+
+    def _count_members(self, members, reporter):
+        """Pass members through, counting each one once the writer asks for the next."""
+        for member in members:
+            yield member
+            reporter.advance(uncompressed_bytes=member.size)
+
+    def _iter_members(self, path, input_format, password=None, reporter=None):
+        """Yield every regular file in the archive, in archive order.
+
+        For formats with a central index the member count is set as the
+        reporter's total; tar has none, so its total stays unknown.
+        """
+        reporter = ProgressReporter.of(reporter)
+        if input_format == 'zip':
+            with zipfile.ZipFile(path, 'r') as zip_ref, open(path, 'rb') as raw_fp:
+                pwd = password.encode() if password else None
+                reporter.total = sum(1 for info in zip_ref.infolist() if not info.is_dir())
+                for info in zip_ref.infolist():
+                    if info.is_dir():
+                        continue
+                    yield _Member(
+                        info.filename, info.file_size, time.mktime(info.date_time + (0, 0, -1)),
+                        lambda info=info: zip_ref.open(info, pwd=pwd),
+                        zip_info=info,
+                        raw_chunks=lambda info=info: _iter_raw_zip_member(raw_fp, info),
+                    )
+        elif input_format == 'rar':
+            with rarfile.RarFile(path, 'r') as rar_ref:
+                if password:
+                    rar_ref.setpassword(password)
+                reporter.total = sum(1 for info in rar_ref.infolist() if not info.is_dir())
+                for info in rar_ref.infolist():
+                    if info.is_dir():
+                        continue
+                    mtime = info.mtime.timestamp() if info.mtime else time.mktime(info.date_time + (0, 0, -1))
+                    yield _Member(info.filename, info.file_size, mtime, lambda info=info: rar_ref.open(info))
+        elif input_format == '7z':
+            yield from self._iter_7z_members(path, password, reporter)
+        elif input_format in ['tar', 'gz', 'bz2']:
+            with tarfile.open(path, 'r:*') as tar_ref:
+                for info in tar_ref:
+                    if not info.isfile():
+                        continue
+                    yield _Member(info.name, info.size, info.mtime, lambda info=info: tar_ref.extractfile(info))
+        else:
+            raise ValueError(f"Unsupported archive format: {input_format}")
+
+    def _iter_7z_members(self, path, password=None, reporter=None):
+        """Stream 7z members through a bounded queue filled by a background extraction.
+
+        py7zr only pushes data to writer objects, so extraction runs in a
+        thread and each member is read from the queue as it is decompressed.
+        """
+        import py7zr
+        from .sevenzip_stream import QueueReader, QueueWriterFactory
+
+        events = queue.Queue(maxsize=16)
+        cancelled = threading.Event()
+
+        def put(event):
+            while not cancelled.is_set():
+                try:
+                    events.put(event, timeout=0.1)
+                    return
+                except queue.Full:
+                    continue
+            raise RuntimeError("7z extraction cancelled")
+
+        with open(path, 'rb') as fp, py7zr.SevenZipFile(fp, 'r', password=password) as sz_ref:
+            info = {f.filename: f for f in sz_ref.list() if not f.is_directory}
+            if reporter is not None:
+                reporter.total = len(info)
+
+            def extract():
+                try:
+                    # A file object (not a path) keeps py7zr's extraction sequential
+                    sz_ref.extract(factory=QueueWriterFactory(put))
+                    put(('done', None))
+                except Exception as e:
+                    if not cancelled.is_set():
+                        put(('error', e))
+
+            extractor = threading.Thread(target=extract, daemon=True)
+            extractor.start()
+            try:
+                while True:
+                    kind, value = events.get()
+                    if kind == 'done':
+                        break
+                    if kind == 'error':
+                        raise value
+                    if kind != 'member':
+                        continue
+                    member = info.get(value)
+                    size = member.uncompressed if member is not None else 0
+                    mtime = member.creationtime.timestamp() if member is not None and member.creationtime else time.time()
+                    stream = QueueReader(events)
+                    yield _Member(value, size, mtime, lambda stream=stream: io.BufferedReader(stream, CHUNK_SIZE))
+                    stream.close()
             finally:
-                # Clean up temporary input file
-                if os.path.exists(temp_input_path):
-                    os.unlink(temp_input_path) 
\ No newline at end of file
+                cancelled.set()
+                extractor.join(5)
+
+    def _write_zip(self, members, writer, level, executor, window):
+        compression = zipfile.ZIP_STORED if level == 0 else zipfile.ZIP_DEFLATED
+        with zipfile.ZipFile(writer, 'w', compression=compression, compresslevel=level) as zip_out:
+            if compression == zipfile.ZIP_STORED or not writer.seekable():
+                for member in members:
+                    zinfo = zipfile.ZipInfo(member.name, self._zip_date_time(member.mtime))
+                    zinfo.compress_type = compression
+                    zinfo.file_size = member.size
+                    with member.open() as source, zip_out.open(zinfo, 'w', force_zip64=True) as target:
+                        shutil.copyfileobj(source, target, CHUNK_SIZE)
+                return
+
+            # Every member is cut into blocks that are deflated in the pool; results are
+            # written in order, so the central directory comes out as zipfile would write it
+            pipeline = OrderedPipeline(window)
+            for member in members:
+                entry = _ZipEntryWriter(zip_out, member.name, self._zip_date_time(member.mtime))
+                pipeline.then(entry.start)
+                with member.open() as source:
+                    block = source.read(BLOCK_SIZE)
+                    tail = b''
+                    while True:
+                        next_block = source.read(BLOCK_SIZE)
+                        last = not next_block
+                        entry.zinfo.CRC = zlib.crc32(block, entry.zinfo.CRC)
+                        entry.zinfo.file_size += len(block)
+                        pipeline.put(run_task(executor, deflate_block, block, level, tail, last), entry.write)
+                        if last:
+                            break
+                        tail = block[-DICT_SIZE:]
+                        block = next_block
+                pipeline.then(entry.finish)
+            pipeline.flush()
+
+    def _write_tar(self, members, writer, output_format, level, passthrough, executor, window):
+        # The gzip and bzip2 layers are ours: blocks compress in the pool, and
+        # deflated zip members can pass straight into a .tar.gz
+        if output_format == 'gz':
+            target = ParallelGzipWriter(writer, level, executor, window)
+        elif output_format == 'bz2':
+            target = ParallelBz2Writer(writer, level, executor, window)
+        else:
+            target = writer
+        with tarfile.open(fileobj=target, mode='w') as tar_out:
+            for member in members:
+                if output_format == 'gz' and passthrough and member.is_deflated():
+                    info = self._tar_info(member)
+                    header = info.tobuf(tar_out.format, tar_out.encoding, tar_out.errors)
+                    target.write(header)
+                    target.write_deflated(member.raw_chunks(), member.zip_info.CRC, member.size)
+                    padding = -member.size % tarfile.BLOCKSIZE
+                    if padding:
+                        target.write(tarfile.NUL * padding)
+                    tar_out.offset += len(header) + member.size + padding
+                    tar_out.members.append(info)
+                else:
+                    self._add_tar_member(tar_out, member)
+        if target is not writer:
+            target.close()
+
+    def _write_7z(self, members, writer, level):
+        import py7zr
+
+        if level == 0:
+            filters = [{'id': py7zr.FILTER_COPY}]
+        else:
+            filters = [{'id': py7zr.FILTER_LZMA2, 'preset': level}]
+        # py7zr reads its inputs when the archive is closed, so members are staged on disk
+        with tempfile.TemporaryDirectory() as staging_dir, \
+                py7zr.SevenZipFile(writer, 'w', filters=filters) as sz_out:
+            for index, member in enumerate(members):
+                staged_path = os.path.join(staging_dir, str(index))
+                with member.open() as source, open(staged_path, 'wb') as target:
+                    shutil.copyfileobj(source, target, CHUNK_SIZE)
+                sz_out.write(staged_path, member.name)
+
+    def _add_tar_member(self, tar_out, member):
+        with member.open() as source:
+            tar_out.addfile(self._tar_info(member), source)
+
+    def _tar_info(self, member):
+        info = tarfile.TarInfo(member.name)
+        info.size = member.size
+        info.mtime = int(member.mtime)
+        info.mode = 0o644
+        return info
+
+    def _zip_date_time(self, mtime):
+        # Zip timestamps cannot go earlier than 1980
+        return max(time.localtime(mtime)[:6], (1980, 1, 1, 0, 0, 0))
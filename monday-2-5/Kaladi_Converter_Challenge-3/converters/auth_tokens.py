@@ -0,0 +1,311 @@
+import base64
+import hashlib
+import hmac
+import importlib.util
+import json
+import secrets
+import threading
+import time
+import uuid
+from types import SimpleNamespace
+import streamlit as st
+
+# Seconds of clock difference tolerated when checking exp and nbf
+LEEWAY = 30
+# Seconds a fetched JWKS is trusted; an unknown key id refetches it sooner
+JWKS_TTL = 3600
+# Audience Supabase puts in signed-in users' access tokens
+AUDIENCE = "authenticated"
+# Lifetime of tokens issued by LocalAuthBackend
+LOCAL_TOKEN_TTL = 3600
+# Seconds before expiry at which AuthManager refreshes an access token
+TOKEN_REFRESH_MARGIN = 60
+
+ASYMMETRIC_ALGORITHMS = {"RS256", "RS384", "RS512", "ES256", "ES384", "ES512", "EdDSA"}
+
+_jwks_cache = {}  # url -> (expires at, {kid: key})
+_jwks_lock = threading.Lock()
+
+def _b64decode(segment):
+    return base64.urlsafe_b64decode(segment + '=' * (-len(segment) % 4))
+
+def _b64encode(data):
+    return base64.urlsafe_b64encode(data).rstrip(b'=').decode('ascii')
+
+def decode_unverified(token):
+    """Split a JWT into its header and claims without checking the signature."""
+    try:
+        header_segment, claims_segment, _ = token.split('.')
+        return json.loads(_b64decode(header_segment)), json.loads(_b64decode(claims_segment))
+    except (ValueError, AttributeError) as e:
+        raise ValueError(f"Malformed token: {str(e)}")
+
+def encode_hs256(claims, secret):
+    """Sign claims into an HS256 JWT."""
+    signing_input = ".".join([
+        _b64encode(json.dumps({"alg": "HS256", "typ": "JWT"}, separators=(',', ':')).encode()),
+        _b64encode(json.dumps(claims, separators=(',', ':')).encode())
+    ])
+    signature = hmac.new(secret.encode(), signing_input.encode(), hashlib.sha256).digest()
+    return f"{signing_input}.{_b64encode(signature)}"
+
+def fetch_jwks(url):
+    import urllib.request
+    with urllib.request.urlopen(url, timeout=10) as response:
+        return json.load(response)
+
+class TokenVerifier:
+    """Checks access tokens in-process instead of asking the auth server.
+
+    HS256 tokens are checked with the project's JWT secret using hmac.
+    Asymmetric ones (RS256, ES256, ...) are checked with PyJWT against the
+    project's JWKS, which is fetched once and cached for the process.
+    verify() returns None when this verifier has no key for a token's
+    algorithm, so the caller can fall back to the server.
+    """
+
+    def __init__(self, secret=None, jwks_url=None, audience=AUDIENCE, leeway=LEEWAY, jwks_ttl=JWKS_TTL,
+                 jwks_fetcher=fetch_jwks):
+        self.secret = secret
+        self.jwks_url = jwks_url
+        self.audience = audience
+        self.leeway = leeway
+        self.jwks_ttl = jwks_ttl
+        self.jwks_fetcher = jwks_fetcher
+
+    def verify(self, token, now=None):
+        """Return the token's claims, None if it cannot be checked here, or raise ValueError if it is invalid."""
+        header, claims = decode_unverified(token)
+        algorithm = header.get('alg')
+        if algorithm == "HS256":
+            if not self.secret:
+                return None
+            signing_input, _, signature = token.rpartition('.')
+            expected = hmac.new(self.secret.encode(), signing_input.encode(), hashlib.sha256).digest()
+            if not hmac.compare_digest(expected, _b64decode(signature)):
+                raise ValueError("Invalid token signature")
+        elif algorithm in ASYMMETRIC_ALGORITHMS:
+            # PyJWT is optional; without it the caller falls back to the server
+            if not self.jwks_url or importlib.util.find_spec("jwt") is None:
+                return None
+            self._verify_with_jwks(token, header, algorithm)
+        else:
+            raise ValueError(f"Unsupported token algorithm: {algorithm}")
+        self._check_claims(claims, time.time() if now is None else now)
+        return claims
+
+    def _check_claims(self, claims, now):
+        if 'exp' not in claims or claims['exp'] + self.leeway < now:
+            raise ValueError("Token has expired")
+        if claims.get('nbf', 0) - self.leeway > now:
+            raise ValueError("Token is not valid yet")
+        if self.audience:
+            audience = claims.get('aud')
+            if self.audience not in (audience if isinstance(audience, list) else [audience]):
+                raise ValueError("Token is for another audience")
+
+    def _verify_with_jwks(self, token, header, algorithm):
+        import jwt
+
+        key = self._signing_key(header.get('kid'))
+        try:
+            # Only the signature here; the claims get the same checks as HS256 tokens
+            jwt.decode(token, key, algorithms=[algorithm], options={"verify_exp": False, "verify_nbf": False,
+                                                                    "verify_aud": False, "verify_iat": False})
+        except jwt.InvalidTokenError as e:
+            raise ValueError(f"Invalid token: {str(e)}")
+
+    def _signing_key(self, kid):
+        keys = self._jwks(refresh=False)
+        if kid not in keys:
+            # The project may have rotated its keys since the JWKS was cached
+            keys = self._jwks(refresh=True)
+        if kid not in keys:
+            raise ValueError(f"Unknown signing key: {kid}")
+        return keys[kid]
+
+    def _jwks(self, refresh):
+        import jwt
+
+        with _jwks_lock:
+            cached = _jwks_cache.get(self.jwks_url)
+            if cached is not None and not refresh and cached[0] > time.monotonic():
+                return cached[1]
+            keys = {}
+            for jwk in self.jwks_fetcher(self.jwks_url).get('keys', []):
+                try:
+                    keys[jwk.get('kid')] = jwt.PyJWK(jwk).key
+                except jwt.PyJWTError:
+                    # Skip key types this PyJWT build cannot load
+                    continue
+            _jwks_cache[self.jwks_url] = (time.monotonic() + self.jwks_ttl, keys)
+            return keys
+
+class SupabaseAuthBackend:
+    """Supabase Auth, through a supabase-py client."""
+
+    def __init__(self, client):
+        self.client = client
+
+    def sign_up(self, email, password):
+        return self.client.auth.sign_up({"email": email, "password": password})
+
+    def sign_in(self, email, password):
+        return self.client.auth.sign_in_with_password({"email": email, "password": password})
+
+    def refresh(self, refresh_token):
+        return self.client.auth.refresh_session(refresh_token)
+
+    def get_user(self, access_token):
+        response = self.client.auth.get_user(access_token)
+        return response.user if response else None
+
+    def sign_out(self):
+        self.client.auth.sign_out()
+
+class LocalAuthBackend:
+    """An in-process stand-in for Supabase Auth that issues HS256 tokens.
+
+    Users live in memory. Responses have the attributes AuthManager reads
+    from supabase-py's (user.id, user.email, user.identities,
+    session.access_token, session.refresh_token, session.expires_at).
+    """
+
+    def __init__(self, secret, token_ttl=LOCAL_TOKEN_TTL):
+        self.secret = secret
+        self.token_ttl = token_ttl
+        self.remote_calls = 0
+        self._users = {}  # email -> (salt, password hash, user)
+        self._refresh_tokens = {}  # refresh token -> user
+        self._lock = threading.Lock()
+
+    def sign_up(self, email, password):
+        self.remote_calls += 1
+        with self._lock:
+            if email in self._users:
+                # Supabase answers an existing address with a user that has no identities
+                existing = SimpleNamespace(id=self._users[email][2].id, email=email, identities=[])
+                return SimpleNamespace(user=existing, session=None)
+            salt = secrets.token_bytes(16)
+            user = SimpleNamespace(id=str(uuid.uuid4()), email=email, identities=[{"provider": "email"}])
+            self._users[email] = (salt, self._hash(password, salt), user)
+        return SimpleNamespace(user=user, session=None)
+
+    def sign_in(self, email, password):
+        self.remote_calls += 1
+        with self._lock:
+            entry = self._users.get(email)
+        if entry is None or not hmac.compare_digest(entry[1], self._hash(password, entry[0])):
+            raise ValueError("Invalid login credentials")
+        return self._session_for(entry[2])
+
+    def refresh(self, refresh_token):
+        self.remote_calls += 1
+        with self._lock:
+            user = self._refresh_tokens.pop(refresh_token, None)
+        if user is None:
+            raise ValueError("Invalid refresh token")
+        return self._session_for(user)
+
+    def get_user(self, access_token):
+        self.remote_calls += 1
+        try:
+            claims = TokenVerifier(self.secret).verify(access_token)
+        except ValueError:
+            return None
+        with self._lock:
+            return next((user for _, _, user in self._users.values() if user.id == claims['sub']), None)
+
+    def sign_out(self):
+        self.remote_calls += 1
+
+    def _session_for(self, user):
+        now = int(time.time())
+        expires_at = now + self.token_ttl
+        access_token = encode_hs256({"sub": user.id, "email": user.email, "aud": AUDIENCE, "role": "authenticated",
+                                     "iat": now, "exp": expires_at}, self.secret)
+        refresh_token = secrets.token_urlsafe(24)
+        with self._lock:
+            self._refresh_tokens[refresh_token] = user
+        return SimpleNamespace(user=user, session=SimpleNamespace(access_token=access_token,
+                                                                  refresh_token=refresh_token,
+                                                                  expires_at=expires_at))
+
+    def _hash(self, password, salt):
+        return hashlib.pbkdf2_hmac('sha256', password.encode(), salt, 100_000)
+
+class AuthManager:
+    """Signs users in and keeps their session token in st.session_state.
+
+    Each rerun checks the access token locally (signature, expiry,
+    audience) instead of asking Supabase. The server is only contacted to
+    refresh a token that is about to expire, or once per token when this
+    process has no key to check it. `backend` is SupabaseAuthBackend in
+    the app; LocalAuthBackend runs it without Supabase.
+    """
+
+    def __init__(self, backend, verifier):
+        self.backend = backend
+        self.verifier = verifier
+
+    def sign_up(self, email, password):
+        try:
+            response = self.backend.sign_up(email, password)
+            if not response.user.identities:
+                raise Exception("User already exists")
+            return True
+        except Exception as e:
+            st.error(f"Sign up failed: {str(e)}")
+            return False
+
+    def sign_in(self, email, password):
+        try:
+            response = self.backend.sign_in(email, password)
+            self._store_session(response)
+            st.session_state.show_auth = False
+            return True
+        except Exception as e:
+            st.error(f"Sign in failed: {str(e)}")
+            return False
+
+    def sign_out(self):
+        try:
+            self.backend.sign_out()
+            st.session_state.clear()
+            st.success("Successfully signed out!")
+            return True
+        except Exception as e:
+            st.error(f"Sign out failed: {str(e)}")
+            return False
+
+    def get_current_user(self):
+        auth = st.session_state.get('auth_session')
+        if not auth:
+            return None
+        try:
+            if auth['expires_at'] - time.time() < TOKEN_REFRESH_MARGIN:
+                self._store_session(self.backend.refresh(auth['refresh_token']))
+                auth = st.session_state.auth_session
+            if self.verifier.verify(auth['access_token']) is None and not auth.get('checked_remotely'):
+                # No key to check this token here; ask the server once per token
+                if self.backend.get_user(auth['access_token']) is None:
+                    raise Exception("Session is no longer valid")
+                auth['checked_remotely'] = True
+            return auth['user']
+        except Exception:
+            # Expired or revoked: the user has to sign in again
+            for name in ('auth_session', 'user', 'authenticated'):
+                st.session_state.pop(name, None)
+            return None
+
+    def _store_session(self, response):
+        session = response.session
+        _, claims = decode_unverified(session.access_token)
+        st.session_state.auth_session = {
+            "access_token": session.access_token,
+            "refresh_token": session.refresh_token,
+            "expires_at": claims.get('exp') or session.expires_at,
+            "user": response.user
+        }
+        st.session_state.user = response.user
+        st.session_state.authenticated = True
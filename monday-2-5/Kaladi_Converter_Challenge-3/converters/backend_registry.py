@@ -0,0 +1,85 @@
+import threading
+import time
+
+class BackendRegistry:
+    """Ranks interchangeable conversion backends by how well they work here.
+
+    Each backend's probe runs once per process and its result is cached, so
+    backends that cannot work on this machine are never attempted. The rest
+    are ordered by quality tier first (0 is full fidelity, higher tiers are
+    degraded fallbacks), then by success rate and mean latency within a
+    tier, so a transient failure never promotes a worse backend over a
+    better one. A backend that fails `failure_limit` times in a row is
+    rested for `retry_after` seconds.
+    """
+
+    def __init__(self, failure_limit=3, retry_after=300):
+        self.failure_limit = failure_limit
+        self.retry_after = retry_after
+        self._backends = {}
+        self._lock = threading.Lock()
+
+    def register(self, name, probe=None, tier=0):
+        """Add a backend; `probe` returns True if it can run on this machine."""
+        self._backends[name] = {
+            "probe": probe,
+            "tier": tier,
+            "available": None,
+            "attempts": 0,
+            "successes": 0,
+            "total_seconds": 0.0,
+            "consecutive_failures": 0,
+            "last_failure": 0.0,
+            "order": len(self._backends),
+        }
+
+    def probe_all(self):
+        """Run every probe that has not run yet."""
+        for name, backend in self._backends.items():
+            if backend["available"] is None:
+                try:
+                    available = backend["probe"] is None or bool(backend["probe"]())
+                except Exception:
+                    available = False
+                with self._lock:
+                    backend["available"] = available
+
+    def ordered(self):
+        """Names of the backends worth trying, best first."""
+        self.probe_all()
+        now = time.monotonic()
+        with self._lock:
+            available = [name for name, b in self._backends.items() if b["available"]]
+            healthy = [
+                name for name in available
+                if self._backends[name]["consecutive_failures"] < self.failure_limit
+                or now - self._backends[name]["last_failure"] > self.retry_after
+            ]
+            # If every backend is resting, trying them all beats failing outright
+            return sorted(healthy or available, key=self._rank)
+
+    def _rank(self, name):
+        backend = self._backends[name]
+        # Laplace-smoothed success rate so untried backends start at 0.5
+        success_rate = (backend["successes"] + 1) / (backend["attempts"] + 2)
+        mean_seconds = backend["total_seconds"] / backend["successes"] if backend["successes"] else 0.0
+        return (backend["tier"], -success_rate, mean_seconds, backend["order"])
+
+    def record(self, name, succeeded, seconds):
+        with self._lock:
+            backend = self._backends[name]
+            backend["attempts"] += 1
+            if succeeded:
+                backend["successes"] += 1
+                backend["total_seconds"] += seconds
+                backend["consecutive_failures"] = 0
+            else:
+                backend["consecutive_failures"] += 1
+                backend["last_failure"] = time.monotonic()
+
+    def stats(self):
+        with self._lock:
+            return {
+                name: {key: value for key, value in backend.items() if key != "probe"}
+                for name, backend in self._backends.items()
+            }
@@ -0,0 +1,157 @@
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+import io
+import os
+import threading
+import zipfile
+from .progress import ProgressReporter
+
+# rembg models that run well on CPU, fastest first
+MODELS = {
+    "u2netp": "Fast (4.7 MB model, rougher edges)",
+    "silueta": "Balanced (u2net quality, 43 MB model)",
+    "u2net": "Best quality (176 MB model, slowest)"
+}
+DEFAULT_MODEL = "u2net"
+
+# Longest side an image is scaled down to before inference. The models work
+# at 320x320, so larger inputs only cost time; the mask is scaled back up
+MAX_SIDE = 1024
+
+# onnxruntime threads per session when none are given; 0 lets onnxruntime decide
+THREADS_ENV = "REMBG_THREADS"
+
+# Images read and queued per worker at a time; the rest stay unread until a slot frees up
+IN_FLIGHT_PER_WORKER = 2
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+def default_threads():
+    return int(os.environ.get(THREADS_ENV) or 0)
+
+def get_session(model=DEFAULT_MODEL, threads=None):
+    """Return the process-wide rembg session for a model, loading it on first use.
+
+    Sessions run on the CPU provider. Loading one reads the ONNX file and
+    builds the graph, which takes far longer than inference itself, so each
+    (model, threads) pair is built once per process.
+    """
+    threads = default_threads() if threads is None else threads
+    key = (model, threads)
+    with _sessions_lock:
+        if key not in _sessions:
+            import onnxruntime as ort
+            from rembg.sessions import sessions_class
+
+            session_cls = next((cls for cls in sessions_class if cls.name() == model), None)
+            if session_cls is None:
+                raise ValueError(f"Unknown background removal model: {model}")
+            options = ort.SessionOptions()
+            if threads:
+                options.intra_op_num_threads = threads
+                options.inter_op_num_threads = 1
+            _sessions[key] = session_cls(model, options, providers=["CPUExecutionProvider"])
+        return _sessions[key]
+
+def predict_mask(image, session, max_side=MAX_SIDE, post_process=False):
+    """Return an 'L' alpha mask the size of `image`, inferred on a copy at most `max_side` wide or tall."""
+    from PIL import Image
+    from rembg import remove
+
+    small = image.convert("RGB")
+    if max_side and max(small.size) > max_side:
+        # reducing_gap makes PIL shrink by whole factors first, which is much faster on large photos
+        small.thumbnail((max_side, max_side), Image.Resampling.BILINEAR, reducing_gap=2.0)
+    mask = remove(small, session=session, only_mask=True, post_process_mask=post_process)
+    if mask.size != image.size:
+        mask = mask.resize(image.size, Image.Resampling.BILINEAR)
+    return mask
+
+def remove_background(image, model=DEFAULT_MODEL, max_side=MAX_SIDE, threads=None, post_process=False):
+    """Cut the subject out of a PIL image and return it as RGBA at full resolution."""
+    from PIL import ImageOps
+
+    # Camera photos are often stored sideways with an EXIF rotation
+    image = ImageOps.exif_transpose(image)
+    mask = predict_mask(image, get_session(model, threads), max_side, post_process)
+    cutout = image.convert("RGBA")
+    cutout.putalpha(mask)
+    return cutout
+
+def _init_worker(model, threads):
+    # Load the model once per worker; every image the worker handles reuses it
+    get_session(model, threads)
+
+def _remove_background_job(data, model, max_side, threads):
+    """Worker-process entry point for remove_backgrounds; returns the cutout as PNG bytes."""
+    from PIL import Image
+
+    cutout = remove_background(Image.open(io.BytesIO(data)), model, max_side, threads)
+    output = io.BytesIO()
+    cutout.save(output, format="PNG")
+    return output.getvalue()
+
+def remove_backgrounds(input_files, model=DEFAULT_MODEL, max_side=MAX_SIDE, max_workers=None, progress=None):
+    """Remove the background from several images in worker processes.
+
+    Each worker loads the model once, and the cores are split between the
+    workers' onnxruntime thread pools. Uploads are read only as workers
+    free up, so at most IN_FLIGHT_PER_WORKER images per worker are held in
+    memory. Yields (input_name, png_bytes, error) tuples in completion
+    order; png_bytes is None and error is set when an image fails.
+    `progress` counts finished images.
+    """
+    input_files = list(input_files)
+    if not input_files:
+        return
+    cpus = os.cpu_count() or 1
+    workers = max_workers or min(len(input_files), cpus)
+    threads = max(1, cpus // workers)
+    reporter = ProgressReporter.of(progress, unit="images", total=len(input_files))
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(model, threads)) as executor:
+        pending = iter(input_files)
+        jobs = {}
+        while True:
+            for input_file in pending:
+                future = executor.submit(_remove_background_job, input_file.read(), model, max_side, threads)
+                jobs[future] = getattr(input_file, 'name', 'image')
+                if len(jobs) >= workers * IN_FLIGHT_PER_WORKER:
+                    break
+            if not jobs:
+                break
+            done, _ = wait(jobs, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = jobs.pop(future)
+                reporter.advance()
+                try:
+                    data = future.result()
+                except Exception as e:
+                    yield name, None, e
+                    continue
+                yield name, data, None
+    reporter.finish()
+
+def remove_backgrounds_to_zip(input_files, writer, model=DEFAULT_MODEL, max_side=MAX_SIDE, max_workers=None,
+                              progress=None):
+    """Run remove_backgrounds and write each cutout into a ZIP as soon as it finishes.
+
+    Returns a list of (input_name, error) pairs for the images that failed.
+    """
+    failures = []
+    used_names = set()
+    # PNG is compressed already, so the entries are stored as they are
+    with zipfile.ZipFile(writer, 'w', compression=zipfile.ZIP_STORED) as zip_out:
+        for name, data, error in remove_backgrounds(input_files, model, max_side, max_workers, progress):
+            if error is not None:
+                failures.append((name, error))
+                continue
+            stem = os.path.splitext(os.path.basename(name))[0] or 'image'
+            arcname = f"{stem}_no_bg.png"
+            counter = 1
+            while arcname in used_names:
+                arcname = f"{stem}_no_bg_{counter}.png"
+                counter += 1
+            used_names.add(arcname)
+            zip_out.writestr(arcname, data)
+    return failures
@@ -1,7 +1,36 @@
 from abc import ABC, abstractmethod
-import streamlit as st
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import io
+import os
+import shutil
+import tempfile
+import zipfile
+from .formats import read_header, resolve_format
+from .job_queue import get_job_queue
+from .progress import ProgressReporter
+from .result_cache import default_cache
+
+# Size of the blocks copied between readers and writers, and how much output
+# is kept in memory before a spooled file rolls over to disk
+CHUNK_SIZE = 1024 * 1024
+SPOOL_MAX_SIZE = 32 * 1024 * 1024
+
+def _convert_path_job(converter_cls, input_path, output_format, options):
+    """Worker-process entry point for convert_many; returns the output file path."""
+    converter = converter_cls()
+    fd, output_path = tempfile.mkstemp(suffix=f'.{output_format}')
+    try:
+        with open(input_path, 'rb') as reader, os.fdopen(fd, 'wb') as writer:
+            converter.convert_stream(reader, writer, output_format, **options)
+    except Exception:
+        os.unlink(output_path)
+        raise
+    return output_path
 
 class BaseConverter(ABC):
+    # Shared result cache; assign another ResultCache, or None to disable caching
+    result_cache = default_cache
+
     def __init__(self):
         self.supported_formats = {}
         self.title = ""
@@ -9,33 +38,188 @@ class BaseConverter(ABC):
         self.description = ""
 
     @abstractmethod
-    def convert(self, input_file, output_format):
+    def convert_stream(self, reader, writer, output_format, progress=None, **options):
+        """Read the input from `reader` and write the converted output to `writer`.
+
+        Both arguments are binary file-like objects. Implementations should
+        work block by block wherever the format allows it, so peak memory
+        does not grow with the size of the file.
+
+        `progress` is a ProgressReporter or a callable taking its stats dict;
+        implementations count their work on ProgressReporter.of(progress).
+        """
         pass
 
+    def convert(self, input_file, output_format, progress=None, **options):
+        """Convert a whole file and return the output as bytes."""
+        writer = io.BytesIO()
+        self.convert_cached(input_file, writer, output_format, progress=progress, **options)
+        return writer.getvalue()
+
+    def convert_cached(self, reader, writer, output_format, progress=None, **options):
+        """Like convert_stream, but serve repeated conversions from the result cache.
+
+        Returns True when the output came from the cache. The progress
+        callback, which is not part of the cache key, gets a final report
+        once the output is complete.
+        """
+        reporter = ProgressReporter.of(progress)
+        # Reject content that does not match its name before hashing or decoding it
+        self._get_input_format(reader)
+        cache = self.result_cache
+        if cache is None:
+            self.convert_stream(reader, writer, output_format, progress=reporter, **options)
+            reporter.finish()
+            return False
+
+        key = cache.make_key(reader, self, output_format, options)
+        cached = cache.get(key)
+        if cached is not None:
+            writer.write(cached)
+            reporter.finish()
+            return True
+
+        start = writer.tell()
+        self.convert_stream(reader, writer, output_format, progress=reporter, **options)
+        reporter.finish()
+
+        # Read the result back for the cache if the writer allows it and it fits
+        end = writer.tell()
+        if end - start <= cache.max_item_bytes and writer.readable() and writer.seekable():
+            writer.seek(start)
+            cache.put(key, writer.read(end - start))
+            writer.seek(end)
+        return False
+
+    def convert_many(self, input_files, output_format, max_workers=None, progress=None, **options):
+        """Convert several files in parallel worker processes.
+
+        Yields (input_name, output_bytes, error) tuples in completion order;
+        output_bytes is None and error is set when a file fails. Cached
+        results are yielded straight away without being sent to a worker.
+        `progress` counts finished files.
+        """
+        cache = self.result_cache
+        reporter = ProgressReporter.of(progress, unit="files",
+                                       total=len(input_files) if hasattr(input_files, '__len__') else None)
+        jobs = {}
+        try:
+            with ProcessPoolExecutor(max_workers=max_workers) as executor:
+                for input_file in input_files:
+                    name = getattr(input_file, 'name', 'file')
+                    try:
+                        input_format = self._get_input_format(input_file)
+                    except ValueError as e:
+                        reporter.advance()
+                        yield name, None, e
+                        continue
+                    key = cache.make_key(input_file, self, output_format, options) if cache is not None else None
+                    cached = cache.get(key) if key is not None else None
+                    if cached is not None:
+                        reporter.advance()
+                        yield name, cached, None
+                        continue
+
+                    input_path = self._spool_to_file(input_file, suffix=f'.{input_format}')
+                    future = executor.submit(_convert_path_job, type(self), input_path, output_format, options)
+                    jobs[future] = (name, input_path, key)
+
+                for future in as_completed(jobs):
+                    name, input_path, key = jobs[future]
+                    os.unlink(input_path)
+                    reporter.advance()
+                    try:
+                        output_path = future.result()
+                    except Exception as e:
+                        yield name, None, e
+                        continue
+                    try:
+                        with open(output_path, 'rb') as f:
+                            data = f.read()
+                    finally:
+                        os.unlink(output_path)
+                    if key is not None and len(data) <= cache.max_item_bytes:
+                        cache.put(key, data)
+                    yield name, data, None
+            reporter.finish()
+        finally:
+            # Remove inputs left behind if the caller stopped early
+            for _, input_path, _ in jobs.values():
+                if os.path.exists(input_path):
+                    os.unlink(input_path)
+
+    def convert_many_to_zip(self, input_files, writer, output_format, max_workers=None, progress=None, **options):
+        """Run convert_many and write each result into a ZIP as soon as it finishes.
+
+        Returns a list of (input_name, error) pairs for the files that failed.
+        """
+        failures = []
+        used_names = set()
+        with zipfile.ZipFile(writer, 'w', compression=zipfile.ZIP_DEFLATED) as zip_out:
+            for name, data, error in self.convert_many(input_files, output_format, max_workers, progress,
+                                                       **options):
+                if error is not None:
+                    failures.append((name, error))
+                    continue
+                arcname = self._batch_output_name(name, output_format, used_names)
+                zip_out.writestr(arcname, data)
+        return failures
+
+    def _batch_output_name(self, input_name, output_format, used_names):
+        """Build a unique archive name for a converted file."""
+        stem = os.path.splitext(os.path.basename(input_name))[0] or 'file'
+        arcname = f"{stem}.{output_format}"
+        counter = 1
+        while arcname in used_names:
+            arcname = f"{stem}_{counter}.{output_format}"
+            counter += 1
+        used_names.add(arcname)
+        return arcname
+
+    def submit(self, reader, output_format, **options):
+        """Queue a conversion on the background job queue and return its job id.
+
+        Options must be JSON serializable. Poll get_job_queue().status(job_id)
+        for its progress and fetch the output with result_path(job_id) once
+        it is done.
+        """
+        return get_job_queue().submit(self, reader, output_format, **options)
+
     def get_supported_formats(self):
         return self.supported_formats
 
-    def render_ui(self):
-        st.markdown(f"## {self.icon} {self.title}")
-        st.write(self.description)
-        
-        uploaded_file = st.file_uploader("Choose a file", type=list(self.supported_formats.keys()))
-        
-        if uploaded_file:
-            output_format = st.selectbox(
-                "Select output format",
-                options=self.supported_formats.get(uploaded_file.name.split('.')[-1].lower(), [])
-            )
-            
-            if st.button("Convert"):
-                try:
-                    output_file = self.convert(uploaded_file, output_format)
-                    st.success("Conversion completed successfully!")
-                    st.download_button(
-                        label="Download converted file",
-                        data=output_file,
-                        file_name=f"converted.{output_format}",
-                        mime=f"application/{output_format}"
-                    )
-                except Exception as e:
-                    st.error(f"Error during conversion: {str(e)}") 
\ No newline at end of file
+    def _get_input_format(self, reader):
+        """Work out the input format from the reader's file name, checked against its magic bytes.
+
+        A misnamed file whose content is another supported format is read
+        as that format; content that cannot be converted raises ValueError
+        from the first few KB, before any decoding. Call it before reading.
+        """
+        name = getattr(reader, 'name', '') or ''
+        declared = str(name).split('.')[-1].lower() if '.' in str(name) else ''
+        if not getattr(reader, 'seekable', lambda: False)():
+            return declared
+        return resolve_format(read_header(reader), declared, self.supported_formats)
+
+    def _stream_size(self, reader):
+        """Bytes left to read in a seekable reader, or None if it cannot tell."""
+        try:
+            start = reader.tell()
+            end = reader.seek(0, os.SEEK_END)
+            reader.seek(start)
+        except (AttributeError, OSError, ValueError):
+            return None
+        return end - start
+
+    def _spool_to_file(self, reader, suffix=''):
+        """Copy a reader into a named temporary file for backends that need a path.
+
+        The caller is responsible for deleting the returned path.
+        """
+        with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as temp_file:
+            shutil.copyfileobj(reader, temp_file, CHUNK_SIZE)
+            return temp_file.name
+
+    def _copy_file_to_writer(self, path, writer):
+        with open(path, 'rb') as f:
+            shutil.copyfileobj(f, writer, CHUNK_SIZE)
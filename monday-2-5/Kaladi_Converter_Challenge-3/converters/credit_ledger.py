@@ -0,0 +1,214 @@
+import random
+import sqlite3
+import threading
+import time
+
+# Seconds a cached balance is shown before it is read again. Spending never
+# trusts the cache blindly: updates are conditional on the cached values
+BALANCE_TTL = 30
+# Attempts at a conditional update before giving up on a busy row
+UPDATE_RETRIES = 5
+# Longest random wait before the first retry, doubled for each one after it
+RETRY_BACKOFF = 0.05
+
+TABLE = "user_credits"
+
+SQLITE_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS {TABLE} (
+    id TEXT PRIMARY KEY,
+    email TEXT,
+    free_credits_used INTEGER NOT NULL DEFAULT 0,
+    paid_credits INTEGER NOT NULL DEFAULT 0
+);
+"""
+
+class SupabaseBackend:
+    """The user_credits table in Supabase.
+
+    Reads and user updates go through `client`; new rows and credits added
+    after payment go through `admin_client`, as row-level security requires.
+    """
+
+    def __init__(self, client, admin_client):
+        self.client = client
+        self.admin_client = admin_client
+
+    def fetch(self, user_id):
+        res = self.client.table(TABLE).select('*').eq('id', user_id).execute()
+        return res.data[0] if res.data else None
+
+    def insert(self, row):
+        return self.admin_client.table(TABLE).insert(row).execute().data[0]
+
+    def compare_and_set(self, user_id, expected, values, privileged=False):
+        """Update the row only if it still holds `expected`; return the new row, or None if it did not."""
+        client = self.admin_client if privileged else self.client
+        query = client.table(TABLE).update(values).eq('id', user_id)
+        for column, value in expected.items():
+            query = query.eq(column, value)
+        res = query.execute()
+        return res.data[0] if res.data else None
+
+class SQLiteBackend:
+    """A local user_credits table with the same interface, for development and benchmarks."""
+
+    def __init__(self, path=":memory:"):
+        self._conn = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.executescript(SQLITE_SCHEMA)
+        self._lock = threading.Lock()
+
+    def fetch(self, user_id):
+        with self._lock:
+            row = self._conn.execute(f"SELECT * FROM {TABLE} WHERE id = ?", (user_id,)).fetchone()
+        return dict(row) if row else None
+
+    def insert(self, row):
+        columns = ", ".join(row)
+        with self._lock:
+            self._conn.execute(f"INSERT INTO {TABLE} ({columns}) VALUES ({', '.join('?' * len(row))})",
+                               tuple(row.values()))
+        return self.fetch(row['id'])
+
+    def compare_and_set(self, user_id, expected, values, privileged=False):
+        assignments = ", ".join(f"{column} = ?" for column in values)
+        conditions = "".join(f" AND {column} = ?" for column in expected)
+        with self._lock:
+            cursor = self._conn.execute(f"UPDATE {TABLE} SET {assignments} WHERE id = ?{conditions}",
+                                        (*values.values(), user_id, *expected.values()))
+            if cursor.rowcount == 0:
+                return None
+            row = self._conn.execute(f"SELECT * FROM {TABLE} WHERE id = ?", (user_id,)).fetchone()
+        return dict(row)
+
+class BalanceCache:
+    """Credit rows by user id, each trusted for `ttl` seconds."""
+
+    def __init__(self, ttl=BALANCE_TTL):
+        self.ttl = ttl
+        self._rows = {}
+        self._lock = threading.Lock()
+
+    def get(self, user_id):
+        with self._lock:
+            entry = self._rows.get(user_id)
+            if entry is None or entry[0] < time.monotonic():
+                return None
+            return dict(entry[1])
+
+    def put(self, user_id, row):
+        with self._lock:
+            self._rows[user_id] = (time.monotonic() + self.ttl, dict(row))
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._rows.pop(user_id, None)
+
+# Shared by every ledger in the process, so balances survive Streamlit reruns
+default_balances = BalanceCache()
+
+class CreditLedger:
+    """Credit balances with a read cache and race-free updates.
+
+    Every change is one conditional update computed from the cached row:
+    it only applies if the stored row still matches, so two sessions
+    spending at once cannot both use the same credit. When it does not
+    match, the cached row was stale or another session won; the ledger
+    re-reads and retries. A click therefore costs one round trip while the
+    cache is fresh, and two when it is not.
+    """
+
+    def __init__(self, backend, free_limit=5, cache=default_balances, retries=UPDATE_RETRIES):
+        self.backend = backend
+        self.free_limit = free_limit
+        self.cache = cache
+        self.retries = retries
+
+    def balance(self, user_id, user_email=None):
+        """Return the user's credit row, creating it on first use."""
+        row = self.cache.get(user_id)
+        if row is not None:
+            return row
+        row = self.backend.fetch(user_id)
+        if row is None:
+            row = self.backend.insert({
+                "id": user_id,
+                "email": user_email,
+                "free_credits_used": 0,
+                "paid_credits": 0
+            })
+        self.cache.put(user_id, row)
+        return row
+
+    def reserve(self, user_id, user_email, count):
+        """Take `count` credits at once, free ones first, or none if the user has fewer.
+
+        Returns {"free": n, "paid": n}, what was taken from each allowance,
+        for refund(). Raises ValueError if the balance is too low.
+        """
+        reservation = {}
+
+        def take(row):
+            free = min(count, max(0, self.free_limit - row['free_credits_used']))
+            paid = count - free
+            if paid > row['paid_credits']:
+                available = free + row['paid_credits']
+                raise ValueError("No credits left" if available == 0 else
+                                 f"Not enough credits: {count} needed, {available} left")
+            reservation.update(free=free, paid=paid)
+            return {
+                "free_credits_used": row['free_credits_used'] + free,
+                "paid_credits": row['paid_credits'] - paid
+            }
+
+        self.apply(user_id, user_email, take)
+        return reservation
+
+    def refund(self, user_id, user_email, reservation, count):
+        """Give back `count` credits of a reservation, paid ones first."""
+        paid = min(count, reservation['paid'])
+        free = min(count - paid, reservation['free'])
+        self.apply(user_id, user_email, lambda row: {
+            "free_credits_used": max(0, row['free_credits_used'] - free),
+            "paid_credits": row['paid_credits'] + paid
+        })
+
+    def add_paid(self, user_id, user_email, count):
+        """Add purchased credits; runs with the backend's privileged client."""
+        return self.apply(user_id, user_email, lambda row: {"paid_credits": row['paid_credits'] + count},
+                          privileged=True)
+
+    def apply(self, user_id, user_email, change, privileged=False):
+        """Apply change(row) -> new column values as a conditional update and return the new row.
+
+        Exceptions raised by `change` (e.g. too few credits) propagate
+        unchanged; RuntimeError is raised if the row keeps changing.
+        """
+        for attempt in range(self.retries):
+            if attempt:
+                # Random waits spread out sessions that keep colliding on the same row
+                time.sleep(random.uniform(0, RETRY_BACKOFF * 2 ** (attempt - 1)))
+            row = self.balance(user_id, user_email)
+            try:
+                values = change(row)
+            except ValueError:
+                # Refuse on a fresh balance only, not on a cached one that may be out of date
+                self.cache.invalidate(user_id)
+                row = self.balance(user_id, user_email)
+                values = change(row)
+
+            expected = {column: row[column] for column in ('free_credits_used', 'paid_credits')}
+            try:
+                updated = self.backend.compare_and_set(user_id, expected, values, privileged)
+            except Exception:
+                # The update may or may not have landed; make the next read go to the backend
+                self.cache.invalidate(user_id)
+                raise
+            if updated is not None:
+                self.cache.put(user_id, updated)
+                return updated
+            self.cache.invalidate(user_id)
+        raise RuntimeError("Credits changed while updating them, please try again")
+
+    def invalidate(self, user_id):
+        self.cache.invalidate(user_id)
@@ -1,26 +1,91 @@
 
 from .base_converter import BaseConverter
-from docx2pdf import convert
-from docx import Document
 import io
-import PyPDF2
 import streamlit as st
-from pdf2image import convert_from_bytes
-import pythoncom
-import comtypes.client
-from typing import Union
+from .pdf_raster import rasterize_pdf
+from .progress import ProgressReporter
+from .office_pool import CONVERT_TIMEOUT, get_office_pool
+from .backend_registry import BackendRegistry
+from typing import BinaryIO, Iterator, Optional, Union
 import warnings
 import tempfile
 import os
 import subprocess
-from reportlab.lib.pagesizes import letter
-from reportlab.platypus import SimpleDocTemplate, Paragraph
-from reportlab.lib.styles import getSampleStyleSheet
+import shutil
+import sys
+import time
+import importlib.util
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 import logging
 
+# python-docx, PyPDF2 and reportlab are imported in the conversions that
+# need them, so loading the page stays cheap
+
 # Setup logging for debugging
 logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s')
 
+# PDFs with at least this many pages have their text extracted in a process pool
+PARALLEL_TEXT_MIN_PAGES = 64
+# Minimum pages parsed per worker task; each task reopens the PDF, so tasks
+# grow with the document to keep that cost to a few opens per worker
+TEXT_PAGES_PER_TASK = 16
+
+def _page_text(page) -> str:
+    text = page.extract_text() if hasattr(page, 'extract_text') else page.extractText()
+    return text or ""
+
+def _extract_text_run(pdf_path: str, start: int, stop: int) -> list:
+    """Worker task: return the text of pages [start, stop)."""
+    import PyPDF2
+    pdf_reader = PyPDF2.PdfReader(pdf_path)
+    return [_page_text(pdf_reader.pages[i]) for i in range(start, stop)]
+
+def iter_pdf_text(pdf_reader, pdf_path: Optional[str] = None, workers: Optional[int] = None) -> Iterator[str]:
+    """Yield the text of each page in order as soon as it is parsed.
+
+    With `pdf_path` set, large documents are parsed by a process pool; only
+    a few runs of pages are in flight at once, so memory stays bounded.
+    """
+    if hasattr(pdf_reader, 'pages'):
+        pages = pdf_reader.pages
+    else:
+        pages = [pdf_reader.getPage(i) for i in range(pdf_reader.getNumPages())]
+    page_count = len(pages)
+    workers = workers or os.cpu_count() or 1
+
+    if pdf_path is None or workers == 1 or page_count < PARALLEL_TEXT_MIN_PAGES or not hasattr(pdf_reader, 'pages'):
+        for page in pages:
+            yield _page_text(page)
+        return
+
+    pages_per_task = max(TEXT_PAGES_PER_TASK, -(-page_count // (workers * 4)))
+    runs = iter(range(0, page_count, pages_per_task))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        in_flight = deque()
+        while True:
+            while len(in_flight) < workers * 2:
+                start = next(runs, None)
+                if start is None:
+                    break
+                stop = min(start + pages_per_task, page_count)
+                in_flight.append(executor.submit(_extract_text_run, pdf_path, start, stop))
+            if not in_flight:
+                break
+            # Runs are yielded in page order, whichever worker finishes first
+            yield from in_flight.popleft().result()
+
+def _has_modules(*names: str) -> bool:
+    return all(importlib.util.find_spec(name) is not None for name in names)
+
+# DOCX to PDF backends, probed once per process and ranked by how they perform
+DOCX_TO_PDF_BACKENDS = BackendRegistry()
+DOCX_TO_PDF_BACKENDS.register("docx2pdf", lambda: sys.platform == "win32" and _has_modules("docx2pdf", "pythoncom"))
+DOCX_TO_PDF_BACKENDS.register("comtypes", lambda: sys.platform == "win32" and _has_modules("comtypes"))
+DOCX_TO_PDF_BACKENDS.register("LibreOffice", lambda: shutil.which("soffice") is not None)
+# Text only, so it is the last resort whatever its success rate
+DOCX_TO_PDF_BACKENDS.register("reportlab", tier=1)
+
 class DocumentConverter(BaseConverter):
     def __init__(self):
         super().__init__()
@@ -36,9 +101,32 @@ class DocumentConverter(BaseConverter):
             'rtf': ['docx', 'pdf']
         }
         warnings.filterwarnings("ignore", category=UserWarning)
+        DOCX_TO_PDF_BACKENDS.probe_all()
+        self._docx_to_pdf_methods = {
+            "docx2pdf": self._convert_docx_to_pdf_docx2pdf,
+            "comtypes": self._convert_docx_to_pdf_comtypes,
+            "LibreOffice": self._convert_docx_to_pdf_libreoffice,
+            "reportlab": self._convert_docx_to_pdf_reportlab,
+        }
 
-    def _validate_pdf(self, file_bytes: bytes) -> PyPDF2.PdfReader:
+    def _convert_docx_to_pdf(self, input_path: str, output_path: str) -> bytes:
+        """Try the DOCX to PDF backends that work here, best performing first."""
+        for method in DOCX_TO_PDF_BACKENDS.ordered():
+            logging.debug(f"Trying {method} conversion")
+            start = time.perf_counter()
+            try:
+                pdf_bytes = self._docx_to_pdf_methods[method](input_path, output_path)
+            except Exception as e:
+                DOCX_TO_PDF_BACKENDS.record(method, False, time.perf_counter() - start)
+                logging.error(f"{method} failed: {str(e)}")
+                continue
+            DOCX_TO_PDF_BACKENDS.record(method, True, time.perf_counter() - start)
+            return pdf_bytes
+        raise ValueError("All conversion methods failed")
+
+    def _validate_pdf(self, file_bytes: bytes) -> "PyPDF2.PdfReader":
         """Validate PDF file and return reader object."""
+        import PyPDF2
         try:
             try:
                 pdf_reader = PyPDF2.PdfReader(io.BytesIO(file_bytes))
@@ -55,6 +143,9 @@ class DocumentConverter(BaseConverter):
 
     def _convert_docx_to_pdf_docx2pdf(self, input_path: str, output_path: str) -> bytes:
         """Convert DOCX to PDF using docx2pdf."""
+        # Windows-only COM modules are imported on use so the module loads everywhere
+        import pythoncom
+        from docx2pdf import convert
         try:
             pythoncom.CoInitialize()
             convert(input_path, output_path)
@@ -67,6 +158,7 @@ class DocumentConverter(BaseConverter):
 
     def _convert_docx_to_pdf_comtypes(self, input_path: str, output_path: str) -> bytes:
         """Convert DOCX to PDF using comtypes."""
+        import comtypes.client
         try:
             word = comtypes.client.CreateObject("Word.Application")
             doc = word.Documents.Open(os.path.abspath(input_path))
@@ -80,11 +172,20 @@ class DocumentConverter(BaseConverter):
 
     def _convert_docx_to_pdf_libreoffice(self, input_path: str, output_path: str) -> bytes:
         """Convert DOCX to PDF using LibreOffice."""
+        # Prefer a warm worker; a fresh soffice costs seconds of startup
+        pool = get_office_pool()
+        if pool is not None:
+            try:
+                pool.convert(input_path, output_path)
+                with open(output_path, 'rb') as f:
+                    return f.read()
+            except Exception as e:
+                logging.warning(f"LibreOffice pool failed, starting soffice directly: {str(e)}")
         try:
             subprocess.run([
                 "soffice", "--headless", "--convert-to", "pdf",
                 input_path, "--outdir", os.path.dirname(output_path)
-            ], check=True, capture_output=True, text=True)
+            ], check=True, capture_output=True, text=True, timeout=CONVERT_TIMEOUT)
             output_pdf = os.path.join(os.path.dirname(output_path), os.path.basename(input_path).rsplit('.', 1)[0] + '.pdf')
             with open(output_pdf, 'rb') as f:
                 pdf_bytes = f.read()
@@ -92,11 +193,17 @@ class DocumentConverter(BaseConverter):
             return pdf_bytes
         except subprocess.CalledProcessError as e:
             raise ValueError(f"LibreOffice conversion failed: {e.stderr}")
+        except subprocess.TimeoutExpired:
+            raise ValueError(f"LibreOffice conversion took longer than {CONVERT_TIMEOUT}s")
         except FileNotFoundError:
             raise ValueError("LibreOffice not installed or 'soffice' not in PATH")
 
     def _convert_docx_to_pdf_reportlab(self, input_path: str, output_path: str) -> bytes:
         """Convert DOCX to PDF using python-docx and reportlab (basic formatting)."""
+        from docx import Document
+        from reportlab.lib.pagesizes import letter
+        from reportlab.platypus import SimpleDocTemplate, Paragraph
+        from reportlab.lib.styles import getSampleStyleSheet
         try:
             if not os.path.exists(input_path):
                 raise FileNotFoundError(f"Input file not found at {input_path}")
@@ -111,10 +218,20 @@ class DocumentConverter(BaseConverter):
         except Exception as e:
             raise ValueError(f"reportlab conversion failed: {str(e)}")
 
-    def convert(self, input_file: Union[io.BytesIO, st.runtime.uploaded_file_manager.UploadedFile], 
-                output_format: str) -> bytes:
-        input_format = input_file.name.split('.')[-1].lower()
-        file_bytes = input_file.getvalue()
+    def _count_pages(self, page_texts: Iterator[str], reporter: ProgressReporter) -> Iterator[str]:
+        for text in page_texts:
+            reporter.advance()
+            yield text
+
+    def convert_stream(self, reader: Union[io.BytesIO, st.runtime.uploaded_file_manager.UploadedFile],
+                       writer: BinaryIO, output_format: str, pages: str = "1", dpi: int = 200,
+                       workers: Optional[int] = None, progress=None) -> None:
+        """Convert a document. For PDF to PNG/JPG, `pages` selects the pages
+        ("1-3,5" or "all"); several pages are returned as a ZIP. `workers`
+        sizes the process pool used for large PDFs. Progress counts PDF
+        pages read or rendered."""
+        input_format = self._get_input_format(reader)
+        file_bytes = reader.read()
         
         if input_format == output_format.lower():
             raise ValueError(f"Source file is already in {output_format.upper()} format. No conversion needed.")
@@ -132,80 +249,63 @@ class DocumentConverter(BaseConverter):
 
             if input_format in ['doc', 'docx']:
                 if output_format == 'pdf':
-                    logging.debug(f"Attempting DOCX to PDF conversion for {input_file.name}")
-                    # Try conversion methods in order
-                    for method, func in [
-                        ("docx2pdf", self._convert_docx_to_pdf_docx2pdf),
-                        ("comtypes", self._convert_docx_to_pdf_comtypes),
-                        ("LibreOffice", self._convert_docx_to_pdf_libreoffice),
-                        ("reportlab", self._convert_docx_to_pdf_reportlab)
-                    ]:
-                        try:
-                            logging.debug(f"Trying {method} conversion")
-                            return func(temp_docx_path, temp_pdf_path)
-                        except Exception as e:
-                            logging.error(f"{method} failed: {str(e)}")
-                            continue
-                    raise ValueError("All conversion methods failed")
+                    logging.debug(f"Attempting DOCX to PDF conversion for {getattr(reader, 'name', 'document')}")
+                    writer.write(self._convert_docx_to_pdf(temp_docx_path, temp_pdf_path))
+                    return
                 
                 elif output_format == 'txt':
+                    from docx import Document
                     doc = Document(io.BytesIO(file_bytes))
                     text = "\n".join([para.text for para in doc.paragraphs])
-                    return text.encode('utf-8')
+                    writer.write(text.encode('utf-8'))
+                    return
 
             elif input_format == 'pdf':
                 if output_format in ['docx', 'txt']:
                     pdf_reader = self._validate_pdf(file_bytes)
-                    text = ""
-                    pages = pdf_reader.pages if hasattr(pdf_reader, 'pages') else [pdf_reader.getPage(i) for i in range(pdf_reader.getNumPages())]
-                    for page in pages:
-                        page_text = page.extract_text() if hasattr(page, 'extract_text') else page.extractText()
-                        if page_text:
-                            text += page_text + "\n"
+                    temp_pdf.write(file_bytes)
+                    temp_pdf.close()
+                    page_count = len(pdf_reader.pages) if hasattr(pdf_reader, 'pages') else pdf_reader.getNumPages()
+                    reporter = ProgressReporter.of(progress, unit="pages", total=page_count)
+                    page_texts = (text for text in self._count_pages(iter_pdf_text(pdf_reader, temp_pdf_path, workers),
+                                                                     reporter) if text)
                     if output_format == 'txt':
-                        return text.encode('utf-8')
+                        # Each page goes out as soon as it is parsed
+                        for page_text in page_texts:
+                            writer.write((page_text + "\n").encode('utf-8'))
+                        return
                     else:
+                        from docx import Document
                         doc = Document()
-                        doc.add_paragraph(text)
-                        output = io.BytesIO()
-                        doc.save(output)
-                        return output.getvalue()
+                        for page_text in page_texts:
+                            doc.add_paragraph(page_text)
+                        doc.save(writer)
+                        return
                 
                 elif output_format in ['png', 'jpg']:
-                    images = convert_from_bytes(file_bytes, first_page=1, last_page=1)
-                    if not images:
-                        raise ValueError("No images found in PDF")
-                    output = io.BytesIO()
-                    if output_format == 'jpg':
-                        images[0].convert('RGB').save(output, format='JPEG', quality=95)
-                    else:
-                        images[0].save(output, format='PNG')
-                    return output.getvalue()
+                    # Pages are rendered in worker processes and streamed out
+                    temp_pdf.write(file_bytes)
+                    temp_pdf.close()
+                    rasterize_pdf(temp_pdf_path, writer, output_format, pages=pages, dpi=dpi,
+                                  quality=95, workers=workers, progress=progress)
+                    return
 
             elif input_format == 'txt':
                 text = file_bytes.decode('utf-8')
                 if output_format == 'docx':
+                    from docx import Document
                     doc = Document()
                     doc.add_paragraph(text)
-                    output = io.BytesIO()
-                    doc.save(output)
-                    return output.getvalue()
+                    doc.save(writer)
+                    return
                 elif output_format == 'pdf':
-                    temp_docx.write(file_bytes)
-                    temp_docx.close()
-                    for method, func in [
-                        ("docx2pdf", self._convert_docx_to_pdf_docx2pdf),
-                        ("comtypes", self._convert_docx_to_pdf_comtypes),
-                        ("LibreOffice", self._convert_docx_to_pdf_libreoffice),
-                        ("reportlab", self._convert_docx_to_pdf_reportlab)
-                    ]:
-                        try:
-                            logging.debug(f"Trying {method} conversion for TXT to PDF")
-                            return func(temp_docx_path, temp_pdf_path)
-                        except Exception as e:
-                            logging.error(f"{method} failed: {str(e)}")
-                            continue
-                    raise ValueError("All conversion methods failed")
+                    # Wrap the text in a real DOCX so it can use the same PDF backends
+                    from docx import Document
+                    doc = Document()
+                    doc.add_paragraph(text)
+                    doc.save(temp_docx_path)
+                    writer.write(self._convert_docx_to_pdf(temp_docx_path, temp_pdf_path))
+                    return
 
             raise NotImplementedError(f"Conversion from {input_format} to {output_format} is not currently supported.")
 
@@ -0,0 +1,150 @@
+import heapq
+import importlib
+import inspect
+import os
+import tempfile
+import threading
+import time
+from .formats import canonical_format, read_header, resolve_format
+from .progress import ProgressReporter
+
+# Converters whose supported_formats make up the graph, as 'module:ClassName'
+CONVERTER_PATHS = [
+    "converters.image_converter:ImageConverter",
+    "converters.document_converter:DocumentConverter",
+    "converters.spreadsheet_converter:SpreadsheetConverter",
+    "converters.audio_converter:AudioConverter",
+    "converters.video_converter:VideoConverter",
+    "converters.archive_converter:ArchiveConverter",
+]
+
+# Seconds per MB assumed for an edge until it has been timed
+DEFAULT_EDGE_COST = 1.0
+# Weight of the newest timing in an edge's moving average
+COST_SMOOTHING = 0.3
+# Longest chain of conversions a route may use
+MAX_HOPS = 4
+
+_MB = 1024 * 1024
+
+class FormatGraph:
+    """Every converter's supported_formats as one directed graph of formats.
+
+    Each edge is a single convert_stream call and carries its measured cost
+    in seconds per MB of input, so route() picks the cheapest chain, e.g.
+    DOCX -> PDF -> PNG, and convert() runs it through temporary files.
+    """
+
+    def __init__(self):
+        self.edges = {}  # source format -> {target format: converter}
+        self.costs = {}  # (source, target) -> seconds per MB
+        self._lock = threading.Lock()
+
+    def add_converter(self, converter):
+        for source, targets in converter.supported_formats.items():
+            outgoing = self.edges.setdefault(canonical_format(source), {})
+            for target in targets:
+                # The first converter registered for a pair keeps it
+                outgoing.setdefault(canonical_format(target), converter)
+
+    def formats(self):
+        return set(self.edges) | {target for outgoing in self.edges.values() for target in outgoing}
+
+    def edge_cost(self, source, target):
+        return self.costs.get((source, target), DEFAULT_EDGE_COST)
+
+    def record(self, source, target, seconds, size):
+        """Fold one timed conversion into the edge's cost (sizes under 1 MB count as 1 MB)."""
+        per_mb = seconds / max(size / _MB, 1.0)
+        with self._lock:
+            previous = self.costs.get((source, target))
+            self.costs[(source, target)] = per_mb if previous is None else (
+                COST_SMOOTHING * per_mb + (1 - COST_SMOOTHING) * previous)
+
+    def route(self, source, target):
+        """Return the cheapest list of formats from source to target, both included.
+
+        Raises ValueError if no chain of at most MAX_HOPS conversions exists.
+        """
+        source, target = canonical_format(source), canonical_format(target)
+        if source == target:
+            return [source]
+        # Dijkstra over (cost, hops, format, path); hops break ties towards shorter chains
+        queue = [(0.0, 0, source, [source])]
+        settled = set()
+        while queue:
+            cost, hops, fmt, path = heapq.heappop(queue)
+            if fmt == target:
+                return path
+            if fmt in settled or hops == MAX_HOPS:
+                continue
+            settled.add(fmt)
+            for following in self.edges.get(fmt, {}):
+                if following not in settled:
+                    heapq.heappush(queue, (cost + self.edge_cost(fmt, following), hops + 1, following,
+                                           path + [following]))
+        raise ValueError(f"No conversion route from {source} to {target}")
+
+    def convert(self, reader, writer, output_format, input_format=None, progress=None, **options):
+        """Convert along the cheapest route, timing each hop to refine its cost.
+
+        The input format comes from the reader's name and magic bytes unless
+        given. Each option goes only to the hops whose convert_stream accepts
+        it. `progress` counts finished hops ("steps"). Returns the route taken.
+        """
+        if input_format is None:
+            declared = str(getattr(reader, 'name', '') or '').rsplit('.', 1)[-1]
+            input_format = resolve_format(read_header(reader), declared, self.edges)
+        path = self.route(input_format, output_format)
+        reporter = ProgressReporter.of(progress, unit="steps", total=len(path) - 1)
+
+        # Intermediate outputs are temporary files, deleted once read or if a hop fails
+        temp_files = []
+        source_reader = reader
+        try:
+            for source, target in zip(path, path[1:]):
+                last = target == path[-1]
+                if last:
+                    target_writer = writer
+                else:
+                    target_writer = tempfile.NamedTemporaryFile(suffix=f'.{target}')
+                    temp_files.append(target_writer)
+                converter = self.edges[source][target]
+
+                start_position = source_reader.tell()
+                started = time.perf_counter()
+                converter.convert_stream(source_reader, target_writer, target,
+                                         **_accepted_options(converter, options))
+                size = source_reader.seek(0, os.SEEK_END) - start_position
+                self.record(source, target, time.perf_counter() - started, size)
+                reporter.advance()
+
+                if source_reader is not reader:
+                    source_reader.close()
+                if not last:
+                    target_writer.seek(0)
+                    source_reader = target_writer
+        finally:
+            for temp_file in temp_files:
+                temp_file.close()
+        reporter.finish()
+        return path
+
+def _accepted_options(converter, options):
+    parameters = inspect.signature(converter.convert_stream).parameters
+    return {name: value for name, value in options.items() if name in parameters}
+
+_graph = None
+_graph_lock = threading.Lock()
+
+def get_format_graph():
+    """Return the process-wide format graph, loading the converters on first use."""
+    global _graph
+    with _graph_lock:
+        if _graph is None:
+            graph = FormatGraph()
+            for path in CONVERTER_PATHS:
+                module_name, class_name = path.split(':')
+                graph.add_converter(getattr(importlib.import_module(module_name), class_name)())
+            _graph = graph
+        return _graph
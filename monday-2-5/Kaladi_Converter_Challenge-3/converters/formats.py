@@ -0,0 +1,226 @@
+import codecs
+import re
+
+# Bytes read from the start of a file to identify it; tar's magic sits at offset 257
+HEADER_SIZE = 4096
+
+# Extensions that name the same format
+ALIASES = {
+    'jpeg': 'jpg',
+    'tif': 'tiff',
+    'mpeg4': 'mp4',
+    'htm': 'html',
+    'yml': 'yaml'
+}
+
+# (offset, magic bytes, format), checked in order; the first match wins
+SIGNATURES = [
+    (0, b'%PDF-', 'pdf'),
+    (0, b'\x89PNG\r\n\x1a\n', 'png'),
+    (0, b'\xff\xd8\xff', 'jpg'),
+    (0, b'GIF87a', 'gif'),
+    (0, b'GIF89a', 'gif'),
+    (0, b'II*\x00', 'tiff'),
+    (0, b'MM\x00*', 'tiff'),
+    (0, b'PK\x03\x04', 'zip'),
+    (0, b'PK\x05\x06', 'zip'),
+    (0, b"7z\xbc\xaf'\x1c", '7z'),
+    (0, b'Rar!\x1a\x07', 'rar'),
+    (0, b'\x1f\x8b', 'gz'),
+    (0, b'BZh', 'bz2'),
+    (257, b'ustar', 'tar'),
+    (0, b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1', 'ole'),
+    (0, b'{\\rtf', 'rtf'),
+    (0, b'fLaC', 'flac'),
+    (0, b'OggS', 'ogg'),
+    (0, b'ID3', 'mp3'),
+    (4, b'ftyp', 'isobmff'),
+    # QuickTime files may open with another top-level atom instead of ftyp
+    (4, b'moov', 'isobmff'),
+    (4, b'mdat', 'isobmff'),
+    (4, b'wide', 'isobmff'),
+    (4, b'free', 'isobmff'),
+    (4, b'skip', 'isobmff'),
+    (4, b'pnot', 'isobmff'),
+    (0, b'\x1aE\xdf\xa3', 'matroska'),
+    (0, b'FLV', 'flv'),
+    (0, b'0&\xb2u\x8ef\xcf\x11', 'wmv'),
+    (0, b'PAR1', 'parquet'),
+    (0, b'ARROW1', 'arrow'),
+    (0, b'\xff\xff\xff\xff', 'arrow'),
+    (0, b'BM', 'bmp'),
+]
+
+# Signatures of four bytes or fewer that ordinary text can start with
+# (e.g. "BMW,Audi" or "I'm free"); they only count if the header is not text
+WEAK_SIGNATURES = {b'BM', b'FLV', b'ID3', b'BZh', b'moov', b'mdat', b'wide', b'free', b'skip', b'pnot'}
+
+# RIFF files say what they hold at offset 8
+RIFF_TYPES = {
+    b'WAVE': 'wav',
+    b'AVI ': 'avi',
+    b'WEBP': 'webp'
+}
+
+# Containers shared by several formats: a file named as any member is taken at its word
+FAMILIES = {
+    'zip': {'zip', 'docx', 'xlsx', 'pptx', 'odt', 'ods', 'odp', 'epub', 'jar'},
+    'ole': {'doc', 'xls', 'ppt', 'msg'},
+    'isobmff': {'mp4', 'mov', 'm4a', '3gp'},
+    'matroska': {'mkv', 'webm'},
+    'arrow': {'arrow', 'feather'},
+    'text': {'txt', 'csv', 'tsv', 'svg', 'json', 'xml', 'html', 'md', 'yaml', 'rtf',
+             'py', 'js', 'java', 'c', 'cpp', 'cs', 'php', 'rb', 'go', 'rs', 'swift'}
+}
+
+# Format assumed for a container whose exact member the header cannot tell
+FAMILY_DEFAULTS = {
+    'zip': 'zip',
+    'isobmff': 'mp4',
+    'matroska': 'mkv',
+    'arrow': 'arrow'
+}
+
+# Zip-based formats, told apart by their first entry
+ZIP_MEMBER_FORMATS = [
+    (b'mimetypeapplication/vnd.oasis.opendocument.text', 'odt'),
+    (b'mimetypeapplication/vnd.oasis.opendocument.spreadsheet', 'ods'),
+    (b'mimetypeapplication/epub+zip', 'epub'),
+    (b'word/', 'docx'),
+    (b'xl/', 'xlsx'),
+    (b'ppt/', 'pptx')
+]
+
+# python-magic MIME types for formats the signature table does not cover
+MIME_FORMATS = {
+    'audio/mpeg': 'mp3',
+    'audio/x-wav': 'wav',
+    'video/mp4': 'isobmff',
+    'video/quicktime': 'isobmff',
+    'video/x-ms-asf': 'wmv',
+    'image/svg+xml': 'svg',
+    'image/webp': 'webp',
+    'application/zip': 'zip',
+    'application/x-tar': 'tar'
+}
+
+_SVG = re.compile(rb'<svg[\s>]')
+# Control bytes that do not occur in text (tab, newlines, form feed and escape do)
+_CONTROL_BYTES = bytes(b for b in range(32) if b not in b'\t\n\r\x0c\x1b')
+
+def canonical_format(fmt):
+    """Lower-case a format name and resolve aliases such as jpeg -> jpg."""
+    fmt = str(fmt or '').lower().lstrip('.')
+    return ALIASES.get(fmt, fmt)
+
+def read_header(reader, size=HEADER_SIZE):
+    """Return the first bytes of a seekable reader without moving it."""
+    start = reader.tell()
+    header = reader.read(size)
+    reader.seek(start)
+    return header
+
+def sniff_format(header, use_libmagic=True):
+    """Identify content from its first bytes.
+
+    Returns a format, a family name from FAMILIES when the bytes only narrow
+    it down to a container, 'text' for text, or None if nothing matched.
+    libmagic is only consulted when the signature table has no answer.
+    """
+    if header[:4] == b'RIFF':
+        return RIFF_TYPES.get(header[8:12])
+    for offset, magic_bytes, fmt in SIGNATURES:
+        if header.startswith(magic_bytes, offset):
+            if magic_bytes in WEAK_SIGNATURES and _looks_like_text(header):
+                break
+            if fmt == 'zip':
+                return _sniff_zip(header)
+            return fmt
+    # MPEG audio frames start with an 11-bit sync word
+    if len(header) >= 2 and header[0] == 0xff and header[1] & 0xe0 == 0xe0:
+        return 'mp3'
+    if _looks_like_text(header):
+        return 'svg' if _SVG.search(header[:1024]) else 'text'
+    return _sniff_with_libmagic(header) if use_libmagic else None
+
+def _sniff_zip(header):
+    # The first local header's name starts at byte 30
+    for marker, fmt in ZIP_MEMBER_FORMATS:
+        if header.startswith(marker, 30):
+            return fmt
+    if b'[Content_Types].xml' in header[:256]:
+        for marker, fmt in ZIP_MEMBER_FORMATS[3:]:
+            if marker in header:
+                return fmt
+    return 'zip'
+
+def _looks_like_text(header):
+    if header.startswith((b'\xef\xbb\xbf', b'\xff\xfe', b'\xfe\xff')):
+        return True
+    if not header or header.translate(None, _CONTROL_BYTES) != header:
+        return False
+    try:
+        # Not final, so a character cut off by the header size still counts as text
+        codecs.getincrementaldecoder('utf-8')().decode(header, final=False)
+    except UnicodeDecodeError:
+        # Other encodings (e.g. Latin-1 CSV) are left to libmagic
+        return False
+    return True
+
+def _sniff_with_libmagic(header):
+    """Ask libmagic (python-magic) about content the signature table does not know."""
+    try:
+        import magic
+        mime = magic.from_buffer(header, mime=True)
+    except Exception:
+        return None
+    if mime in MIME_FORMATS:
+        return MIME_FORMATS[mime]
+    if mime.startswith('text/'):
+        return 'text'
+    return None
+
+def _signature_formats():
+    formats = {fmt for _, _, fmt in SIGNATURES} | set(RIFF_TYPES.values()) | {'mp3'}
+    for family, members in FAMILIES.items():
+        if family in formats:
+            formats |= members
+    return formats - FAMILIES['text']
+
+# Formats whose files always carry a recognisable signature
+BINARY_FORMATS = frozenset(_signature_formats())
+
+def resolve_format(header, declared, accepted=None):
+    """Check content against the format its name declares, and return the format to decode it as.
+
+    `declared` is the extension; `accepted` the input formats the caller can
+    read. A misnamed file whose content is another accepted format is taken
+    as that format; content that cannot be the declared format, or anything
+    accepted, raises ValueError straight from the header.
+    """
+    name_format = canonical_format(declared)
+    # Canonical name -> the caller's own spelling of it
+    accepted = {canonical_format(fmt): fmt for fmt in accepted} if accepted is not None else {}
+    # A binary format always has a signature, so libmagic cannot rescue a miss
+    sniffed = sniff_format(header, use_libmagic=name_format not in BINARY_FORMATS)
+
+    if sniffed is None:
+        if name_format in BINARY_FORMATS:
+            raise ValueError(f"The file content does not look like {name_format.upper()}")
+        return declared
+    if sniffed == name_format or name_format in FAMILIES.get(sniffed, ()):
+        return declared
+    if sniffed == 'svg' and name_format in FAMILIES['text']:
+        return declared
+
+    # The content is something else: use it if the caller reads that format
+    candidates = FAMILIES.get(sniffed, {sniffed})
+    usable = sorted(candidates & accepted.keys())
+    if len(usable) > 1 and FAMILY_DEFAULTS.get(sniffed) in usable:
+        usable = [FAMILY_DEFAULTS[sniffed]]
+    if len(usable) == 1:
+        return accepted[usable[0]]
+    if sniffed == 'text' and name_format not in BINARY_FORMATS:
+        return declared
+    described = 'text' if sniffed == 'text' else sniffed.upper()
+    raise ValueError(f"The file is named .{declared} but its content is {described}")
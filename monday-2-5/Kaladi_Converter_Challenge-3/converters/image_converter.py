@@ -164,17 +164,22 @@
 
 
 from .base_converter import BaseConverter
-from PIL import Image
+from PIL import Image, ImageOps
 import io
 import streamlit as st
-from pdf2image import convert_from_bytes
-from svglib.svglib import svg2rlg
-from reportlab.graphics import renderPM
-import tempfile
+from .pdf_raster import RASTER_FORMATS, parse_page_range, pdf_page_count, rasterize_pdf
 import os
-import numpy as np
-from skimage import measure
-from skimage.filters import threshold_otsu
+import zipfile
+
+# pdf2image, svglib/reportlab, scikit-image and numpy are imported where they
+# are used, so loading the page only costs PIL
+
+# Web derivatives served for every upload: JPEG and WebP at three widths
+WEB_RENDITIONS = [
+    {'format': fmt, 'width': width, 'quality': 82}
+    for width in (1920, 960, 480)
+    for fmt in ('jpg', 'webp')
+]
 
 class ImageConverter(BaseConverter):
     def __init__(self):
@@ -190,16 +195,32 @@ class ImageConverter(BaseConverter):
             'bmp': ['jpg', 'png', 'gif', 'webp', 'tiff'],
             'webp': ['jpg', 'png', 'gif', 'bmp', 'tiff'],
             'tiff': ['jpg', 'png', 'gif', 'bmp', 'webp'],
-            'tif': ['jpg', 'png', 'gif', 'bmp', 'webp']
+            'tif': ['jpg', 'png', 'gif', 'bmp', 'webp'],
+            # Rendered with poppler; `pages` picks the pages and several come back as a ZIP
+            'pdf': ['png', 'jpg', 'tiff', 'gif', 'bmp', 'webp']
         }
 
-    def _bitmap_to_svg(self, image):
+    def _bitmap_to_svg(self, image, simplify_tolerance=2.0, trace_scale=1.0):
+        import numpy as np
+        from skimage import measure
+        from skimage.filters import threshold_otsu
+
+        width, height = image.size
+
         # Convert image to grayscale
         if image.mode != 'L':
             image = image.convert('L')
-        
+
+        # Optionally trace a downscaled copy; coordinates are scaled back below
+        if trace_scale < 1.0:
+            scaled_size = (max(1, round(width * trace_scale)), max(1, round(height * trace_scale)))
+            image = image.resize(scaled_size, Image.BILINEAR, reducing_gap=2.0)
+            scale = (scaled_size[0] / width, scaled_size[1] / height)
+        else:
+            scale = (1.0, 1.0)
+
         # Convert to numpy array
-        data = np.array(image)
+        data = np.asarray(image)
         
         # Apply Otsu's thresholding
         thresh = threshold_otsu(data)
@@ -208,57 +229,70 @@ class ImageConverter(BaseConverter):
         # Find contours
         contours = measure.find_contours(binary, 0.5)
         
-        # Create SVG path data
-        svg_paths = []
-        for contour in contours:
-            # Simplify the contour
-            contour = measure.approximate_polygon(contour, tolerance=2.0)
-            
-            # Convert to SVG path
-            path_data = "M "
-            for i, point in enumerate(contour):
-                if i == 0:
-                    path_data += f"{point[1]:.1f},{point[0]:.1f} "
-                else:
-                    path_data += f"L {point[1]:.1f},{point[0]:.1f} "
-            path_data += "Z"
-            svg_paths.append(f'<path d="{path_data}" fill="black"/>')
-        
+        # Simplify the contours
+        if simplify_tolerance > 0:
+            contours = [measure.approximate_polygon(contour, tolerance=simplify_tolerance) for contour in contours]
+
         # Create SVG document
         svg_doc = f"""<?xml version="1.0" standalone="no"?>
 <!DOCTYPE svg PUBLIC "-//W3C//DTD SVG 1.1//EN" "http://www.w3.org/Graphics/SVG/1.1/DTD/svg11.dtd">
-<svg width="{image.width}" height="{image.height}" version="1.1" xmlns="http://www.w3.org/2000/svg">
-{''.join(svg_paths)}
+<svg width="{width}" height="{height}" version="1.1" xmlns="http://www.w3.org/2000/svg">
+{self._contours_to_svg_paths(contours, scale)}
 </svg>"""
         
         return svg_doc.encode('utf-8')
 
-    def convert(self, input_file, output_format, quality=85):
-        input_format = input_file.name.split('.')[-1].lower()
-        file_bytes = input_file.getvalue()
-        
+    def _contours_to_svg_paths(self, contours, scale):
+        """Format every contour as an SVG path with one vectorized formatting pass."""
+        import numpy as np
+
+        contours = [contour for contour in contours if len(contour)]
+        if not contours:
+            return ''
+
+        # Swap (row, col) to (x, y) and undo any downscaling for all points at once
+        points = np.concatenate(contours)[:, ::-1] / np.asarray(scale)
+
+        # One format template for all paths, filled by a single % operation
+        template = ''.join(
+            '<path d="M %.1f,%.1f ' + 'L %.1f,%.1f ' * (len(contour) - 1) + 'Z" fill="black"/>'
+            for contour in contours
+        )
+        return template % tuple(points.ravel().tolist())
+
+    def convert_stream(self, reader, writer, output_format, quality=85, simplify_tolerance=2.0, trace_scale=1.0,
+                       pages="1", dpi=200, workers=None, progress=None):
+        """Convert an image. PDF pages rendered are counted on `progress`; other inputs are a single step."""
+        input_format = self._get_input_format(reader)
+
         # Handle PDF to image conversion
         if input_format == 'pdf':
-            images = convert_from_bytes(file_bytes)
+            temp_pdf_path = self._spool_to_file(reader, suffix='.pdf')
+            try:
+                if output_format in RASTER_FORMATS:
+                    # Render the selected pages in parallel; several pages become a ZIP
+                    rasterize_pdf(temp_pdf_path, writer, output_format, pages=pages, dpi=dpi,
+                                  quality=95, workers=workers, progress=progress)
+                    return
+
+                # Formats pdftoppm cannot write go through PIL, one page only
+                from pdf2image import convert_from_path
+                first_page = parse_page_range(pages, pdf_page_count(temp_pdf_path))[0]
+                images = convert_from_path(temp_pdf_path, dpi=dpi, first_page=first_page, last_page=first_page)
+            finally:
+                os.unlink(temp_pdf_path)
             if not images:
                 raise ValueError("No images found in PDF")
-            
-            # Convert first page to desired format
-            output = io.BytesIO()
-            if output_format in ['jpg', 'jpeg']:
-                images[0].convert('RGB').save(output, format='JPEG', quality=95)
-            else:
-                images[0].save(output, format=output_format.upper())
-            output.seek(0)
-            return output.getvalue()
-        
+            self._save_image(images[0], writer, output_format, quality)
+            return
+
         # Handle SVG to other formats
         if input_format == 'svg':
+            from svglib.svglib import svg2rlg
+            from reportlab.graphics import renderPM
             try:
                 # Create temporary file for SVG
-                with tempfile.NamedTemporaryFile(delete=False, suffix='.svg') as temp_svg:
-                    temp_svg.write(file_bytes)
-                    temp_svg_path = temp_svg.name
+                temp_svg_path = self._spool_to_file(reader, suffix='.svg')
 
                 try:
                     # Convert SVG to ReportLab drawing
@@ -266,17 +300,12 @@ class ImageConverter(BaseConverter):
                     if drawing is None:
                         raise ValueError("Could not parse SVG file")
 
-                    # Create output buffer
-                    output = io.BytesIO()
-
                     # Convert to desired format
                     if output_format == 'pdf':
-                        renderPM.drawToFile(drawing, output, fmt="PDF")
+                        renderPM.drawToFile(drawing, writer, fmt="PDF")
                     else:  # PNG
-                        renderPM.drawToFile(drawing, output, fmt="PNG")
-
-                    output.seek(0)
-                    return output.getvalue()
+                        renderPM.drawToFile(drawing, writer, fmt="PNG")
+                    return
 
                 finally:
                     # Clean up temporary file
@@ -285,42 +314,101 @@ class ImageConverter(BaseConverter):
 
             except Exception as e:
                 raise ValueError(f"Error converting SVG: {str(e)}")
-        
+
         # Handle other image conversions
         try:
-            image = Image.open(input_file)
-            
+            # PIL reads lazily from the stream, so the upload is never copied
+            image = Image.open(reader)
+
             # Handle conversion to SVG
             if output_format == 'svg':
-                return self._bitmap_to_svg(image)
-            
-            # Convert to RGB if needed (for JPG conversion)
-            if output_format in ['jpg', 'jpeg'] and image.mode in ['RGBA', 'LA']:
-                background = Image.new('RGB', image.size, (255, 255, 255))
-                background.paste(image, mask=image.split()[-1])
-                image = background
-            
-            # Prepare output
-            output = io.BytesIO()
-            
-            # Save in the desired format with proper format name
-            if output_format == 'pdf':
-                image.save(output, format='PDF', resolution=100.0)
-            elif output_format in ['jpg', 'jpeg']:
-                image.save(output, format='JPEG', quality=quality)
-            elif output_format == 'png':
-                image.save(output, format='PNG')
-            elif output_format in ['gif', 'bmp']:
-                image.save(output, format=output_format.upper())
-            elif output_format == 'webp':
-                image.save(output, format='WEBP', quality=quality)
-            elif output_format in ['tiff', 'tif']:
-                image.save(output, format='TIFF')
-            else:
-                raise ValueError(f"Unsupported output format: {output_format}")
-            
-            output.seek(0)
-            return output.getvalue()
-            
+                writer.write(self._bitmap_to_svg(image, simplify_tolerance, trace_scale))
+                return
+
+            self._save_image(image, writer, output_format, quality)
+
         except Exception as e:
-            raise ValueError(f"Error converting image: {str(e)}")
\ No newline at end of file
+            raise ValueError(f"Error converting image: {str(e)}")
+
+    def _save_image(self, image, writer, output_format, quality):
+        # Convert to RGB if needed (for JPG conversion)
+        if output_format in ['jpg', 'jpeg'] and image.mode in ['RGBA', 'LA']:
+            background = Image.new('RGB', image.size, (255, 255, 255))
+            background.paste(image, mask=image.split()[-1])
+            image = background
+        elif output_format in ['jpg', 'jpeg'] and image.mode not in ['RGB', 'L', 'CMYK']:
+            image = image.convert('RGB')
+
+        # Save in the desired format with proper format name
+        if output_format == 'pdf':
+            image.save(writer, format='PDF', resolution=100.0)
+        elif output_format in ['jpg', 'jpeg']:
+            image.save(writer, format='JPEG', quality=quality)
+        elif output_format == 'png':
+            image.save(writer, format='PNG')
+        elif output_format in ['gif', 'bmp']:
+            image.save(writer, format=output_format.upper())
+        elif output_format == 'webp':
+            image.save(writer, format='WEBP', quality=quality)
+        elif output_format in ['tiff', 'tif']:
+            image.save(writer, format='TIFF')
+        else:
+            raise ValueError(f"Unsupported output format: {output_format}")
+
+    def render_set(self, reader, renditions=WEB_RENDITIONS):
+        """Decode an image once and yield (name, bytes) for each rendition.
+
+        Each rendition is a dict with a 'format', an optional 'quality' and an
+        optional 'width' (None keeps the original size; images are never
+        upscaled). Renditions sharing a width share one resized buffer.
+        """
+        stem = os.path.splitext(os.path.basename(str(getattr(reader, 'name', '') or 'image')))[0]
+        image = Image.open(reader)
+        # Phone photos are stored sideways with an EXIF rotation; widths apply to the upright image
+        rotated = image.getexif().get(0x0112, 1) in (5, 6, 7, 8)
+        original_width, original_height = image.size[::-1] if rotated else image.size
+
+        widths = [min(r.get('width') or original_width, original_width) for r in renditions]
+        largest = max(widths)
+
+        # Let the JPEG decoder downscale by 1/2, 1/4 or 1/8 while decoding
+        if image.format == 'JPEG' and largest < original_width:
+            scale = largest / original_width
+            image.draft(image.mode, (max(1, round(image.width * scale)), max(1, round(image.height * scale))))
+        image.load()
+        image = ImageOps.exif_transpose(image)
+        if image.mode in ('P', '1'):
+            # reduce() rejects these modes and resize() quietly uses NEAREST on them
+            image = image.convert('RGBA' if 'transparency' in image.info else 'RGB')
+
+        resized = {}
+        produced = set()
+        for rendition, width in zip(renditions, widths):
+            output_format = rendition['format'].lower()
+            name = f"{stem}_{width}w.{output_format}"
+            # Widths clamped to a small original can collapse into duplicates
+            if name in produced:
+                continue
+            produced.add(name)
+
+            if width not in resized:
+                resized[width] = self._resize_to_width(image, width, original_width, original_height)
+            output = io.BytesIO()
+            self._save_image(resized[width], output, output_format, rendition.get('quality', 85))
+            yield name, output.getvalue()
+
+    def render_set_to_zip(self, reader, writer, renditions=WEB_RENDITIONS):
+        """Write every rendition from render_set into a ZIP."""
+        with zipfile.ZipFile(writer, 'w', compression=zipfile.ZIP_STORED) as zip_out:
+            for name, data in self.render_set(reader, renditions):
+                zip_out.writestr(name, data)
+
+    def _resize_to_width(self, image, width, original_width, original_height):
+        height = max(1, round(original_height * width / original_width))
+        if image.size == (width, height):
+            return image
+        # reduce() does a cheap integer box downscale first, keeping 2x headroom
+        # for the final Lanczos pass
+        factor = min(image.width // (width * 2), image.height // (height * 2))
+        source = image.reduce(factor) if factor >= 2 else image
+        return source.resize((width, height), Image.LANCZOS)
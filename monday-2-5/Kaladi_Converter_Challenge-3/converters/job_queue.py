@@ -0,0 +1,307 @@
+import atexit
+import importlib
+import json
+import multiprocessing
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+from .progress import ProgressReporter
+from .result_cache import content_key
+
+CHUNK_SIZE = 1024 * 1024
+DB_NAME = "jobs.sqlite3"
+
+# Least time between progress writes for one job
+PROGRESS_INTERVAL = 0.5
+
+# Job states
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    converter TEXT NOT NULL,
+    input_path TEXT NOT NULL,
+    output_format TEXT NOT NULL,
+    options TEXT NOT NULL,
+    status TEXT NOT NULL,
+    progress REAL NOT NULL DEFAULT 0,
+    segments TEXT,
+    output_path TEXT,
+    error TEXT,
+    worker_pid INTEGER,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at);
+"""
+
+def _connect(db_path):
+    conn = sqlite3.connect(db_path, timeout=30, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    return conn
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+def _load_converter(path):
+    """Instantiate a converter from its 'module:ClassName' path."""
+    module_name, class_name = path.split(':')
+    return getattr(importlib.import_module(module_name), class_name)()
+
+def _worker_loop(jobs_dir, stop_event, poll_interval):
+    """Claim queued jobs one at a time until asked to stop."""
+    conn = _connect(os.path.join(jobs_dir, DB_NAME))
+    outputs_dir = os.path.join(jobs_dir, "outputs")
+    pid = os.getpid()
+    while not stop_event.is_set():
+        job = _claim_next_job(conn, pid)
+        if job is None:
+            stop_event.wait(poll_interval)
+            continue
+        _run_job(conn, job, outputs_dir)
+
+def _claim_next_job(conn, pid):
+    # BEGIN IMMEDIATE takes the write lock, so two workers never claim the same job
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        job = conn.execute(
+            "SELECT * FROM jobs WHERE status = ? ORDER BY created_at LIMIT 1", (QUEUED,)
+        ).fetchone()
+        if job is not None:
+            conn.execute(
+                "UPDATE jobs SET status = ?, worker_pid = ?, progress = 0, segments = NULL, updated_at = ? "
+                "WHERE id = ?",
+                (RUNNING, pid, time.time(), job["id"]),
+            )
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    return job
+
+def _reusable_job(conn, job_id):
+    """True if the job exists and is queued, running, or done with its output still on disk."""
+    existing = conn.execute("SELECT status, output_path FROM jobs WHERE id = ?", (job_id,)).fetchone()
+    if existing is None or existing["status"] == FAILED:
+        return False
+    return existing["status"] != DONE or os.path.exists(existing["output_path"])
+
+def _progress_writer(conn, job_id):
+    """Return a ProgressReporter that records the job's progress, at most every PROGRESS_INTERVAL.
+
+    A 'segments' counter (per-piece fractions from segmented video
+    encodes) is stored alongside the overall fraction.
+    """
+    def report(stats):
+        # Work of unknown size leaves the bar where it is
+        if stats['fraction'] is None:
+            return
+        segments = stats.get('segments')
+        conn.execute(
+            "UPDATE jobs SET progress = ?, segments = ?, updated_at = ? WHERE id = ? AND status = ?",
+            (stats['fraction'], json.dumps(segments) if segments else None, time.time(), job_id, RUNNING),
+        )
+    return ProgressReporter(report, interval=PROGRESS_INTERVAL)
+
+def _run_job(conn, job, outputs_dir):
+    output_path = os.path.join(outputs_dir, f"{job['id']}.{job['output_format']}")
+    partial_path = f"{output_path}.part"
+    try:
+        converter = _load_converter(job["converter"])
+        with open(job["input_path"], 'rb') as reader, open(partial_path, 'wb') as writer:
+            converter.convert_stream(reader, writer, job["output_format"], progress=_progress_writer(conn, job["id"]),
+                                     **json.loads(job["options"]))
+        os.replace(partial_path, output_path)
+    except Exception as e:
+        if os.path.exists(partial_path):
+            os.unlink(partial_path)
+        conn.execute(
+            "UPDATE jobs SET status = ?, error = ?, updated_at = ? WHERE id = ?",
+            (FAILED, str(e), time.time(), job["id"]),
+        )
+        return
+    conn.execute(
+        "UPDATE jobs SET status = ?, progress = 1, output_path = ?, updated_at = ? WHERE id = ?",
+        (DONE, output_path, time.time(), job["id"]),
+    )
+
+class JobQueue:
+    """SQLite-backed queue of conversions run by a pool of worker processes.
+
+    Jobs are identified by the same content hash as the result cache, so
+    submitting an identical conversion twice returns the existing job.
+    """
+
+    def __init__(self, jobs_dir, workers=2, poll_interval=0.5, retention=3600):
+        self.jobs_dir = jobs_dir
+        self.db_path = os.path.join(jobs_dir, DB_NAME)
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.retention = retention
+        self._processes = []
+        self._stop_event = None
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.join(jobs_dir, "inputs"), exist_ok=True)
+        os.makedirs(os.path.join(jobs_dir, "outputs"), exist_ok=True)
+        conn = _connect(self.db_path)
+        conn.executescript(SCHEMA)
+        # Job databases created before per-segment progress was recorded
+        if "segments" not in {column["name"] for column in conn.execute("PRAGMA table_info(jobs)")}:
+            conn.execute("ALTER TABLE jobs ADD COLUMN segments TEXT")
+        conn.close()
+
+    def submit(self, converter, reader, output_format, **options):
+        """Queue a conversion and return its job id."""
+        # Workers report progress to the jobs table themselves; a callback cannot be stored
+        options.pop('progress', None)
+        # Raises ValueError for unusable content before anything is hashed or copied
+        input_format = converter._get_input_format(reader)
+        job_id = content_key(reader, converter, output_format, options)
+        converter_path = f"{type(converter).__module__}:{type(converter).__qualname__}"
+        input_path = os.path.join(self.jobs_dir, "inputs", f"{job_id}.{input_format}")
+        now = time.time()
+
+        conn = _connect(self.db_path)
+        try:
+            if _reusable_job(conn, job_id):
+                # Coalesce with the job that is already queued, running or done
+                return job_id
+
+            if not os.path.exists(input_path):
+                # Another submit may be copying the same input, so each copy gets its own part file
+                part_path = f"{input_path}.{os.getpid()}-{threading.get_ident()}.part"
+                with open(part_path, 'wb') as f:
+                    shutil.copyfileobj(reader, f, CHUNK_SIZE)
+                os.replace(part_path, input_path)
+
+            # Check again under the write lock: a concurrent submit may have queued the job, or a
+            # worker claimed it, while the input was copied, and neither may be reset to queued
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                if not _reusable_job(conn, job_id):
+                    conn.execute(
+                        "INSERT OR REPLACE INTO jobs (id, converter, input_path, output_format, options, status, "
+                        "progress, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, 0, ?, ?)",
+                        (job_id, converter_path, input_path, output_format, json.dumps(options, sort_keys=True),
+                         QUEUED, now, now),
+                    )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        finally:
+            conn.close()
+
+        self.start_workers()
+        self.prune()
+        return job_id
+
+    def status(self, job_id):
+        """Return the job's status, progress, per-segment progress and error, or None for an unknown id."""
+        conn = _connect(self.db_path)
+        try:
+            job = conn.execute(
+                "SELECT status, progress, segments, error, output_format FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+        finally:
+            conn.close()
+        if job is None:
+            return None
+        job = dict(job)
+        job["segments"] = json.loads(job["segments"]) if job["segments"] else None
+        return job
+
+    def result_path(self, job_id):
+        """Return the path of a finished job's output, or None if it is not done."""
+        conn = _connect(self.db_path)
+        try:
+            job = conn.execute("SELECT status, output_path FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        finally:
+            conn.close()
+        if job is None or job["status"] != DONE or not os.path.exists(job["output_path"]):
+            return None
+        return job["output_path"]
+
+    def start_workers(self):
+        """Start the worker processes once per server process."""
+        with self._lock:
+            self._processes = [p for p in self._processes if p.is_alive()]
+            if self._processes:
+                return
+            self._requeue_orphans()
+            self._stop_event = multiprocessing.Event()
+            # Workers are not daemonic so converters may start their own process pools
+            for _ in range(self.workers):
+                process = multiprocessing.Process(
+                    target=_worker_loop,
+                    args=(self.jobs_dir, self._stop_event, self.poll_interval),
+                )
+                process.start()
+                self._processes.append(process)
+
+    def stop_workers(self, timeout=5):
+        with self._lock:
+            if self._stop_event is not None:
+                self._stop_event.set()
+            for process in self._processes:
+                process.join(timeout)
+                if process.is_alive():
+                    process.terminate()
+            self._processes = []
+
+    def prune(self):
+        """Delete finished jobs and their files once they are older than the retention period."""
+        cutoff = time.time() - self.retention
+        conn = _connect(self.db_path)
+        try:
+            old_jobs = conn.execute(
+                "SELECT id, input_path, output_path FROM jobs WHERE status IN (?, ?) AND updated_at < ?",
+                (DONE, FAILED, cutoff),
+            ).fetchall()
+            for job in old_jobs:
+                for path in (job["input_path"], job["output_path"]):
+                    if path and os.path.exists(path):
+                        os.unlink(path)
+                conn.execute("DELETE FROM jobs WHERE id = ?", (job["id"],))
+        finally:
+            conn.close()
+
+    def _requeue_orphans(self):
+        """Put back jobs whose worker died mid-conversion."""
+        conn = _connect(self.db_path)
+        try:
+            running = conn.execute("SELECT id, worker_pid FROM jobs WHERE status = ?", (RUNNING,)).fetchall()
+            for job in running:
+                if job["worker_pid"] is None or not _pid_alive(job["worker_pid"]):
+                    conn.execute("UPDATE jobs SET status = ?, progress = 0 WHERE id = ?", (QUEUED, job["id"]))
+        finally:
+            conn.close()
+
+_default_queue = None
+_default_queue_lock = threading.Lock()
+
+def get_job_queue():
+    """Return the process-wide job queue, creating it on first use."""
+    global _default_queue
+    with _default_queue_lock:
+        if _default_queue is None:
+            jobs_dir = os.environ.get("CONVERTER_JOBS_DIR") or os.path.join(tempfile.gettempdir(), "kaladi_converter_jobs")
+            workers = int(os.environ.get("CONVERTER_JOB_WORKERS", "2"))
+            _default_queue = JobQueue(jobs_dir, workers=workers)
+            atexit.register(_default_queue.stop_workers)
+        return _default_queue
@@ -0,0 +1,247 @@
+import atexit
+import os
+import queue
+import shutil
+import socket
+import subprocess
+import tempfile
+import threading
+import time
+
+SOFFICE = os.environ.get("SOFFICE_PATH", "soffice")
+STARTUP_TIMEOUT = 30
+# Seconds one document may take before its worker is killed
+CONVERT_TIMEOUT = 120
+PDF_FILTER = "writer_pdf_Export"
+
+def uno_available():
+    """True when the UNO bridge can be imported (LibreOffice's own Python, or python3-uno)."""
+    try:
+        import uno  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def _property(name, value):
+    from com.sun.star.beans import PropertyValue
+
+    prop = PropertyValue()
+    prop.Name = name
+    prop.Value = value
+    return prop
+
+class OfficeWorker:
+    """One headless LibreOffice process listening on a UNO socket.
+
+    Each worker gets its own user profile, since two soffice processes
+    cannot share one.
+    """
+
+    def __init__(self, soffice=SOFFICE, startup_timeout=STARTUP_TIMEOUT):
+        self.port = _free_port()
+        self.profile_dir = tempfile.mkdtemp(prefix="lo_profile_")
+        self.jobs = 0
+        self.timed_out = False
+        self._desktop = None
+        self.process = subprocess.Popen(
+            [
+                soffice, "--headless", "--invisible", "--nologo", "--norestore", "--nodefault",
+                "--nolockcheck",
+                f"-env:UserInstallation=file://{self.profile_dir}",
+                f"--accept=socket,host=127.0.0.1,port={self.port};urp;StarOffice.ComponentContext",
+            ],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        try:
+            self._connect(startup_timeout)
+        except Exception:
+            self.close()
+            raise
+
+    def _connect(self, timeout):
+        import uno
+
+        local_context = uno.getComponentContext()
+        resolver = local_context.ServiceManager.createInstanceWithContext(
+            "com.sun.star.bridge.UnoUrlResolver", local_context
+        )
+        url = f"uno:socket,host=127.0.0.1,port={self.port};urp;StarOffice.ComponentContext"
+        deadline = time.monotonic() + timeout
+        # soffice takes a few seconds to open its socket; keep trying until then
+        while True:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"soffice exited during startup with code {self.process.returncode}")
+            try:
+                context = resolver.resolve(url)
+                break
+            except Exception:
+                if time.monotonic() > deadline:
+                    raise TimeoutError(f"soffice did not accept connections within {timeout}s")
+                time.sleep(0.25)
+        self._desktop = context.ServiceManager.createInstanceWithContext("com.sun.star.frame.Desktop", context)
+
+    def is_healthy(self):
+        """The process is alive and still answers over the bridge."""
+        if self._desktop is None or self.timed_out or self.process.poll() is not None:
+            return False
+        try:
+            self._desktop.getComponents()
+        except Exception:
+            return False
+        return True
+
+    def convert(self, input_path, output_path, filter_name=PDF_FILTER, timeout=None):
+        """Convert one document. Past `timeout` seconds soffice is killed and TimeoutError raised."""
+        watchdog = None
+        if timeout:
+            # A UNO call cannot be cancelled; killing soffice makes it fail at once
+            watchdog = threading.Timer(timeout, self._expire)
+            watchdog.daemon = True
+            watchdog.start()
+        try:
+            self._convert(input_path, output_path, filter_name)
+        except Exception:
+            if self.timed_out:
+                raise TimeoutError(f"LibreOffice took longer than {timeout}s on {os.path.basename(input_path)}")
+            raise
+        finally:
+            if watchdog is not None:
+                watchdog.cancel()
+
+    def _expire(self):
+        self.timed_out = True
+        self.process.kill()
+
+    def _convert(self, input_path, output_path, filter_name):
+        import uno
+
+        document = self._desktop.loadComponentFromURL(
+            uno.systemPathToFileUrl(os.path.abspath(input_path)), "_blank", 0, (_property("Hidden", True),)
+        )
+        if document is None:
+            raise ValueError(f"LibreOffice could not open {os.path.basename(input_path)}")
+        try:
+            document.storeToURL(
+                uno.systemPathToFileUrl(os.path.abspath(output_path)), (_property("FilterName", filter_name),)
+            )
+        finally:
+            document.close(True)
+            self.jobs += 1
+
+    def close(self):
+        try:
+            if self._desktop is not None:
+                self._desktop.terminate()
+        except Exception:
+            pass
+        try:
+            self.process.wait(5)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+        shutil.rmtree(self.profile_dir, ignore_errors=True)
+
+class OfficePool:
+    """Pool of warm LibreOffice workers shared by all conversions in the process.
+
+    At most `size` conversions run at once; further callers wait up to
+    `acquire_timeout` seconds for a slot. A document that takes longer than
+    `convert_timeout` seconds gets its worker killed and TimeoutError is
+    raised, so one hung file cannot hold a slot forever. Workers that fail,
+    time out, fail a health check or have served `max_jobs_per_worker`
+    documents are replaced, which keeps LibreOffice's slow memory growth in
+    check.
+    """
+
+    def __init__(self, size=2, max_jobs_per_worker=200, acquire_timeout=120, convert_timeout=CONVERT_TIMEOUT,
+                 soffice=SOFFICE):
+        self.size = size
+        self.max_jobs_per_worker = max_jobs_per_worker
+        self.acquire_timeout = acquire_timeout
+        self.convert_timeout = convert_timeout
+        self.soffice = soffice
+        self._slots = threading.BoundedSemaphore(size)
+        self._idle = queue.LifoQueue()
+        self._closed = False
+
+    def warm(self):
+        """Start every worker now so the first requests skip soffice startup."""
+        workers = []
+        for _ in range(self.size):
+            if not self._slots.acquire(timeout=self.acquire_timeout):
+                break
+            try:
+                workers.append(self._checkout())
+            except Exception:
+                self._slots.release()
+                raise
+        for worker in workers:
+            self._checkin(worker)
+            self._slots.release()
+
+    def convert(self, input_path, output_path, filter_name=PDF_FILTER):
+        if self._closed:
+            raise RuntimeError("Office pool is closed")
+        if not self._slots.acquire(timeout=self.acquire_timeout):
+            raise TimeoutError(f"No LibreOffice worker became free within {self.acquire_timeout}s")
+        try:
+            worker = self._checkout()
+            try:
+                worker.convert(input_path, output_path, filter_name, self.convert_timeout)
+            except Exception:
+                # A failed or killed document may leave soffice in a bad state; start fresh next time
+                worker.close()
+                raise
+            self._checkin(worker)
+        finally:
+            self._slots.release()
+
+    def _checkout(self):
+        while True:
+            try:
+                worker = self._idle.get_nowait()
+            except queue.Empty:
+                return OfficeWorker(self.soffice)
+            if worker.is_healthy():
+                return worker
+            worker.close()
+
+    def _checkin(self, worker):
+        if self._closed or worker.jobs >= self.max_jobs_per_worker:
+            worker.close()
+        else:
+            self._idle.put(worker)
+
+    def close(self):
+        self._closed = True
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+_default_pool = None
+_default_pool_lock = threading.Lock()
+
+def get_office_pool():
+    """Return the process-wide LibreOffice pool, or None when UNO or soffice is unavailable."""
+    global _default_pool
+    with _default_pool_lock:
+        if _default_pool is None:
+            if not uno_available() or shutil.which(SOFFICE) is None:
+                return None
+            _default_pool = OfficePool(
+                size=int(os.environ.get("CONVERTER_OFFICE_WORKERS", "2")),
+                max_jobs_per_worker=int(os.environ.get("CONVERTER_OFFICE_MAX_JOBS", "200")),
+                convert_timeout=float(os.environ.get("CONVERTER_OFFICE_TIMEOUT", str(CONVERT_TIMEOUT))),
+            )
+            atexit.register(_default_pool.close)
+            # Warm up in the background so the first request does not wait on it
+            threading.Thread(target=_default_pool.warm, daemon=True).start()
+        return _default_pool
@@ -0,0 +1,171 @@
+import bz2
+import struct
+import zlib
+from collections import deque
+from concurrent.futures import Future
+
+# Uncompressed bytes per block handed to a worker
+BLOCK_SIZE = 1024 * 1024
+# Deflate's window; each block is primed with this much of the previous one
+DICT_SIZE = 32 * 1024
+
+# Fixed gzip member header: deflate, no flags, no mtime, unknown OS
+GZIP_MEMBER_HEADER = b'\x1f\x8b\x08\x00\x00\x00\x00\x00\x00\xff'
+
+def deflate_block(data, level, zdict=b'', last=False):
+    """Raw-deflate one block of a larger stream.
+
+    Blocks other than the last end with a sync flush, which pads to a byte
+    boundary without marking the stream final, so independently compressed
+    blocks concatenate into one valid deflate stream (the pigz approach).
+    Priming with the previous block's tail keeps the ratio close to serial.
+    """
+    if zdict:
+        compressor = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS, zdict=zdict)
+    else:
+        compressor = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS)
+    return compressor.compress(data) + compressor.flush(zlib.Z_FINISH if last else zlib.Z_SYNC_FLUSH)
+
+def bz2_block(data, level):
+    """Compress one block as a complete bzip2 stream; bzip2 readers accept them concatenated."""
+    return bz2.compress(data, level)
+
+def run_task(executor, func, *args):
+    """Submit to the pool, or run inline and return a finished future when there is none."""
+    if executor is not None:
+        return executor.submit(func, *args)
+    future = Future()
+    try:
+        future.set_result(func(*args))
+    except Exception as e:
+        future.set_exception(e)
+    return future
+
+class OrderedPipeline:
+    """Hands results to their handlers in submission order, with a bounded window.
+
+    Once more than `window` tasks are pending, put() waits for the oldest, so
+    memory stays flat however much data goes through.
+    """
+
+    def __init__(self, window):
+        self.window = window
+        self._pending = deque()
+
+    def put(self, future, handler):
+        self._pending.append((future, handler))
+        while len(self._pending) > self.window:
+            self._complete_oldest()
+
+    def then(self, callback):
+        """Call `callback` once everything put before it has been handled."""
+        self.put(run_task(None, lambda: None), lambda _: callback())
+
+    def flush(self):
+        while self._pending:
+            self._complete_oldest()
+
+    def _complete_oldest(self):
+        future, handler = self._pending.popleft()
+        handler(future.result())
+
+class ParallelGzipWriter:
+    """Write-only file object producing gzip output compressed block by block in a pool.
+
+    write_deflated() appends data that is already raw deflate (with its CRC
+    and size) as a gzip member of its own, so deflated zip entries can go
+    into a .tar.gz without being recompressed. gzip readers treat the
+    concatenated members as one stream.
+    """
+
+    def __init__(self, fileobj, compresslevel=6, executor=None, window=4, block_size=BLOCK_SIZE):
+        self.fileobj = fileobj
+        self.compresslevel = compresslevel
+        self.executor = executor
+        self.block_size = block_size
+        self.position = 0
+        self._pipeline = OrderedPipeline(window)
+        self._pending = bytearray()
+        self._in_member = False
+
+    def write(self, data):
+        if not self._in_member:
+            self.fileobj.write(GZIP_MEMBER_HEADER)
+            self._in_member = True
+            self._crc = 0
+            self._size = 0
+            self._tail = b''
+        self._crc = zlib.crc32(data, self._crc)
+        self._size += len(data)
+        self.position += len(data)
+        self._pending += data
+        # Hold back at least one byte so the final block is known when the member ends
+        while len(self._pending) > self.block_size:
+            self._submit(bytes(self._pending[:self.block_size]), last=False)
+            del self._pending[:self.block_size]
+        return len(data)
+
+    def _submit(self, block, last):
+        future = run_task(self.executor, deflate_block, block, self.compresslevel, self._tail, last)
+        self._tail = block[-DICT_SIZE:]
+        self._pipeline.put(future, self.fileobj.write)
+
+    def write_deflated(self, chunks, crc, size):
+        self._end_member()
+        self.fileobj.write(GZIP_MEMBER_HEADER)
+        for chunk in chunks:
+            self.fileobj.write(chunk)
+        self.fileobj.write(struct.pack('<II', crc, size & 0xffffffff))
+        self.position += size
+
+    def _end_member(self):
+        if not self._in_member:
+            return
+        self._submit(bytes(self._pending), last=True)
+        self._pending = bytearray()
+        self._pipeline.flush()
+        self.fileobj.write(struct.pack('<II', self._crc, self._size & 0xffffffff))
+        self._in_member = False
+
+    def tell(self):
+        return self.position
+
+    def close(self):
+        self._end_member()
+
+class ParallelBz2Writer:
+    """Write-only file object producing multi-stream bzip2, one stream per block."""
+
+    def __init__(self, fileobj, compresslevel=9, executor=None, window=4, block_size=BLOCK_SIZE):
+        self.fileobj = fileobj
+        self.compresslevel = max(1, compresslevel)
+        self.executor = executor
+        self.block_size = block_size
+        self.position = 0
+        self._pipeline = OrderedPipeline(window)
+        self._pending = bytearray()
+        self._closed = False
+
+    def write(self, data):
+        self.position += len(data)
+        self._pending += data
+        while len(self._pending) >= self.block_size:
+            self._submit(bytes(self._pending[:self.block_size]))
+            del self._pending[:self.block_size]
+        return len(data)
+
+    def _submit(self, block):
+        self._pipeline.put(run_task(self.executor, bz2_block, block, self.compresslevel), self.fileobj.write)
+
+    def tell(self):
+        return self.position
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        # An empty file still needs one stream to be valid bzip2
+        if self._pending or self.position == 0:
+            self._submit(bytes(self._pending))
+        self._pending = bytearray()
+        self._pipeline.flush()
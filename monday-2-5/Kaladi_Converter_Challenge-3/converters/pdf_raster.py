@@ -0,0 +1,133 @@
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+import os
+import shutil
+import tempfile
+import zipfile
+from .progress import ProgressReporter
+
+# Pages rendered per worker task; small shards keep every core busy
+PAGES_PER_TASK = 2
+
+# pdftoppm output formats and the extension of the files it writes
+RASTER_FORMATS = {
+    'png': ('png', 'png'),
+    'jpg': ('jpeg', 'jpg'),
+    'jpeg': ('jpeg', 'jpg'),
+    'tiff': ('tiff', 'tif'),
+    'tif': ('tiff', 'tif'),
+}
+
+def parse_page_range(spec, page_count):
+    """Turn a spec like "1-3,5,8-" or "all" into a sorted list of 1-based page numbers."""
+    if spec is None or str(spec).strip().lower() in ('', 'all'):
+        return list(range(1, page_count + 1))
+
+    pages = set()
+    for part in str(spec).split(','):
+        part = part.strip()
+        if not part:
+            continue
+        try:
+            if '-' in part:
+                start, _, end = part.partition('-')
+                start = int(start) if start.strip() else 1
+                end = int(end) if end.strip() else page_count
+            else:
+                start = end = int(part)
+        except ValueError:
+            raise ValueError(f"Invalid page range: {part}")
+        if start < 1 or end < start:
+            raise ValueError(f"Invalid page range: {part}")
+        pages.update(range(start, min(end, page_count) + 1))
+
+    if not pages:
+        raise ValueError(f"Page range {spec} selects no pages (document has {page_count})")
+    return sorted(pages)
+
+def pdf_page_count(pdf_path):
+    from pdf2image import pdfinfo_from_path
+    return int(pdfinfo_from_path(pdf_path)["Pages"])
+
+def _render_page_run(pdf_path, first_page, last_page, dpi, image_format, quality, output_dir):
+    """Worker task: render a run of consecutive pages straight to image files.
+
+    Returns (page_number, path) pairs; pdftoppm writes the files itself, so
+    no page is ever decoded into PIL here.
+    """
+    from pdf2image import convert_from_path
+
+    fmt, _ = RASTER_FORMATS[image_format]
+    paths = convert_from_path(
+        pdf_path,
+        dpi=dpi,
+        first_page=first_page,
+        last_page=last_page,
+        fmt=fmt,
+        jpegopt={"quality": quality, "optimize": True} if fmt == 'jpeg' else None,
+        output_folder=output_dir,
+        output_file=f"run{first_page:05d}_",
+        paths_only=True,
+        thread_count=1,
+    )
+    return list(zip(range(first_page, last_page + 1), sorted(paths)))
+
+def _page_runs(pages, pages_per_task):
+    """Group sorted page numbers into runs of consecutive pages."""
+    run = []
+    for page in pages:
+        if run and (page != run[-1] + 1 or len(run) == pages_per_task):
+            yield run[0], run[-1]
+            run = []
+        run.append(page)
+    if run:
+        yield run[0], run[-1]
+
+def rasterize_pdf(pdf_path, writer, image_format, pages="1", dpi=200, quality=95, workers=None, progress=None):
+    """Rasterize the selected pages of a PDF into `writer`.
+
+    A single page is written as a bare image; several pages become a ZIP
+    with one image per page, each added as soon as its worker finishes.
+    Returns the number of pages written; `progress` counts them too.
+    """
+    image_format = image_format.lower()
+    if image_format not in RASTER_FORMATS:
+        raise ValueError(f"Unsupported image format: {image_format}")
+
+    selected = parse_page_range(pages, pdf_page_count(pdf_path))
+    reporter = ProgressReporter.of(progress, unit="pages", total=len(selected))
+    workers = workers or os.cpu_count() or 1
+    output_dir = tempfile.mkdtemp()
+    try:
+        if len(selected) == 1:
+            [(_, path)] = _render_page_run(pdf_path, selected[0], selected[0], dpi, image_format, quality, output_dir)
+            with open(path, 'rb') as f:
+                shutil.copyfileobj(f, writer)
+            reporter.advance()
+            return 1
+
+        _, extension = RASTER_FORMATS[image_format]
+        runs = iter(_page_runs(selected, PAGES_PER_TASK))
+        with ProcessPoolExecutor(max_workers=workers) as executor, \
+                zipfile.ZipFile(writer, 'w', compression=zipfile.ZIP_STORED) as zip_out:
+            # Keep a bounded number of runs in flight so temp files and
+            # memory do not grow with the page count
+            in_flight = set()
+            while True:
+                while len(in_flight) < workers * 2:
+                    run = next(runs, None)
+                    if run is None:
+                        break
+                    in_flight.add(executor.submit(
+                        _render_page_run, pdf_path, run[0], run[1], dpi, image_format, quality, output_dir
+                    ))
+                if not in_flight:
+                    break
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    for page, path in future.result():
+                        zip_out.write(path, f"page_{page:04d}.{extension}")
+                        os.unlink(path)
+                        reporter.advance()
+        return len(selected)
+    finally:
+        shutil.rmtree(output_dir, ignore_errors=True)
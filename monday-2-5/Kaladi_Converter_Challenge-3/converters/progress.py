@@ -0,0 +1,99 @@
+import time
+
+# Least time between two calls of a progress callback
+REPORT_INTERVAL = 0.25
+
+class ProgressReporter:
+    """Counts a converter's work and passes it to a progress callback, rate-limited.
+
+    Converters count in their natural unit (bytes read, frames encoded,
+    pages rendered, archive members written) with advance() or update();
+    both are cheap enough for hot loops, and without a callback they only
+    bump counters. The callback gets a stats dict:
+
+        {'unit': 'pages', 'done': 12, 'total': 40, 'fraction': 0.3,
+         'elapsed': 1.8, ...extra counters}
+
+    `total` and `fraction` are None while the amount of work is unknown.
+    """
+
+    def __init__(self, callback=None, unit="bytes", total=None, interval=REPORT_INTERVAL):
+        self.callback = callback
+        self.unit = unit
+        self.total = total
+        self.interval = interval
+        self.done = 0
+        self.counters = {}
+        self.started = time.perf_counter()
+        self.finished = None
+        self._next_report = 0.0
+
+    @classmethod
+    def of(cls, progress, unit=None, total=None):
+        """Return `progress` if it is a reporter already, otherwise wrap the callable (or None).
+
+        `unit` and `total` describe the work the caller is about to count.
+        """
+        reporter = progress if isinstance(progress, cls) else cls(progress)
+        if unit is not None:
+            reporter.unit = unit
+        if total is not None:
+            reporter.total = total
+        return reporter
+
+    def advance(self, amount=1, **counters):
+        """Count `amount` more units of work, plus optional extra counters."""
+        self.done += amount
+        for name, value in counters.items():
+            self.counters[name] = self.counters.get(name, 0) + value
+        if self.callback is not None:
+            self._maybe_report()
+
+    def update(self, done, **counters):
+        """Set the work done so far, plus optional extra counters, to absolute values."""
+        self.done = done
+        self.counters.update(counters)
+        if self.callback is not None:
+            self._maybe_report()
+
+    def finish(self):
+        """Mark the work complete and always report it."""
+        if self.total is None or self.done > self.total:
+            self.total = self.done
+        self.done = self.total
+        self.finished = time.perf_counter()
+        if self.callback is not None:
+            self.callback(self.stats())
+
+    @property
+    def fraction(self):
+        if self.finished is not None:
+            return 1.0
+        if not self.total:
+            return None
+        return min(1.0, self.done / self.total)
+
+    @property
+    def elapsed(self):
+        return (self.finished or time.perf_counter()) - self.started
+
+    def stats(self):
+        return {'unit': self.unit, 'done': self.done, 'total': self.total, 'fraction': self.fraction,
+                'elapsed': self.elapsed, **self.counters}
+
+    def _maybe_report(self):
+        now = time.perf_counter()
+        if now < self._next_report:
+            return
+        self._next_report = now + self.interval
+        self.callback(self.stats())
+
+def streamlit_progress(bar):
+    """Return a progress callback that moves a st.progress bar and labels it with the counts."""
+    def report(stats):
+        if stats['total']:
+            label = f"{stats['done']:,.0f} / {stats['total']:,.0f} {stats['unit']}"
+        else:
+            label = f"{stats['done']:,.0f} {stats['unit']}"
+        bar.progress(stats['fraction'] or 0.0, text=label)
+    return report
@@ -0,0 +1,72 @@
+import numpy as np
+from math import gcd
+
+class PolyphaseResampler:
+    """Rational-ratio polyphase resampler that carries its state across blocks.
+
+    Uses the same Kaiser-windowed FIR and delay compensation as
+    scipy.signal.resample_poly, so streaming a file block by block gives
+    the same samples as resampling it in one piece.
+    """
+
+    def __init__(self, input_rate, output_rate, channels):
+        from scipy import signal
+
+        ratio = gcd(int(input_rate), int(output_rate))
+        self.up = int(output_rate) // ratio
+        self.down = int(input_rate) // ratio
+        max_rate = max(self.up, self.down)
+        self.half_len = 10 * max_rate
+        taps = signal.firwin(2 * self.half_len + 1, 1.0 / max_rate, window=('kaiser', 5.0)) * self.up
+
+        # Split the filter into one column of taps per output phase
+        self.taps_per_phase = -(-len(taps) // self.up)
+        padded = np.zeros(self.taps_per_phase * self.up)
+        padded[:len(taps)] = taps
+        self.phases = padded.reshape(self.taps_per_phase, self.up)
+        self.offsets = np.arange(self.taps_per_phase)
+
+        # Input history, starting with the zeros that precede the signal
+        self.history = np.zeros((self.taps_per_phase - 1, channels))
+        self.history_start = -(self.taps_per_phase - 1)
+        self.frames_in = 0
+        self.next_output = 0
+
+    def process(self, block):
+        """Feed a block of input frames and return every output frame it completes."""
+        self.history = np.concatenate([self.history, block])
+        self.frames_in += len(block)
+        # Output m needs input up to (m * down + half_len) // up
+        end = (self.frames_in * self.up - 1 - self.half_len) // self.down + 1
+        return self._emit(end)
+
+    def flush(self):
+        """Return the remaining output frames once the input has ended."""
+        end = -(-self.frames_in * self.up // self.down)
+        if end <= self.next_output:
+            return np.zeros((0, self.history.shape[1]))
+        last_needed = ((end - 1) * self.down + self.half_len) // self.up
+        missing = last_needed - (self.history_start + len(self.history)) + 1
+        if missing > 0:
+            self.history = np.concatenate([self.history, np.zeros((missing, self.history.shape[1]))])
+        return self._emit(end)
+
+    def _emit(self, end):
+        if end <= self.next_output:
+            return np.zeros((0, self.history.shape[1]))
+
+        positions = np.arange(self.next_output, end) * self.down + self.half_len
+        newest = positions // self.up - self.history_start
+        phase = positions % self.up
+
+        # Gather the input window behind each output frame and apply its phase's taps
+        windows = self.history[newest[:, None] - self.offsets]
+        output = np.einsum('mq,mqc->mc', self.phases[:, phase].T, windows)
+
+        # Drop input the next output frame no longer needs
+        self.next_output = end
+        oldest_needed = (end * self.down + self.half_len) // self.up - (self.taps_per_phase - 1)
+        drop = max(0, oldest_needed - self.history_start)
+        self.history = self.history[drop:]
+        self.history_start += drop
+        return output
@@ -0,0 +1,171 @@
+import hashlib
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+CHUNK_SIZE = 1024 * 1024
+
+def content_key(reader, converter, output_format, options):
+    """Hash the reader's content plus the conversion parameters.
+
+    The parameters include the input format the converter resolves, since
+    the same bytes named .csv and .tsv convert differently. The reader is
+    rewound afterwards so it can still be converted.
+    """
+    input_format = converter._get_input_format(reader)
+    digest = hashlib.sha256()
+    start = reader.tell()
+    for chunk in iter(lambda: reader.read(CHUNK_SIZE), b''):
+        digest.update(chunk)
+    reader.seek(start)
+
+    converter_name = f"{type(converter).__module__}.{type(converter).__qualname__}"
+    # A progress callback does not change the output
+    options = {name: value for name, value in options.items() if name != 'progress'}
+    params = repr((converter_name, input_format, str(output_format).lower(), sorted(options.items())))
+    digest.update(params.encode('utf-8'))
+    return digest.hexdigest()
+
+class ResultCache:
+    """Content-addressed cache of conversion results.
+
+    Results are keyed by the SHA-256 of the input, the converter class, the
+    input and output formats and the conversion options. Entries live in an in-memory
+    LRU bounded by entry count and total bytes, and optionally in a local
+    directory with its own byte budget.
+    """
+
+    def __init__(self, max_entries=64, max_bytes=256 * 1024 * 1024, max_item_bytes=None,
+                 disk_dir=None, max_disk_bytes=2 * 1024 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_item_bytes = max_item_bytes if max_item_bytes is not None else max_bytes // 4
+        self.disk_dir = disk_dir
+        self.max_disk_bytes = max_disk_bytes
+        self.hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()
+        self._memory_bytes = 0
+        self._disk = OrderedDict()
+        self._disk_bytes = 0
+        self._lock = threading.Lock()
+
+        if self.disk_dir:
+            os.makedirs(self.disk_dir, exist_ok=True)
+            self._load_disk_index()
+
+    def make_key(self, reader, converter, output_format, options):
+        return content_key(reader, converter, output_format, options)
+
+    def get(self, key):
+        """Return the cached bytes for `key`, or None on a miss."""
+        with self._lock:
+            data = self._memory.get(key)
+            if data is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return data
+
+            if key in self._disk:
+                try:
+                    with open(self._disk_path(key), 'rb') as f:
+                        data = f.read()
+                except OSError:
+                    self._forget_disk_entry(key)
+                else:
+                    self._disk.move_to_end(key)
+                    os.utime(self._disk_path(key))
+                    self._store_in_memory(key, data)
+                    self.hits += 1
+                    return data
+
+            self.misses += 1
+            return None
+
+    def put(self, key, data):
+        with self._lock:
+            self._store_in_memory(key, data)
+            if self.disk_dir and len(data) <= self.max_disk_bytes:
+                self._store_on_disk(key, data)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries": len(self._memory),
+                "bytes": self._memory_bytes,
+                "disk_entries": len(self._disk),
+                "disk_bytes": self._disk_bytes,
+            }
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            self._memory_bytes = 0
+            for key in list(self._disk):
+                self._forget_disk_entry(key)
+            self.hits = 0
+            self.misses = 0
+
+    def _store_in_memory(self, key, data):
+        if len(data) > self.max_item_bytes:
+            return
+        if key in self._memory:
+            self._memory_bytes -= len(self._memory.pop(key))
+        self._memory[key] = data
+        self._memory_bytes += len(data)
+
+        # Evict least recently used entries until both limits hold
+        while self._memory and (len(self._memory) > self.max_entries or self._memory_bytes > self.max_bytes):
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= len(evicted)
+
+    def _store_on_disk(self, key, data):
+        if key in self._disk:
+            self._disk.move_to_end(key)
+            return
+        # Write to a temporary name first so readers never see partial files
+        fd, temp_path = tempfile.mkstemp(dir=self.disk_dir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(temp_path, self._disk_path(key))
+        except OSError:
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+            return
+        self._disk[key] = len(data)
+        self._disk_bytes += len(data)
+
+        while self._disk and self._disk_bytes > self.max_disk_bytes:
+            self._forget_disk_entry(next(iter(self._disk)))
+
+    def _forget_disk_entry(self, key):
+        self._disk_bytes -= self._disk.pop(key, 0)
+        try:
+            os.unlink(self._disk_path(key))
+        except OSError:
+            pass
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, f"{key}.bin")
+
+    def _load_disk_index(self):
+        entries = []
+        for name in os.listdir(self.disk_dir):
+            path = os.path.join(self.disk_dir, name)
+            if name.endswith('.tmp'):
+                os.unlink(path)
+            elif name.endswith('.bin'):
+                stat = os.stat(path)
+                entries.append((stat.st_mtime, name[:-len('.bin')], stat.st_size))
+        # Oldest access first, matching the in-memory LRU order
+        for _, key, size in sorted(entries):
+            self._disk[key] = size
+            self._disk_bytes += size
+
+# Shared cache used by every converter; set CONVERTER_CACHE_DIR to also keep
+# results on local disk across restarts
+default_cache = ResultCache(disk_dir=os.environ.get("CONVERTER_CACHE_DIR") or None)
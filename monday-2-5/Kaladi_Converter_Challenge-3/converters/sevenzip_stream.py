@@ -0,0 +1,79 @@
+import io
+from py7zr.io import Py7zIO, WriterFactory
+from .base_converter import CHUNK_SIZE
+
+# Streams 7z members out of py7zr's extraction thread. Kept apart from
+# archive_converter so py7zr is only imported once a 7z archive comes in.
+
+class QueueReader(io.RawIOBase):
+    """Readable stream over one 7z member, fed by a background extraction.
+
+    Closing it consumes whatever was not read, so the next member lines up.
+    """
+
+    def __init__(self, events):
+        self._events = events
+        self._buffer = b''
+        self._done = False
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while not self._buffer and not self._done:
+            kind, value = self._events.get()
+            if kind == 'data':
+                self._buffer = value
+            elif kind == 'end':
+                self._done = True
+            elif kind == 'error':
+                raise value
+        size = min(len(buffer), len(self._buffer))
+        buffer[:size] = self._buffer[:size]
+        self._buffer = self._buffer[size:]
+        return size
+
+    def drain(self):
+        self._buffer = b''
+        while not self._done:
+            self.readinto(bytearray(CHUNK_SIZE))
+
+    def close(self):
+        if not self.closed:
+            self.drain()
+        super().close()
+
+class QueueWriter(Py7zIO):
+    """py7zr output target that forwards decompressed bytes to the reading thread."""
+
+    def __init__(self, put):
+        self._put = put
+        self._size = 0
+
+    def write(self, s):
+        self._put(('data', bytes(s)))
+        self._size += len(s)
+        return len(s)
+
+    def read(self, size=None):
+        return b''
+
+    def seek(self, offset, whence=0):
+        return 0
+
+    def flush(self):
+        pass
+
+    def size(self):
+        return self._size
+
+    def close(self):
+        self._put(('end', None))
+
+class QueueWriterFactory(WriterFactory):
+    def __init__(self, put):
+        self._put = put
+
+    def create(self, filename):
+        self._put(('member', filename))
+        return QueueWriter(self._put)
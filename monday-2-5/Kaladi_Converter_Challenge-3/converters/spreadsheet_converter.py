@@ -1,10 +1,46 @@
-from .base_converter import BaseConverter
-import pandas as pd
+from .base_converter import BaseConverter, CHUNK_SIZE, SPOOL_MAX_SIZE
+from .progress import ProgressReporter
 import io
+import os
+import re
+import shutil
+import tempfile
+import zipfile
 import streamlit as st
-from openpyxl import Workbook
 # from openpyxl.utils.dataframe import dataframe_to_rows
 
+# pandas, openpyxl and pyarrow are imported where they are used, so loading
+# the page does not pay for them before the first conversion
+
+# Rows per chunk when streaming CSV/TSV
+CHUNK_ROWS = 100_000
+# Bytes per block for the pyarrow CSV reader; types are inferred from the first block
+ARROW_BLOCK_SIZE = 16 * 1024 * 1024
+
+TEXT_SEPARATORS = {
+    'csv': ',',
+    'tsv': '\t'
+}
+
+# Columnar formats handled by pyarrow; Feather v2 is the Arrow IPC file format
+COLUMNAR_FORMATS = ['parquet', 'feather', 'arrow']
+DEFAULT_COMPRESSION = {
+    'parquet': 'snappy',
+    'feather': 'lz4',
+    'arrow': 'lz4'
+}
+IPC_COMPRESSIONS = ['lz4', 'zstd', 'none']
+
+# Sheet name for output made from a single table, e.g. CSV to xlsx or ods
+DEFAULT_SHEET_NAME = 'Sheet1'
+
+def _parse_columns(columns):
+    """Accept a list of column names or a comma-separated string; None keeps every column."""
+    if columns is None or isinstance(columns, (list, tuple)):
+        return list(columns) if columns else None
+    names = [name.strip() for name in str(columns).split(',') if name.strip()]
+    return names or None
+
 class SpreadsheetConverter(BaseConverter):
     def __init__(self):
         super().__init__()
@@ -12,37 +48,248 @@ class SpreadsheetConverter(BaseConverter):
         self.icon = "📊"
         self.description = "Convert spreadsheets between different formats"
         self.supported_formats = {
-            'xlsx': ['xls', 'csv', 'ods', 'tsv'],
-            'xls': ['xlsx', 'csv', 'ods', 'tsv'],
-            'csv': ['xlsx', 'xls', 'ods', 'tsv'],
-            'ods': ['xlsx', 'xls', 'csv', 'tsv'],
-            'tsv': ['xlsx', 'xls', 'csv', 'ods']
+            'xlsx': ['xls', 'csv', 'ods', 'tsv', 'parquet', 'feather', 'arrow'],
+            'xls': ['xlsx', 'csv', 'ods', 'tsv', 'parquet', 'feather', 'arrow'],
+            'csv': ['xlsx', 'xls', 'ods', 'tsv', 'parquet', 'feather', 'arrow'],
+            'ods': ['xlsx', 'xls', 'csv', 'tsv', 'parquet', 'feather', 'arrow'],
+            'tsv': ['xlsx', 'xls', 'csv', 'ods', 'parquet', 'feather', 'arrow'],
+            'parquet': ['xlsx', 'xls', 'csv', 'ods', 'tsv', 'feather', 'arrow'],
+            'feather': ['xlsx', 'xls', 'csv', 'ods', 'tsv', 'parquet', 'arrow'],
+            'arrow': ['xlsx', 'xls', 'csv', 'ods', 'tsv', 'parquet', 'feather']
         }
 
-    def convert(self, input_file, output_format, encoding='utf-8', include_header=True, delimiter=','):
-        # Read the input file
-        input_format = input_file.name.split('.')[-1].lower()
-        
-        if input_format in ['xlsx', 'xls']:
-            df = pd.read_excel(input_file)
-        elif input_format == 'csv':
-            df = pd.read_csv(input_file, encoding=encoding)
-        elif input_format == 'tsv':
-            df = pd.read_csv(input_file, sep='\t', encoding=encoding)
-        elif input_format == 'ods':
-            df = pd.read_excel(input_file, engine='odf')
-        
-        # Convert to output format
-        output = io.BytesIO()
-        
-        if output_format in ['xlsx', 'xls']:
-            df.to_excel(output, index=False, header=include_header)
-        elif output_format == 'csv':
-            df.to_csv(output, index=False, header=include_header, encoding=encoding)
-        elif output_format == 'tsv':
-            df.to_csv(output, index=False, header=include_header, sep='\t', encoding=encoding)
+    def convert_stream(self, reader, writer, output_format, encoding='utf-8', include_header=True, delimiter=',',
+                       engine='pandas', columns=None, compression=None, sheets='all', progress=None):
+        """Convert a spreadsheet. CSV/TSV input is read in chunks of CHUNK_ROWS
+        rows, parsed by pandas or, with engine='pyarrow', by pyarrow.
+
+        Every sheet of a workbook is converted (sheets='first' keeps only the
+        first): xlsx and ods output get one worksheet per sheet, other formats
+        one file per sheet in a ZIP. `columns` keeps only the named columns (in
+        a workbook, those each sheet has; a name no sheet has is an error) and
+        `compression` picks the Parquet/Feather/Arrow codec. Progress counts
+        input bytes read, or sheets for workbooks.
+        """
+        input_format = self._get_input_format(reader)
+        columns = _parse_columns(columns)
+        # CSV <-> TSV only re-delimits, so values stay text and skip type inference
+        as_text = input_format in TEXT_SEPARATORS and output_format in TEXT_SEPARATORS
+        # Columnar output needs one schema for the whole file, which pyarrow infers consistently
+        if output_format in COLUMNAR_FORMATS:
+            engine = 'pyarrow'
+
+        # Read the input as (sheet name, stream of DataFrame chunks) pairs
+        if input_format in ['xlsx', 'xls', 'ods']:
+            import pandas as pd
+            # A callable is checked per sheet, so a sheet without some of the columns keeps the ones it has
+            sheet_frames = pd.read_excel(
+                reader, sheet_name=None if sheets == 'all' else 0,
+                usecols=(lambda name: str(name) in columns) if columns else None,
+                engine='odf' if input_format == 'ods' else None
+            )
+            if isinstance(sheet_frames, pd.DataFrame):
+                sheet_frames = {DEFAULT_SHEET_NAME: sheet_frames}
+            if columns:
+                found = {str(name) for df in sheet_frames.values() for name in df.columns}
+                missing = [name for name in columns if name not in found]
+                if missing:
+                    raise ValueError(f"Columns not found in any sheet: {', '.join(missing)}")
+            sheet_chunks = [(name, [df]) for name, df in sheet_frames.items()]
+            reporter = ProgressReporter.of(progress, unit="sheets", total=len(sheet_chunks))
+            sheet_chunks = [(name, self._count_chunks(chunks, reporter)) for name, chunks in sheet_chunks]
+        else:
+            reporter = ProgressReporter.of(progress, unit="bytes", total=self._stream_size(reader))
+            start = reader.tell()
+            chunks = self._read_chunks(reader, input_format, encoding, engine, as_text, columns)
+            sheet_chunks = [(None, self._count_chunks(chunks, reporter, lambda: reader.tell() - start))]
+
+        # Write the output format straight to the writer
+        if output_format == 'xlsx':
+            self._write_xlsx(sheet_chunks, writer, include_header)
         elif output_format == 'ods':
-            df.to_excel(output, index=False, header=include_header, engine='odf')
-        
-        output.seek(0)
-        return output.getvalue() 
\ No newline at end of file
+            self._write_ods(sheet_chunks, writer, include_header)
+        elif len(sheet_chunks) == 1:
+            self._write_sheet(sheet_chunks[0][1], writer, output_format, encoding, include_header, compression)
+        else:
+            with zipfile.ZipFile(writer, 'w', compression=zipfile.ZIP_DEFLATED) as zip_out:
+                used_names = set()
+                for name, chunks in sheet_chunks:
+                    file_name = self._sheet_file_name(name, output_format, used_names)
+                    # Parquet and Arrow writers need a seekable target, so each sheet is spooled first
+                    with tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE) as part:
+                        self._write_sheet(chunks, part, output_format, encoding, include_header, compression)
+                        part.seek(0)
+                        with zip_out.open(file_name, 'w', force_zip64=True) as target:
+                            shutil.copyfileobj(part, target, CHUNK_SIZE)
+
+    def _count_chunks(self, chunks, reporter, position=None):
+        """Pass chunks through, counting their rows as they are written.
+
+        `position` returns the input bytes read so far (a cheap tell() per
+        chunk); without it each chunk counts as one unit, i.e. one sheet.
+        """
+        for df in chunks:
+            yield df
+            reporter.counters['rows'] = reporter.counters.get('rows', 0) + len(df)
+            if position is None:
+                reporter.advance()
+            else:
+                reporter.update(position())
+
+    def _write_sheet(self, chunks, writer, output_format, encoding, include_header, compression):
+        import pandas as pd
+
+        if output_format in TEXT_SEPARATORS:
+            self._write_text(chunks, writer, TEXT_SEPARATORS[output_format], encoding, include_header)
+        elif output_format in COLUMNAR_FORMATS:
+            self._write_columnar(chunks, writer, output_format, compression)
+        elif output_format == 'xls':
+            pd.concat(chunks, ignore_index=True).to_excel(writer, index=False, header=include_header)
+        else:
+            raise ValueError(f"Unsupported output format: {output_format}")
+
+    def _sheet_file_name(self, sheet_name, output_format, used_names):
+        stem = re.sub(r'[^\w\-. ]+', '_', str(sheet_name)).strip() or 'sheet'
+        name = f"{stem}.{output_format}"
+        counter = 2
+        while name in used_names:
+            name = f"{stem}_{counter}.{output_format}"
+            counter += 1
+        used_names.add(name)
+        return name
+
+    def _read_chunks(self, reader, input_format, encoding, engine, as_text, columns=None):
+        if input_format in TEXT_SEPARATORS:
+            sep = TEXT_SEPARATORS[input_format]
+            if engine == 'pyarrow':
+                return self._read_arrow_csv(reader, sep, encoding, as_text, columns)
+            import pandas as pd
+            text_options = {'dtype': str, 'keep_default_na': False} if as_text else {}
+            return pd.read_csv(reader, sep=sep, encoding=encoding, chunksize=CHUNK_ROWS, usecols=columns,
+                               **text_options)
+        if input_format == 'parquet':
+            return self._read_parquet(reader, columns)
+        if input_format in ['feather', 'arrow']:
+            return self._read_arrow_ipc(reader, columns)
+        raise ValueError(f"Unsupported input format: {input_format}")
+
+    def _read_parquet(self, reader, columns):
+        """Yield DataFrame chunks one batch of rows at a time, reading only the wanted columns."""
+        import pandas as pd
+        import pyarrow.parquet as pq
+
+        parquet_file = pq.ParquetFile(reader)
+        for batch in parquet_file.iter_batches(batch_size=CHUNK_ROWS, columns=columns):
+            yield batch.to_pandas(types_mapper=pd.ArrowDtype)
+
+    def _read_arrow_ipc(self, reader, columns):
+        """Yield DataFrame chunks from a memory-mapped Feather/Arrow IPC file."""
+        import pandas as pd
+        import pyarrow as pa
+
+        # Memory-mapping lets pyarrow read record batches without copying them
+        temp_path = self._spool_to_file(reader, suffix='.arrow')
+        try:
+            with pa.memory_map(temp_path, 'r') as source:
+                try:
+                    batches = pa.ipc.open_file(source)
+                    batch_iter = (batches.get_batch(i) for i in range(batches.num_record_batches))
+                except pa.ArrowInvalid:
+                    # Arrow IPC stream format rather than the file format
+                    source.seek(0)
+                    batch_iter = pa.ipc.open_stream(source)
+                for batch in batch_iter:
+                    if columns:
+                        batch = batch.select(columns)
+                    yield batch.to_pandas(types_mapper=pd.ArrowDtype)
+        finally:
+            os.unlink(temp_path)
+
+    def _read_arrow_csv(self, reader, sep, encoding, as_text, columns=None):
+        """Yield DataFrame chunks parsed by pyarrow's streaming CSV reader."""
+        import pandas as pd
+        import pyarrow as pa
+        from pyarrow import csv as pa_csv
+
+        read_options = pa_csv.ReadOptions(encoding=encoding, block_size=ARROW_BLOCK_SIZE)
+        parse_options = pa_csv.ParseOptions(delimiter=sep)
+        convert_options = pa_csv.ConvertOptions(include_columns=columns)
+        if as_text:
+            # Peek at the header, then read every column as a string
+            start = reader.tell()
+            names = pa_csv.open_csv(reader, read_options=read_options, parse_options=parse_options).schema.names
+            reader.seek(start)
+            convert_options = pa_csv.ConvertOptions(
+                column_types={name: pa.string() for name in names}, strings_can_be_null=False,
+                include_columns=columns
+            )
+
+        batches = pa_csv.open_csv(
+            reader, read_options=read_options, parse_options=parse_options, convert_options=convert_options
+        )
+        try:
+            for batch in batches:
+                # Arrow-backed columns avoid object dtype for strings
+                yield batch.to_pandas(types_mapper=pd.ArrowDtype)
+        except pa.ArrowInvalid as e:
+            raise ValueError(f"Column types changed partway through the file; use the pandas engine: {str(e)}")
+
+    def _write_text(self, chunks, writer, sep, encoding, include_header):
+        first = True
+        for df in chunks:
+            df.to_csv(writer, index=False, header=include_header and first, sep=sep, encoding=encoding)
+            first = False
+
+    def _write_columnar(self, chunks, writer, output_format, compression):
+        """Write Parquet, Feather or Arrow IPC one chunk (row group / record batch) at a time."""
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        compression = (compression or DEFAULT_COMPRESSION[output_format]).lower()
+        if output_format != 'parquet' and compression not in IPC_COMPRESSIONS:
+            raise ValueError(f"{output_format} supports {', '.join(IPC_COMPRESSIONS)} compression, not {compression}")
+        codec = None if compression == 'none' else compression
+
+        sink = None
+        schema = None
+        try:
+            for df in chunks:
+                df.columns = [str(column) for column in df.columns]
+                table = pa.Table.from_pandas(df, schema=schema, preserve_index=False)
+                if sink is None:
+                    schema = table.schema
+                    if output_format == 'parquet':
+                        sink = pq.ParquetWriter(writer, schema, compression=codec or 'none')
+                    else:
+                        sink = pa.ipc.new_file(writer, schema, options=pa.ipc.IpcWriteOptions(compression=codec))
+                sink.write_table(table)
+        finally:
+            if sink is not None:
+                sink.close()
+
+    def _write_xlsx(self, sheet_chunks, writer, include_header):
+        from openpyxl import Workbook
+
+        # Write-only mode streams rows to disk instead of building the sheet in memory
+        workbook = Workbook(write_only=True)
+        for name, chunks in sheet_chunks:
+            sheet = workbook.create_sheet(title=name or DEFAULT_SHEET_NAME)
+            first = True
+            for df in chunks:
+                if first and include_header:
+                    sheet.append([str(column) for column in df.columns])
+                first = False
+                # openpyxl cannot write NaN/NA; empty cells are None
+                rows = df.astype(object).where(df.notna(), None)
+                for row in rows.itertuples(index=False, name=None):
+                    sheet.append(row)
+        workbook.save(writer)
+
+    def _write_ods(self, sheet_chunks, writer, include_header):
+        import pandas as pd
+
+        with pd.ExcelWriter(writer, engine='odf') as workbook:
+            for name, chunks in sheet_chunks:
+                pd.concat(chunks, ignore_index=True).to_excel(
+                    workbook, sheet_name=name or DEFAULT_SHEET_NAME, index=False, header=include_header
+                )
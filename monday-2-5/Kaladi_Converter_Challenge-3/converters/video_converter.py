@@ -1,9 +1,155 @@
 from .base_converter import BaseConverter
-from moviepy.editor import VideoFileClip
+from .progress import ProgressReporter
 import io
 import streamlit as st
 import tempfile
 import os
+import glob
+import json
+import re
+import shutil
+import subprocess
+import threading
+import time
+
+# x264/x265 speed presets, fastest first
+PRESETS = ["ultrafast", "superfast", "veryfast", "faster", "fast", "medium", "slow"]
+
+# ffmpeg codec names behind the codec choices offered in the UI
+VIDEO_CODECS = {
+    "H.264": ("libx264", "h264"),
+    "H.265": ("libx265", "hevc"),
+    "VP9": ("libvpx-vp9", "vp9")
+}
+
+# Stream codecs each container can hold without re-encoding; None accepts anything
+CONTAINER_CODECS = {
+    'mp4': ({'h264', 'hevc', 'mpeg4', 'av1'}, {'aac', 'mp3', 'ac3', 'eac3', 'alac', 'opus'}),
+    'mpeg4': ({'h264', 'hevc', 'mpeg4', 'av1'}, {'aac', 'mp3', 'ac3', 'eac3', 'alac', 'opus'}),
+    'mov': ({'h264', 'hevc', 'mpeg4', 'prores', 'mjpeg'}, {'aac', 'mp3', 'ac3', 'alac', 'pcm_s16le'}),
+    'mkv': (None, None),
+    'webm': ({'vp8', 'vp9', 'av1'}, {'vorbis', 'opus'}),
+    'avi': ({'mpeg4', 'h264', 'mjpeg', 'msmpeg4v2'}, {'mp3', 'ac3', 'pcm_s16le'}),
+    'flv': ({'h264', 'flv1'}, {'aac', 'mp3'}),
+    'wmv': ({'wmv1', 'wmv2', 'wmv3', 'vc1'}, {'wmav1', 'wmav2'})
+}
+
+# ffmpeg muxer names for extensions it cannot guess
+MUXERS = {
+    'mkv': 'matroska',
+    'wmv': 'asf',
+    'mpeg4': 'mp4'
+}
+
+# Bitrates behind the quality choices offered in the UI
+BITRATES = {
+    "Low": "1000k",
+    "Medium": "2500k",
+    "High": "5000k"
+}
+
+# Shortest stretch of video worth its own segment in segmented mode
+MIN_SEGMENT_SECONDS = 30
+
+def ffmpeg_exe():
+    """The ffmpeg binary moviepy uses (bundled with imageio-ffmpeg)."""
+    import imageio_ffmpeg
+    return imageio_ffmpeg.get_ffmpeg_exe()
+
+def probe_streams(path):
+    """Return [(codec_type, codec_name), ...] for every stream in the file.
+
+    Uses ffprobe when it is installed, otherwise parses `ffmpeg -i`.
+    """
+    ffprobe = shutil.which("ffprobe")
+    if ffprobe:
+        result = subprocess.run(
+            [ffprobe, "-v", "error", "-show_entries", "stream=codec_type,codec_name", "-of", "json", path],
+            capture_output=True, text=True, check=True
+        )
+        return [(s.get("codec_type"), s.get("codec_name")) for s in json.loads(result.stdout).get("streams", [])]
+
+    # Without an output file ffmpeg exits non-zero after printing the stream list
+    result = subprocess.run([ffmpeg_exe(), "-hide_banner", "-i", path], capture_output=True, text=True)
+    streams = re.findall(r"Stream #\d+:\d+\S*: (Video|Audio|Subtitle|Data|Attachment): (\w+)", result.stderr)
+    return [(kind.lower(), codec) for kind, codec in streams]
+
+def probe_duration(path):
+    """Return the duration of the file in seconds, or None if it is unknown."""
+    ffprobe = shutil.which("ffprobe")
+    if ffprobe:
+        result = subprocess.run(
+            [ffprobe, "-v", "error", "-show_entries", "format=duration", "-of", "json", path],
+            capture_output=True, text=True
+        )
+        try:
+            return float(json.loads(result.stdout)["format"]["duration"])
+        except (KeyError, ValueError, TypeError):
+            return None
+
+    result = subprocess.run([ffmpeg_exe(), "-hide_banner", "-i", path], capture_output=True, text=True)
+    match = re.search(r"Duration: (\d+):(\d+):(\d+(?:\.\d+)?)", result.stderr)
+    if not match:
+        return None
+    hours, minutes, seconds = match.groups()
+    return int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+
+def _progress_logger(reporter):
+    """Return a moviepy logger that forwards its frame counter to a ProgressReporter."""
+    # proglog comes with moviepy, so it is only loaded once an encode starts
+    import proglog
+
+    class ProgressLogger(proglog.ProgressBarLogger):
+        def bars_callback(self, bar, attr, value, old_value=None):
+            # 't' counts video frames; the audio pass ('chunk') is quick in comparison
+            if bar == 't' and attr == 'index':
+                reporter.total = self.bars[bar].get('total')
+                reporter.update(value, frames=value)
+
+    return ProgressLogger()
+
+class _FfmpegTask:
+    """One ffmpeg process whose encoded position is read from `-progress`."""
+
+    def __init__(self, command, duration, log_path):
+        self.duration = duration or 0
+        self.position = 0.0
+        self.frames = 0
+        self.log_path = log_path
+        with open(log_path, 'wb') as log:
+            self.process = subprocess.Popen(
+                command[:1] + ["-nostats", "-progress", "pipe:1"] + command[1:],
+                stdout=subprocess.PIPE, stderr=log, text=True
+            )
+        self._reader = threading.Thread(target=self._read_progress, daemon=True)
+        self._reader.start()
+
+    def _read_progress(self):
+        for line in self.process.stdout:
+            key, _, value = line.strip().partition('=')
+            # out_time_us (out_time_ms too, despite its name) is the encoded position in microseconds
+            if key == 'out_time_us' and value.isdigit():
+                self.position = int(value) / 1e6
+            elif key == 'frame' and value.isdigit():
+                self.frames = int(value)
+
+    def done_seconds(self):
+        if self.process.poll() == 0:
+            return self.duration
+        return min(self.position, self.duration)
+
+    def finish(self):
+        """Wait for the process; raise with its log if it failed."""
+        returncode = self.process.wait()
+        self._reader.join()
+        if returncode != 0:
+            with open(self.log_path, errors='replace') as log:
+                raise ValueError(f"Encoding failed: {log.read().strip()}")
+
+    def kill(self):
+        if self.process.poll() is None:
+            self.process.kill()
+            self.process.wait()
 
 class VideoConverter(BaseConverter):
     def __init__(self):
@@ -22,67 +168,245 @@ class VideoConverter(BaseConverter):
             'mpeg4': ['mp4', 'avi', 'mov', 'mkv', 'wmv', 'flv', 'webm']
         }
 
-    def convert(self, input_file, output_format, resolution="Original", quality="High", codec="H.264"):
+    def convert_stream(self, reader, writer, output_format, resolution="Original", quality="High", codec="H.264",
+                       preset="medium", threads=None, remux="auto", segments=1, progress=None):
+        """Convert a video.
+
+        With remux="auto", inputs whose streams already match the chosen codec
+        and fit the target container are copied with `-c copy` instead of
+        being re-encoded. Re-encodes use the given x264/x265 `preset` and
+        `threads` (None lets ffmpeg decide).
+
+        Segmented encoding is opt-in: with `segments` above 1, re-encodes are
+        split at keyframes into that many pieces, encoded in parallel and
+        joined without re-encoding; 0 picks one piece per CPU for videos of
+        at least MIN_SEGMENT_SECONDS per piece. The default of 1 encodes in
+        one pass. Progress is counted in encoded frames, or seconds of video
+        in segmented mode, where the 'segments' counter also lists each
+        piece's own fraction done.
+        """
+        reporter = ProgressReporter.of(progress)
+        if preset not in PRESETS:
+            raise ValueError(f"Unknown preset {preset}; choose one of {', '.join(PRESETS)}")
+
         # Create temporary files for input and output
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.mp4') as temp_input:
-            temp_input.write(input_file.getvalue())
-            temp_input_path = temp_input.name
+        input_format = self._get_input_format(reader) or "mp4"
+        temp_input_path = self._spool_to_file(reader, suffix=f'.{input_format}')
 
         temp_output_path = tempfile.NamedTemporaryFile(delete=False, suffix=f'.{output_format}').name
 
         try:
-            # Load video using moviepy
-            video = VideoFileClip(temp_input_path)
+            # Keeping the same container only makes sense as a re-encode
+            if (remux == "auto" and input_format != output_format
+                    and self._can_remux(temp_input_path, output_format, resolution, codec)):
+                self._remux(temp_input_path, temp_output_path, output_format)
+            else:
+                segment_count = self._segment_count(temp_input_path, segments)
+                if segment_count > 1:
+                    self._encode_segmented(temp_input_path, temp_output_path, output_format, resolution, quality,
+                                           codec, preset, threads, segment_count, reporter)
+                else:
+                    self._encode(temp_input_path, temp_output_path, resolution, quality, codec, preset, threads,
+                                 reporter)
+
+            # Copy the output file to the writer
+            self._copy_file_to_writer(temp_output_path, writer)
+
+        except Exception as e:
+            st.error(f"Error converting video: {str(e)}")
+            raise
 
+        finally:
+            # Clean up temporary files
+            if os.path.exists(temp_input_path):
+                os.unlink(temp_input_path)
+            if os.path.exists(temp_output_path):
+                os.unlink(temp_output_path)
+
+    def _segment_count(self, input_path, segments):
+        if segments:
+            return max(1, int(segments))
+        cpus = os.cpu_count() or 1
+        if cpus == 1:
+            return 1
+        duration = probe_duration(input_path) or 0
+        return max(1, min(cpus, int(duration // MIN_SEGMENT_SECONDS)))
+
+    def _can_remux(self, input_path, output_format, resolution, codec):
+        """True if the streams can be copied into the target container as they are."""
+        if resolution != "Original" or output_format not in CONTAINER_CODECS:
+            return False
+        try:
+            streams = probe_streams(input_path)
+        except (OSError, subprocess.SubprocessError, ValueError):
+            return False
+        video_codecs = [name for kind, name in streams if kind == 'video']
+        audio_codecs = [name for kind, name in streams if kind == 'audio']
+        if not video_codecs:
+            return False
+
+        # A different codec was asked for, so the video has to be re-encoded
+        wanted = VIDEO_CODECS.get(codec, VIDEO_CODECS["H.264"])[1]
+        if any(name != wanted for name in video_codecs):
+            return False
+
+        allowed_video, allowed_audio = CONTAINER_CODECS[output_format]
+        if allowed_video is not None and any(name not in allowed_video for name in video_codecs):
+            return False
+        if allowed_audio is not None and any(name not in allowed_audio for name in audio_codecs):
+            return False
+        return True
+
+    def _remux(self, input_path, output_path, output_format):
+        command = [ffmpeg_exe(), "-hide_banner", "-loglevel", "error", "-y", "-i", input_path,
+                   "-map", "0:v", "-map", "0:a?"]
+        # Only Matroska takes subtitle streams of any kind
+        if output_format == 'mkv':
+            command += ["-map", "0:s?"]
+        command += ["-c", "copy"]
+        if output_format in ['mp4', 'mpeg4', 'mov']:
+            # Put the index first so playback can start before the download finishes
+            command += ["-movflags", "+faststart"]
+        if output_format in MUXERS:
+            command += ["-f", MUXERS[output_format]]
+        command.append(output_path)
+        result = subprocess.run(command, capture_output=True, text=True)
+        if result.returncode != 0:
+            raise ValueError(f"Remuxing failed: {result.stderr.strip()}")
+
+    def _encode(self, input_path, output_path, resolution, quality, codec, preset, threads, reporter):
+        # moviepy.editor takes most of a second to import, so it waits for the first encode
+        from moviepy.editor import VideoFileClip
+
+        # Load video using moviepy
+        video = VideoFileClip(input_path)
+        try:
             # Set resolution
             if resolution != "Original":
                 width, height = map(int, resolution.split('x'))
                 video = video.resize(newsize=(width, height))
 
             # Set quality (approximated via bitrate)
-            bitrate = "5000k"  # Default high quality
-            if quality == "Low":
-                bitrate = "1000k"
-            elif quality == "Medium":
-                bitrate = "2500k"
-            elif quality == "High":
-                bitrate = "5000k"
+            bitrate = BITRATES.get(quality, BITRATES["High"])
 
             # Set codec
-            if codec == "H.264":
-                video_codec = "libx264"
-            elif codec == "H.265":
-                video_codec = "libx265"
-            elif codec == "VP9":
-                video_codec = "libvpx-vp9"
-            else:
-                video_codec = "libx264"  # Fallback
+            video_codec = VIDEO_CODECS.get(codec, VIDEO_CODECS["H.264"])[0]
 
             # Write the output file
+            temp_audio_path = tempfile.NamedTemporaryFile(delete=False, suffix='.aac').name
             video.write_videofile(
-                temp_output_path,
+                output_path,
                 codec=video_codec,
                 bitrate=bitrate,
                 audio_codec="aac",  # Default audio codec
-                temp_audiofile=tempfile.NamedTemporaryFile(delete=False, suffix='.aac').name,
+                temp_audiofile=temp_audio_path,
                 remove_temp=True,
-                verbose=False
+                preset=preset,
+                threads=threads,
+                verbose=False,
+                logger=_progress_logger(ProgressReporter.of(reporter, unit="frames"))
             )
+        finally:
+            video.close()
 
-            # Read the output file
-            with open(temp_output_path, 'rb') as f:
-                output_data = f.read()
+    def _encode_segmented(self, input_path, output_path, output_format, resolution, quality, codec, preset, threads,
+                          segment_count, reporter):
+        """Encode keyframe-aligned pieces of the video in parallel ffmpeg processes.
 
-            return output_data
+        The source is cut with `-c copy`, so every piece starts on a keyframe
+        and decodes on its own. Audio is encoded once, in parallel with the
+        video pieces, to avoid gaps at the joins; the concat demuxer then
+        joins everything without re-encoding.
+        """
+        work_dir = tempfile.mkdtemp(prefix="segments_")
+        tasks = []
+        try:
+            # Split the video stream at the keyframes nearest to equal cut points
+            duration = probe_duration(input_path)
+            if not duration:
+                raise ValueError("Could not read the video duration")
+            cut_points = ",".join(f"{duration * i / segment_count:.3f}" for i in range(1, segment_count))
+            self._run_ffmpeg([
+                ffmpeg_exe(), "-hide_banner", "-loglevel", "error", "-y", "-i", input_path,
+                "-map", "0:v:0", "-c", "copy", "-f", "segment", "-segment_times", cut_points,
+                "-reset_timestamps", "1", os.path.join(work_dir, "source%04d.mkv")
+            ], "Splitting")
+            sources = sorted(glob.glob(os.path.join(work_dir, "source*.mkv")))
 
-        except Exception as e:
-            st.error(f"Error converting video: {str(e)}")
-            raise
+            video_codec = VIDEO_CODECS.get(codec, VIDEO_CODECS["H.264"])[0]
+            video_options = ["-c:v", video_codec, "-b:v", BITRATES.get(quality, BITRATES["High"])]
+            if video_codec in ["libx264", "libx265"]:
+                video_options += ["-preset", preset, "-pix_fmt", "yuv420p"]
+            if resolution != "Original":
+                width, height = map(int, resolution.split('x'))
+                video_options += ["-vf", f"scale={width}:{height}"]
+            # Split the cores between the processes unless a thread count was asked for
+            parallel = min(len(sources), os.cpu_count() or 1)
+            video_options += ["-threads", str(threads or max(1, (os.cpu_count() or 1) // parallel))]
+
+            jobs = []
+            for index, source in enumerate(sources):
+                target = os.path.join(work_dir, f"encoded{index:04d}.mkv")
+                command = [ffmpeg_exe(), "-hide_banner", "-loglevel", "error", "-y", "-i", source,
+                           *video_options, "-an", target]
+                jobs.append((command, probe_duration(source) or duration / len(sources)))
+
+            has_audio = any(kind == 'audio' for kind, _ in probe_streams(input_path))
+            audio_path = os.path.join(work_dir, "audio.mka")
+            if has_audio:
+                # Queued first so it overlaps with the video pieces rather than trailing them
+                jobs.insert(0, ([ffmpeg_exe(), "-hide_banner", "-loglevel", "error", "-y", "-i", input_path,
+                                 "-map", "0:a:0", "-vn", "-c:a", "aac", "-b:a", "192k", audio_path], 0))
+
+            self._run_parallel(jobs, parallel, work_dir, tasks, reporter)
 
+            # Join the encoded pieces losslessly with the concat demuxer
+            list_path = os.path.join(work_dir, "segments.txt")
+            with open(list_path, 'w') as segment_list:
+                for index in range(len(sources)):
+                    segment_list.write(f"file 'encoded{index:04d}.mkv'\n")
+            command = [ffmpeg_exe(), "-hide_banner", "-loglevel", "error", "-y",
+                       "-f", "concat", "-safe", "0", "-i", list_path]
+            if has_audio:
+                command += ["-i", audio_path, "-map", "0:v", "-map", "1:a"]
+            command += ["-c", "copy"]
+            if output_format in ['mp4', 'mpeg4', 'mov']:
+                command += ["-movflags", "+faststart"]
+            if output_format in MUXERS:
+                command += ["-f", MUXERS[output_format]]
+            command.append(output_path)
+            self._run_ffmpeg(command, "Joining segments")
         finally:
-            # Clean up temporary files and close video
-            video.close() if 'video' in locals() else None
-            if os.path.exists(temp_input_path):
-                os.unlink(temp_input_path)
-            if os.path.exists(temp_output_path):
-                os.unlink(temp_output_path)
\ No newline at end of file
+            for task in tasks:
+                task.kill()
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    def _run_parallel(self, jobs, parallel, work_dir, tasks, reporter):
+        """Run (command, duration) ffmpeg jobs, at most `parallel` at a time, reporting combined progress
+        and, as the 'segments' counter, the fraction done of each job with a duration."""
+        ProgressReporter.of(reporter, unit="seconds", total=sum(duration for _, duration in jobs) or None)
+        pending = list(enumerate(jobs))
+        running = []
+        while pending or running:
+            while pending and len(running) < parallel:
+                index, (command, duration) = pending.pop(0)
+                task = _FfmpegTask(command, duration, os.path.join(work_dir, f"log{index:04d}.txt"))
+                tasks.append(task)
+                running.append(task)
+
+            for task in [task for task in running if task.process.poll() is not None]:
+                task.finish()
+                running.remove(task)
+
+            # Jobs start in order, so started tasks come first and queued ones have done nothing yet
+            segment_fractions = [task.done_seconds() / task.duration for task in tasks if task.duration]
+            segment_fractions += [0.0 for _, (_, duration) in pending if duration]
+            reporter.update(sum(task.done_seconds() for task in tasks), frames=sum(task.frames for task in tasks),
+                            segments=segment_fractions)
+            if running:
+                time.sleep(0.1)
+
+    def _run_ffmpeg(self, command, step):
+        result = subprocess.run(command, capture_output=True, text=True)
+        if result.returncode != 0:
+            raise ValueError(f"{step} failed: {result.stderr.strip()}")
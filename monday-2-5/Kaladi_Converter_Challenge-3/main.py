@@ -1,12 +1,17 @@
 import streamlit as st
-from rembg import remove
 from PIL import Image
 import io
 import base64
 from supabase import create_client, Client
 import os
+import tempfile
 from dotenv import load_dotenv
 import stripe
+from converters.auth_tokens import AuthManager, SupabaseAuthBackend, TokenVerifier
+from converters.background_remover import DEFAULT_MODEL, MODELS, remove_background, remove_backgrounds_to_zip
+from converters.base_converter import SPOOL_MAX_SIZE
+from converters.credit_ledger import CreditLedger, SupabaseBackend
+from converters.progress import streamlit_progress
 
 # Load environment variables
 load_dotenv()
@@ -17,6 +22,8 @@ key = os.environ.get("SUPABASE_KEYS")
 service_key = os.environ.get("SUPABASE_SERVICE_KEY")
 stripe.api_key = os.environ.get("STRIPE_SECRET_KEY")
 STRIPE_PRICE_ID = os.environ.get("STRIPE_PRICE_ID")  # Add this to your .env
+# Lets access tokens be checked locally; without it they are checked against the project's JWKS
+JWT_SECRET = os.environ.get("SUPABASE_JWT_SECRET")
 
 # Validate credentials
 if not all([url, key, service_key, STRIPE_PRICE_ID]):
@@ -38,54 +45,39 @@ class CreditManager:
         self.free_limit = 5
         self.paid_credits_per_purchase = 10
         self.price_per_purchase = 5  # dollars
+        # Balances are cached for the whole process, so reruns do not re-read them
+        self.ledger = CreditLedger(SupabaseBackend(supabase, supabase_admin), self.free_limit)
 
     def get_user_credits(self, user_id, user_email):
         try:
-            res = supabase.table('user_credits').select('*').eq('id', user_id).execute()
-
-            
-            if res.data:
-                return res.data[0]
-            
-            # Create new record with admin client
-            new_credits = {
-                "id": user_id,
-                "email": user_email,
-                "free_credits_used": 0,
-                "paid_credits": 0
-            }
-            
-            insert_res = supabase_admin.table('user_credits').insert(new_credits).execute()
-            return insert_res.data[0]
-            
+            return self.ledger.balance(user_id, user_email)
         except Exception as e:
             st.error(f"Error accessing credits: {str(e)}")
             return {"free_credits_used": 0, "paid_credits": 0}
 
     def use_credit(self, user_id, user_email):
         try:
-            credits = self.get_user_credits(user_id, user_email)
-            
-            if credits['free_credits_used'] < self.free_limit:
-                # Use raw SQL increment
-                supabase.table('user_credits').update({
-                    "free_credits_used": credits['free_credits_used'] + 1
-                }).eq('id', user_id).execute()
-            else:
-                if credits['paid_credits'] <= 0:
-                    raise Exception("No credits left")
-                # Use raw SQL decrement
-                supabase.table('user_credits').update({
-                    "paid_credits": credits['paid_credits'] -1 
-                }).eq('id', user_id).execute()
-            
-            # Force UI refresh
-            st.session_state.credits_updated = True
-                
+            self.reserve_credits(user_id, user_email, 1)
         except Exception as e:
             st.error(f"Credit usage error: {str(e)}")
             raise
 
+    def reserve_credits(self, user_id, user_email, count):
+        """Take `count` credits at once, free ones first, or none if the user has fewer.
+
+        Returns {"free": n, "paid": n}, what was taken from each allowance,
+        for refund_credits.
+        """
+        reservation = self.ledger.reserve(user_id, user_email, count)
+        # Force UI refresh
+        st.session_state.credits_updated = True
+        return reservation
+
+    def refund_credits(self, user_id, user_email, reservation, count):
+        """Give back `count` credits of a reservation, paid ones first."""
+        self.ledger.refund(user_id, user_email, reservation, count)
+        st.session_state.credits_updated = True
+
     def create_checkout_session(self, user_email, user_id):
         try:
             session = stripe.checkout.Session.create(
@@ -111,71 +103,19 @@ class CreditManager:
     
     def add_paid_credits(self, user_id, user_email, credits_to_add=10):
         try:
-            credits = self.get_user_credits(user_id, user_email)
-            current_credits = credits.get("paid_credits", 0)
-
-            updated_credits = current_credits + credits_to_add
-
-            supabase_admin.table('user_credits').update({
-                "paid_credits": updated_credits
-            }).eq('id', user_id).execute()
-
+            self.ledger.add_paid(user_id, user_email, credits_to_add)
             st.success(f"{credits_to_add} paid credits added successfully!")
 
         except Exception as e:
             st.error(f"Failed to add credits: {str(e)}")
         
 
-class AuthManager:
-    def __init__(self):
-        self.session = None
-
-    def sign_up(self, email, password):
-        try:
-            response = supabase.auth.sign_up({
-                "email": email,
-                "password": password,
-            })
-            if not response.user.identities:
-                raise Exception("User already exists")
-            return True
-        except Exception as e:
-            st.error(f"Sign up failed: {str(e)}")
-            return False
-
-    def sign_in(self, email, password):
-        try:
-            response = supabase.auth.sign_in_with_password({
-                "email": email,
-                "password": password
-            })
-            st.session_state.user = response.user
-            st.session_state.authenticated = True
-            st.session_state.show_auth = False
-            return True
-        except Exception as e:
-            st.error(f"Sign in failed: {str(e)}")
-            return False
-
-    def sign_out(self):
-        try:
-            supabase.auth.sign_out()
-            st.session_state.clear()
-            st.success("Successfully signed out!")
-            return True
-        except Exception as e:
-            st.error(f"Sign out failed: {str(e)}")
-            return False
-
-    def get_current_user(self):
-        try:
-            return supabase.auth.get_user()
-        except:
-            return None
-
 class BackgroundRemoverApp:
     def __init__(self):
-        self.auth = AuthManager()
+        self.auth = AuthManager(
+            SupabaseAuthBackend(supabase),
+            TokenVerifier(secret=JWT_SECRET, jwks_url=f"{url}/auth/v1/.well-known/jwks.json")
+        )
         self.credit = CreditManager()
         self.setup_page()
         self.setup_styles()
@@ -265,6 +205,10 @@ class BackgroundRemoverApp:
             </div>
             """, unsafe_allow_html=True)
 
+        if st.toggle("Batch mode", help="Remove the background from several images and download them as a ZIP",
+                     disabled=not st.session_state.get('authenticated')):
+            self.show_batch_remover()
+            return
 
         uploaded_file = st.file_uploader(
             "Upload Image", 
@@ -314,11 +258,13 @@ class BackgroundRemoverApp:
                         """, unsafe_allow_html=True)
                 return
 
+            model = self.select_model()
+
             if st.button("Remove Background"):
                 try:
                     self.credit.use_credit(user.id, user.email)
                     with st.spinner("Processing..."):
-                        processed_image = remove(image)
+                        processed_image = remove_background(image, model=model)
                         st.session_state.processed_image = processed_image
                     st.rerun()
                 except Exception as e:
@@ -331,6 +277,56 @@ class BackgroundRemoverApp:
                             use_container_width=True)
                     self.download_processed_image()
 
+    def show_batch_remover(self):
+        user = st.session_state.user
+        uploaded_files = st.file_uploader(
+            "Upload Images",
+            type=['png', 'jpg', 'jpeg', 'webp'],
+            accept_multiple_files=True
+        )
+        if not uploaded_files:
+            return
+
+        model = self.select_model()
+        count = len(uploaded_files)
+        if st.button(f"Remove Backgrounds ({count} credit{'s' if count > 1 else ''})"):
+            # Take every credit up front so a batch cannot overspend, then refund the failures
+            try:
+                reservation = self.credit.reserve_credits(user.id, user.email, count)
+            except Exception as e:
+                st.warning(f"{str(e)}. Remove some images or buy more credits.")
+                return
+
+            # Everything is refunded unless the ZIP reaches the download button
+            refund = count
+            output_file = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+            try:
+                failures = remove_backgrounds_to_zip(uploaded_files, output_file, model=model,
+                                                     progress=streamlit_progress(st.progress(0)))
+                for name, error in failures:
+                    st.warning(f"{name}: {error} (credit refunded)")
+                if len(failures) < count:
+                    output_file.seek(0)
+                    # download_button takes bytes or a BytesIO, not a spooled temporary file
+                    st.download_button(
+                        label="📥 Download ZIP",
+                        data=output_file.read(),
+                        file_name="processed_images.zip",
+                        mime="application/zip"
+                    )
+                    st.success(f"Removed the background from {count - len(failures)} of {count} images")
+                refund = len(failures)
+            except Exception as e:
+                st.error(f"Batch failed, your credits were refunded: {str(e)}")
+            finally:
+                output_file.close()
+                if refund:
+                    self.credit.refund_credits(user.id, user.email, reservation, refund)
+
+    def select_model(self):
+        return st.selectbox("Model", options=list(MODELS), index=list(MODELS).index(DEFAULT_MODEL),
+                            format_func=MODELS.get)
+
     def download_processed_image(self):
         buffered = io.BytesIO()
         st.session_state.processed_image.save(buffered, format="PNG")
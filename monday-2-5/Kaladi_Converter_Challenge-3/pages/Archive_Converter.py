@@ -1,5 +1,8 @@
 import streamlit as st
+import tempfile
+from converters.base_converter import SPOOL_MAX_SIZE
 from converters.archive_converter import ArchiveConverter
+from converters.progress import streamlit_progress
 
 # Set page configuration
 st.set_page_config(
@@ -127,18 +130,22 @@ with st.container():
             try:
                 with st.spinner("Converting your archive..."):
                     # Perform conversion
-                    result = converter.convert(
+                    result = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+                    converter.convert_cached(
                         uploaded_file,
+                        result,
                         target_format.lower(),
                         compression_level=compression_level,
                         password=password if password_protect else None,
-                        split_size=part_size * 1024 * 1024 if split_archive else None
+                        split_size=part_size * 1024 * 1024 if split_archive else None,
+                        progress=streamlit_progress(st.progress(0))
                     )
+                    result.seek(0)
                     
-                    # Download button
+                    # Download button; it takes bytes, not a spooled temporary file
                     st.download_button(
                         label="Download Converted Archive",
-                        data=result,
+                        data=result.read(),
                         file_name=f"converted_archive.{target_format.lower()}",
                         mime=f"application/{target_format.lower()}"
                     )
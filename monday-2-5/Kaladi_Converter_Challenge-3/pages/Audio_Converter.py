@@ -1,5 +1,6 @@
 import streamlit as st
 from converters.audio_converter import AudioConverter
+from converters.progress import streamlit_progress
 
 # Set page configuration
 st.set_page_config(
@@ -141,7 +142,8 @@ with st.container():
                         target_format.lower(),
                         bitrate=bitrate_value,
                         sample_rate=sample_rate_value,
-                        channels=channels_value
+                        channels=channels_value,
+                        progress=streamlit_progress(st.progress(0))
                     )
                     
                     # Download button
@@ -1,5 +1,15 @@
 import streamlit as st
+import io
+import tempfile
+from converters.base_converter import SPOOL_MAX_SIZE
+from converters.format_router import get_format_graph
 from converters.image_converter import ImageConverter
+from converters.pdf_raster import RASTER_FORMATS, parse_page_range
+from converters.progress import streamlit_progress
+
+# Documents no single converter turns into images; the format graph chains
+# them through PDF (e.g. DOCX -> PDF -> PNG)
+DOCUMENT_INPUTS = ['docx', 'doc', 'odt', 'rtf', 'txt']
 
 # Set page configuration
 st.set_page_config(
@@ -80,22 +90,34 @@ with st.container():
     
     # File upload section
     st.markdown("### Upload Your Image")
-    uploaded_file = st.file_uploader(
-        "Choose an image file",
-        type=['jpg', 'jpeg', 'png', 'gif', 'bmp', 'webp', 'tiff'],
-        help="Supported formats: JPG, JPEG, PNG, GIF, BMP, WEBP, TIFF"
+    uploaded_files = st.file_uploader(
+        "Choose one or more image files",
+        type=['jpg', 'jpeg', 'png', 'gif', 'bmp', 'webp', 'tiff', 'pdf'] + DOCUMENT_INPUTS,
+        accept_multiple_files=True,
+        help="Supported formats: JPG, JPEG, PNG, GIF, BMP, WEBP, TIFF, PDF (pages are rendered as images), "
+             "and DOCX, DOC, ODT, RTF, TXT (the first page is rendered)"
     )
     
-    if uploaded_file:
+    if uploaded_files:
+        uploaded_file = uploaded_files[0]
+        batch_mode = len(uploaded_files) > 1
+        is_pdf = uploaded_file.name.lower().endswith('.pdf')
+        is_document = uploaded_file.name.lower().rsplit('.', 1)[-1] in DOCUMENT_INPUTS
+
         # Display file info
         st.markdown('<div class="file-info">', unsafe_allow_html=True)
-        st.write(f"**File Name:** {uploaded_file.name}")
-        st.write(f"**File Size:** {uploaded_file.size / 1024:.2f} KB")
-        st.write(f"**File Type:** {uploaded_file.type}")
+        if batch_mode:
+            st.write(f"**Files:** {len(uploaded_files)}")
+            st.write(f"**Total Size:** {sum(f.size for f in uploaded_files) / 1024:.2f} KB")
+        else:
+            st.write(f"**File Name:** {uploaded_file.name}")
+            st.write(f"**File Size:** {uploaded_file.size / 1024:.2f} KB")
+            st.write(f"**File Type:** {uploaded_file.type}")
         st.markdown('</div>', unsafe_allow_html=True)
         
         # Image preview
-        st.image(uploaded_file, caption="Image Preview", use_column_width=True)
+        if not batch_mode and not is_pdf and not is_document:
+            st.image(uploaded_file, caption="Image Preview", use_column_width=True)
         
         # Conversion options
         st.markdown("### Conversion Options")
@@ -107,6 +129,12 @@ with st.container():
                 ["JPG", "PNG", "WEBP", "GIF", "BMP", "TIFF"],
                 help="Choose the format you want to convert your image to"
             )
+            if is_pdf and not batch_mode:
+                pages = st.text_input(
+                    "Pages",
+                    value="1",
+                    help="Pages to render, e.g. 1-3,5 or all. Several pages download as a ZIP (JPG, PNG and TIFF only)"
+                )
         
         with col2:
             quality = st.slider(
@@ -116,20 +144,93 @@ with st.container():
                 value=85,
                 help="Adjust the quality of the output image (higher values = better quality but larger file size)"
             )
+            if (is_pdf or is_document) and not batch_mode:
+                dpi = st.number_input(
+                    "Resolution (DPI)",
+                    min_value=36,
+                    max_value=600,
+                    value=200,
+                    step=12,
+                    help="Higher resolutions give sharper pages and larger files"
+                )
         
+        # Batch conversion runs across all CPU cores and returns a ZIP
+        if batch_mode and st.button("Convert All Images", type="primary"):
+            try:
+                with st.spinner(f"Converting {len(uploaded_files)} images..."):
+                    result = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+                    failures = converter.convert_many_to_zip(
+                        uploaded_files,
+                        result,
+                        target_format.lower(),
+                        quality=quality,
+                        progress=streamlit_progress(st.progress(0))
+                    )
+                    result.seek(0)
+                    for name, error in failures:
+                        st.warning(f"Could not convert {name}: {error}")
+
+                    # download_button takes bytes, not a spooled temporary file
+                    st.download_button(
+                        label="Download Converted Images (ZIP)",
+                        data=result.read(),
+                        file_name="converted_images.zip",
+                        mime="application/zip"
+                    )
+                    st.success(f"Converted {len(uploaded_files) - len(failures)} of {len(uploaded_files)} images! 🎉")
+            except Exception as e:
+                st.error(f"An error occurred during conversion: {str(e)}")
+
+        # Web image set: JPEG + WebP at several widths from a single decode
+        if not batch_mode and not is_pdf and not is_document and st.button("Generate Web Image Set"):
+            try:
+                with st.spinner("Rendering web images..."):
+                    result = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+                    converter.render_set_to_zip(uploaded_file, result)
+                    result.seek(0)
+                    st.download_button(
+                        label="Download Web Image Set (ZIP)",
+                        data=result.read(),
+                        file_name="web_images.zip",
+                        mime="application/zip"
+                    )
+                    st.success("Web image set ready! 🎉")
+            except Exception as e:
+                st.error(f"An error occurred while rendering: {str(e)}")
+
         # Convert button
-        if st.button("Convert Image", type="primary"):
+        if not batch_mode and st.button("Convert Image", type="primary"):
             try:
                 with st.spinner("Converting your image..."):
+                    extension = target_format.lower()
+                    mime = f"image/{extension}"
+                    options = {"quality": quality}
+                    if is_pdf:
+                        import PyPDF2
+
+                        # Check the range before rendering; several pages come back as a ZIP
+                        selected = parse_page_range(pages, len(PyPDF2.PdfReader(uploaded_file).pages))
+                        uploaded_file.seek(0)
+                        options.update(pages=pages, dpi=int(dpi))
+                        if len(selected) > 1 and extension in RASTER_FORMATS:
+                            extension, mime = "zip", "application/zip"
+
                     # Perform conversion
-                    result = converter.convert(uploaded_file, target_format.lower(), quality=quality)
+                    if is_document:
+                        output = io.BytesIO()
+                        route = get_format_graph().convert(uploaded_file, output, target_format.lower(),
+                                                           quality=quality, dpi=int(dpi))
+                        result = output.getvalue()
+                        st.caption(f"Converted via {' → '.join(fmt.upper() for fmt in route)}")
+                    else:
+                        result = converter.convert(uploaded_file, target_format.lower(), **options)
                     
                     # Download button
                     st.download_button(
                         label="Download Converted Image",
                         data=result,
-                        file_name=f"converted_image.{target_format.lower()}",
-                        mime=f"image/{target_format.lower()}"
+                        file_name=f"converted_image.{extension}",
+                        mime=mime
                     )
                     st.success("Conversion completed successfully! 🎉")
             except Exception as e:
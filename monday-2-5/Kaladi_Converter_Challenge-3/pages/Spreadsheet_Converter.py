@@ -1,5 +1,8 @@
+import io
+import zipfile
 import streamlit as st
 from converters.spreadsheet_converter import SpreadsheetConverter
+from converters.progress import streamlit_progress
 
 # Set page configuration
 st.set_page_config(
@@ -77,8 +80,8 @@ with st.container():
     st.markdown("### Upload Your Spreadsheet")
     uploaded_file = st.file_uploader(
         "Choose a spreadsheet file",
-        type=['xlsx', 'xls', 'csv', 'ods', 'tsv'],
-        help="Supported formats: XLSX, XLS, CSV, ODS, TSV"
+        type=['xlsx', 'xls', 'csv', 'ods', 'tsv', 'parquet', 'feather', 'arrow'],
+        help="Supported formats: XLSX, XLS, CSV, ODS, TSV, Parquet, Feather, Arrow"
     )
     
     if uploaded_file:
@@ -96,7 +99,7 @@ with st.container():
         with col1:
             target_format = st.selectbox(
                 "Select target format",
-                ["XLSX", "XLS", "CSV", "ODS", "TSV"],
+                ["XLSX", "XLS", "CSV", "ODS", "TSV", "PARQUET", "FEATHER", "ARROW"],
                 help="Choose the format you want to convert your spreadsheet to"
             )
         
@@ -115,6 +118,20 @@ with st.container():
             [",", ";", "\t", "|"],
             help="Choose the delimiter for CSV/TSV files"
         ) if target_format in ["CSV", "TSV"] else None
+        engine = st.selectbox(
+            "CSV parsing engine",
+            ["pandas", "pyarrow"],
+            help="pyarrow parses large CSV/TSV files faster and with less memory"
+        ) if uploaded_file.name.lower().endswith(('.csv', '.tsv')) else "pandas"
+        columns = st.text_input(
+            "Columns to keep (optional)",
+            help="Comma-separated column names; leave empty to keep every column"
+        )
+        compression = st.selectbox(
+            "Compression",
+            ["snappy", "zstd", "gzip", "none"] if target_format == "PARQUET" else ["lz4", "zstd", "none"],
+            help="Codec for the columnar output file"
+        ) if target_format in ["PARQUET", "FEATHER", "ARROW"] else None
         
         # Convert button
         if st.button("Convert Spreadsheet", type="primary"):
@@ -126,15 +143,24 @@ with st.container():
                         target_format.lower(),
                         encoding=encoding,
                         include_header=include_header,
-                        delimiter=delimiter
+                        delimiter=delimiter,
+                        engine=engine,
+                        columns=columns or None,
+                        compression=compression,
+                        progress=streamlit_progress(st.progress(0))
                     )
+
+                    # Other formats get a ZIP with one file per sheet for workbooks with several sheets
+                    extension = target_format.lower()
+                    if extension not in ["xlsx", "ods"] and zipfile.is_zipfile(io.BytesIO(result)):
+                        extension = "zip"
                     
                     # Download button
                     st.download_button(
                         label="Download Converted File",
                         data=result,
-                        file_name=f"converted_spreadsheet.{target_format.lower()}",
-                        mime=f"application/{target_format.lower()}"
+                        file_name=f"converted_spreadsheet.{extension}",
+                        mime=f"application/{extension}"
                     )
                     st.success("Conversion completed successfully! 🎉")
             except Exception as e:
@@ -1,5 +1,8 @@
 import streamlit as st
-from converters.video_converter import VideoConverter
+import os
+import time
+from converters.job_queue import get_job_queue
+from converters.video_converter import PRESETS, VideoConverter
 
 # Set page configuration
 st.set_page_config(
@@ -125,36 +128,77 @@ with st.container():
                 ["H.264", "H.265", "VP9"],
                 help="Choose the video codec for encoding"
             )
+
+            preset = st.select_slider(
+                "Encoding speed",
+                options=PRESETS,
+                value="medium",
+                help="Faster presets encode quicker but give larger files for the same quality"
+            )
+
+        threads = st.number_input(
+            "Encoder threads (0 = automatic)",
+            min_value=0,
+            max_value=os.cpu_count() or 1,
+            value=0,
+            help="Files that only change container are copied without re-encoding, whatever these settings"
+        )
+        segments = st.number_input(
+            "Parallel segments (0 = automatic)",
+            min_value=0,
+            max_value=32,
+            value=1,
+            help="Above 1, the video is split at keyframes and the pieces encoded in parallel; 1 encodes in one pass"
+        )
         
-        # Convert button
+        # Convert button: the encode runs on the background job queue so
+        # reruns of this page never block on (or restart) it
         if st.button("Convert Video", type="primary"):
             try:
-                with st.spinner("Converting your video... This may take a few minutes."):
-                    # Show progress bar
-                    progress_bar = st.progress(0)
-                    
-                    # Perform conversion
-                    result = converter.convert(
-                        uploaded_file,
-                        target_format.lower(),
-                        resolution=resolution,
-                        quality=quality,
-                        codec=codec
-                    )
-                    
-                    # Update progress bar
-                    progress_bar.progress(100)
-                    
-                    # Download button
-                    st.download_button(
-                        label="Download Converted Video",
-                        data=result,
-                        file_name=f"converted_video.{target_format.lower()}",
-                        mime=f"video/{target_format.lower()}"
-                    )
-                    st.success("Conversion completed successfully! 🎉")
+                st.session_state.video_job_id = converter.submit(
+                    uploaded_file,
+                    target_format.lower(),
+                    resolution=resolution,
+                    quality=quality,
+                    codec=codec,
+                    preset=preset,
+                    threads=int(threads) or None,
+                    segments=int(segments)
+                )
             except Exception as e:
                 st.error(f"An error occurred during conversion: {str(e)}")
+
+        job_id = st.session_state.get("video_job_id")
+        if job_id:
+            job_queue = get_job_queue()
+            job = job_queue.status(job_id)
+
+            if job is None:
+                st.session_state.pop("video_job_id")
+            elif job["status"] == "failed":
+                st.error(f"An error occurred during conversion: {job['error']}")
+                st.session_state.pop("video_job_id")
+            elif job["status"] == "done":
+                result_path = job_queue.result_path(job_id)
+                if result_path:
+                    st.progress(100)
+                    with open(result_path, 'rb') as result:
+                        # Download button
+                        st.download_button(
+                            label="Download Converted Video",
+                            data=result,
+                            file_name=f"converted_video.{job['output_format']}",
+                            mime=f"video/{job['output_format']}"
+                        )
+                    st.success("Conversion completed successfully! 🎉")
+            else:
+                # Show progress bar and poll the job until it finishes
+                st.progress(int(job["progress"] * 100))
+                for index, fraction in enumerate(job["segments"] or [], start=1):
+                    st.progress(min(1.0, fraction), text=f"Segment {index}")
+                st.info("Converting your video... This may take a few minutes.")
+                time.sleep(1)
+                st.rerun()
     
     st.markdown('</div>', unsafe_allow_html=True)
 
@@ -0,0 +1,43 @@
+import io
+import tarfile
+import zipfile
+
+import pytest
+
+from converters.archive_converter import ArchiveConverter
+
+FILES = {'a.txt': b'hello ' * 1000, 'd/b.bin': bytes(range(256)) * 50}
+
+def _zip():
+    data = io.BytesIO()
+    with zipfile.ZipFile(data, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for name, content in FILES.items():
+            archive.writestr(name, content)
+    data.seek(0)
+    data.name = 'files.zip'
+    return data
+
+@pytest.mark.parametrize("output_format, level", [('gz', "Normal"), ('gz', "Maximum"), ('tar', "Normal"),
+                                                  ('bz2', "Fast")])
+def test_zip_to_tar_keeps_every_file(output_format, level):
+    output = io.BytesIO()
+    ArchiveConverter().convert_stream(_zip(), output, output_format, compression_level=level, workers=1)
+    output.seek(0)
+    with tarfile.open(fileobj=output) as archive:
+        assert {member.name: archive.extractfile(member).read() for member in archive.getmembers()} == FILES
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_tar_to_zip_keeps_every_file(workers):
+    tar_data = io.BytesIO()
+    ArchiveConverter().convert_stream(_zip(), tar_data, 'gz', workers=1)
+    tar_data.seek(0)
+    tar_data.name = 'files.gz'
+    output = io.BytesIO()
+    ArchiveConverter().convert_stream(tar_data, output, 'zip', workers=workers)
+    output.seek(0)
+    with zipfile.ZipFile(output) as archive:
+        assert archive.testzip() is None
+        assert {name: archive.read(name) for name in archive.namelist()} == FILES
+
+def test_zip_to_zip_is_not_offered():
+    assert 'zip' not in ArchiveConverter().supported_formats['zip']
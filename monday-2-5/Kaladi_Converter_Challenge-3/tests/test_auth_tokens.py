@@ -0,0 +1,169 @@
+import json
+import time
+
+import pytest
+import streamlit as st
+
+from converters.auth_tokens import (AUDIENCE, AuthManager, LocalAuthBackend, TokenVerifier, _b64encode,
+                                    encode_hs256)
+
+SECRET = "test-secret"
+
+def _claims(**overrides):
+    now = int(time.time())
+    return {"sub": "user-1", "aud": AUDIENCE, "iat": now, "exp": now + 600, **overrides}
+
+def _unsigned(header, claims, signature=b''):
+    return ".".join([_b64encode(json.dumps(header).encode()), _b64encode(json.dumps(claims).encode()),
+                     _b64encode(signature)])
+
+def test_valid_token_returns_its_claims():
+    claims = _claims()
+    assert TokenVerifier(SECRET).verify(encode_hs256(claims, SECRET)) == claims
+
+def test_token_signed_with_another_secret_is_rejected():
+    with pytest.raises(ValueError, match="Invalid token signature"):
+        TokenVerifier(SECRET).verify(encode_hs256(_claims(), "other-secret"))
+
+def test_tampered_claims_are_rejected():
+    header, _, signature = encode_hs256(_claims(), SECRET).split('.')
+    forged = _b64encode(json.dumps(_claims(sub="admin")).encode())
+    with pytest.raises(ValueError, match="Invalid token signature"):
+        TokenVerifier(SECRET).verify(f"{header}.{forged}.{signature}")
+
+@pytest.mark.parametrize("algorithm", ["none", "None", "HS512", None])
+def test_unsigned_and_unknown_algorithms_are_rejected(algorithm):
+    token = _unsigned({"alg": algorithm, "typ": "JWT"}, _claims())
+    with pytest.raises(ValueError, match="Unsupported token algorithm"):
+        TokenVerifier(SECRET).verify(token)
+
+def test_asymmetric_token_without_a_jwks_is_not_accepted():
+    # An RS256 header must not make the verifier try the shared secret as a public key
+    token = _unsigned({"alg": "RS256", "typ": "JWT"}, _claims(), b'signature')
+    assert TokenVerifier(SECRET).verify(token) is None
+
+@pytest.fixture
+def rsa_jwks():
+    import jwt
+    from cryptography.hazmat.primitives.asymmetric import rsa
+
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    public = json.loads(jwt.algorithms.RSAAlgorithm.to_jwk(key.public_key()))
+    jwks_url = f"https://example.invalid/{id(key)}/jwks"
+    verifier = TokenVerifier(jwks_url=jwks_url, jwks_fetcher=lambda url: {"keys": [{**public, "kid": "k1"}]})
+    return key, verifier
+
+def test_rs256_token_is_checked_against_the_jwks(rsa_jwks):
+    import jwt
+
+    key, verifier = rsa_jwks
+    assert verifier.verify(jwt.encode(_claims(), key, algorithm="RS256", headers={"kid": "k1"}))['sub'] == "user-1"
+
+def test_rs256_token_from_an_unknown_key_is_rejected(rsa_jwks):
+    import jwt
+    from cryptography.hazmat.primitives.asymmetric import rsa
+
+    _, verifier = rsa_jwks
+    other = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    with pytest.raises(ValueError, match="Unknown signing key: k2"):
+        verifier.verify(jwt.encode(_claims(), other, algorithm="RS256", headers={"kid": "k2"}))
+    with pytest.raises(ValueError, match="Invalid token"):
+        verifier.verify(jwt.encode(_claims(), other, algorithm="RS256", headers={"kid": "k1"}))
+
+def test_hs256_token_without_a_secret_is_not_accepted():
+    assert TokenVerifier(jwks_url="https://example.invalid/jwks").verify(encode_hs256(_claims(), SECRET)) is None
+
+def test_expired_token_is_rejected():
+    now = time.time()
+    token = encode_hs256(_claims(exp=int(now) - 120), SECRET)
+    with pytest.raises(ValueError, match="Token has expired"):
+        TokenVerifier(SECRET, leeway=30).verify(token, now=now)
+
+def test_token_without_expiry_is_rejected():
+    claims = _claims()
+    del claims['exp']
+    with pytest.raises(ValueError, match="Token has expired"):
+        TokenVerifier(SECRET).verify(encode_hs256(claims, SECRET))
+
+def test_expiry_within_the_leeway_is_accepted():
+    now = time.time()
+    token = encode_hs256(_claims(exp=int(now) - 10), SECRET)
+    assert TokenVerifier(SECRET, leeway=30).verify(token, now=now)['sub'] == "user-1"
+
+def test_token_not_valid_yet_is_rejected():
+    now = time.time()
+    token = encode_hs256(_claims(nbf=int(now) + 120), SECRET)
+    with pytest.raises(ValueError, match="Token is not valid yet"):
+        TokenVerifier(SECRET, leeway=30).verify(token, now=now)
+
+@pytest.mark.parametrize("audience", ["anon", ["service_role"], None])
+def test_token_for_another_audience_is_rejected(audience):
+    with pytest.raises(ValueError, match="Token is for another audience"):
+        TokenVerifier(SECRET).verify(encode_hs256(_claims(aud=audience), SECRET))
+
+def test_audience_list_containing_ours_is_accepted():
+    token = encode_hs256(_claims(aud=["other", AUDIENCE]), SECRET)
+    assert TokenVerifier(SECRET).verify(token)['sub'] == "user-1"
+
+def test_malformed_token_is_rejected():
+    with pytest.raises(ValueError, match="Malformed token"):
+        TokenVerifier(SECRET).verify("not-a-token")
+
+def test_local_backend_issues_tokens_the_verifier_accepts():
+    backend = LocalAuthBackend(SECRET)
+    user = backend.sign_up("a@example.com", "pw").user
+    session = backend.sign_in("a@example.com", "pw").session
+    assert TokenVerifier(SECRET).verify(session.access_token)['sub'] == user.id
+    with pytest.raises(ValueError, match="Invalid login credentials"):
+        backend.sign_in("a@example.com", "wrong")
+
+def test_local_refresh_token_works_once():
+    backend = LocalAuthBackend(SECRET)
+    backend.sign_up("a@example.com", "pw")
+    refresh_token = backend.sign_in("a@example.com", "pw").session.refresh_token
+    assert backend.refresh(refresh_token).session.access_token
+    with pytest.raises(ValueError, match="Invalid refresh token"):
+        backend.refresh(refresh_token)
+
+@pytest.fixture
+def signed_in():
+    st.session_state.clear()
+    backend = LocalAuthBackend(SECRET, token_ttl=600)
+    backend.sign_up("a@example.com", "pw")
+    auth = AuthManager(backend, TokenVerifier(SECRET))
+    assert auth.sign_in("a@example.com", "pw")
+    backend.remote_calls = 0
+    yield auth
+    st.session_state.clear()
+
+def test_fresh_session_is_checked_without_the_server(signed_in):
+    user = signed_in.get_current_user()
+    assert user.email == "a@example.com"
+    assert signed_in.backend.remote_calls == 0
+
+def test_token_near_expiry_is_refreshed(signed_in):
+    old_refresh = st.session_state.auth_session['refresh_token']
+    st.session_state.auth_session['expires_at'] = time.time() + 5
+    assert signed_in.get_current_user().email == "a@example.com"
+    assert signed_in.backend.remote_calls == 1
+    assert st.session_state.auth_session['refresh_token'] != old_refresh
+    assert st.session_state.auth_session['expires_at'] > time.time() + 60
+    assert TokenVerifier(SECRET).verify(st.session_state.auth_session['access_token'])
+
+def test_failed_refresh_signs_the_user_out(signed_in):
+    st.session_state.auth_session['expires_at'] = time.time() + 5
+    st.session_state.auth_session['refresh_token'] = "revoked"
+    assert signed_in.get_current_user() is None
+    assert 'auth_session' not in st.session_state
+    assert 'user' not in st.session_state
+
+def test_forged_session_token_signs_the_user_out(signed_in):
+    st.session_state.auth_session['access_token'] = encode_hs256(_claims(), "other-secret")
+    assert signed_in.get_current_user() is None
+    assert 'auth_session' not in st.session_state
+
+def test_token_without_a_local_key_is_checked_remotely_once(signed_in):
+    signed_in.verifier = TokenVerifier()
+    assert signed_in.get_current_user().email == "a@example.com"
+    assert signed_in.get_current_user().email == "a@example.com"
+    assert signed_in.backend.remote_calls == 1
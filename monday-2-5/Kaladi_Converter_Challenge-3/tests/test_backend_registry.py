@@ -0,0 +1,26 @@
+from converters.backend_registry import BackendRegistry
+
+def test_transient_failure_does_not_promote_a_lower_tier():
+    registry = BackendRegistry()
+    registry.register("LibreOffice")
+    registry.register("reportlab", tier=1)
+    registry.record("LibreOffice", False, 1.0)
+    for _ in range(5):
+        registry.record("reportlab", True, 0.1)
+    assert registry.ordered() == ["LibreOffice", "reportlab"]
+
+def test_health_orders_backends_within_a_tier():
+    registry = BackendRegistry()
+    registry.register("docx2pdf")
+    registry.register("LibreOffice")
+    registry.record("docx2pdf", False, 1.0)
+    registry.record("LibreOffice", True, 1.0)
+    assert registry.ordered() == ["LibreOffice", "docx2pdf"]
+
+def test_resting_backend_is_skipped():
+    registry = BackendRegistry(failure_limit=2)
+    registry.register("LibreOffice")
+    registry.register("reportlab", tier=1)
+    registry.record("LibreOffice", False, 1.0)
+    registry.record("LibreOffice", False, 1.0)
+    assert registry.ordered() == ["reportlab"]
@@ -0,0 +1,124 @@
+import pytest
+
+from converters.credit_ledger import BalanceCache, CreditLedger, SQLiteBackend
+
+FREE_LIMIT = 5
+
+class RacingBackend:
+    """Lets another session spend `steals` credits just before each of this session's first updates."""
+
+    def __init__(self, backend, steals=1):
+        self.backend = backend
+        self.steals = steals
+        self.attempts = 0
+
+    def fetch(self, user_id):
+        return self.backend.fetch(user_id)
+
+    def insert(self, row):
+        return self.backend.insert(row)
+
+    def compare_and_set(self, user_id, expected, values, privileged=False):
+        self.attempts += 1
+        if self.steals:
+            self.steals -= 1
+            row = self.backend.fetch(user_id)
+            self.backend.compare_and_set(user_id, {}, {"paid_credits": row['paid_credits'] - 1})
+        return self.backend.compare_and_set(user_id, expected, values, privileged)
+
+class FailingBackend(RacingBackend):
+    def compare_and_set(self, user_id, expected, values, privileged=False):
+        raise ConnectionError("connection reset")
+
+def _ledger(backend=None, free_used=0, paid=0):
+    backend = backend or SQLiteBackend()
+    target = getattr(backend, 'backend', backend)
+    target.insert({"id": "user", "email": "u@example.com", "free_credits_used": free_used, "paid_credits": paid})
+    return CreditLedger(backend, FREE_LIMIT, cache=BalanceCache())
+
+def _stored(ledger):
+    backend = getattr(ledger.backend, 'backend', ledger.backend)
+    row = backend.fetch("user")
+    return row['free_credits_used'], row['paid_credits']
+
+def test_reserve_takes_free_credits_first():
+    ledger = _ledger(free_used=3, paid=4)
+    assert ledger.reserve("user", None, 3) == {"free": 2, "paid": 1}
+    assert _stored(ledger) == (5, 3)
+
+def test_reserve_beyond_the_balance_is_refused_and_takes_nothing():
+    ledger = _ledger(free_used=4, paid=1)
+    with pytest.raises(ValueError, match="Not enough credits: 3 needed, 2 left"):
+        ledger.reserve("user", None, 3)
+    assert _stored(ledger) == (4, 1)
+
+def test_empty_balance_says_no_credits_left():
+    ledger = _ledger(free_used=FREE_LIMIT, paid=0)
+    with pytest.raises(ValueError, match="No credits left"):
+        ledger.reserve("user", None, 1)
+
+def test_refusal_is_checked_against_a_fresh_balance():
+    ledger = _ledger(free_used=FREE_LIMIT, paid=0)
+    ledger.balance("user")
+    # Credits bought in another process while this one's cached row still says zero
+    ledger.backend.compare_and_set("user", {}, {"paid_credits": 2})
+    assert ledger.reserve("user", None, 2) == {"free": 0, "paid": 2}
+
+def test_conflicting_update_is_retried_on_the_new_row():
+    backend = RacingBackend(SQLiteBackend(), steals=2)
+    ledger = _ledger(backend, free_used=FREE_LIMIT, paid=10)
+    ledger.balance("user")
+    assert ledger.reserve("user", None, 3) == {"free": 0, "paid": 3}
+    assert backend.attempts == 3
+    # Both credits the other session took and the three reserved here are gone
+    assert _stored(ledger) == (FREE_LIMIT, 5)
+
+def test_row_that_keeps_changing_gives_up():
+    backend = RacingBackend(SQLiteBackend(), steals=100)
+    ledger = _ledger(backend, free_used=FREE_LIMIT, paid=100)
+    ledger.retries = 3
+    with pytest.raises(RuntimeError, match="Credits changed"):
+        ledger.reserve("user", None, 1)
+    assert backend.attempts == 3
+
+def test_cache_holds_the_row_written():
+    ledger = _ledger(paid=2)
+    ledger.reserve("user", None, 1)
+    assert ledger.cache.get("user")['free_credits_used'] == 1
+    ledger.add_paid("user", None, 10)
+    assert ledger.cache.get("user")['paid_credits'] == 12
+
+def test_cache_is_invalidated_after_a_lost_update():
+    backend = RacingBackend(SQLiteBackend(), steals=1)
+    ledger = _ledger(backend, free_used=FREE_LIMIT, paid=3)
+    ledger.retries = 1
+    with pytest.raises(RuntimeError):
+        ledger.reserve("user", None, 1)
+    assert ledger.cache.get("user") is None
+    assert ledger.balance("user")['paid_credits'] == 2
+
+def test_cache_is_invalidated_when_the_update_errors():
+    ledger = _ledger(FailingBackend(SQLiteBackend()), paid=3)
+    ledger.balance("user")
+    with pytest.raises(ConnectionError):
+        ledger.reserve("user", None, 1)
+    assert ledger.cache.get("user") is None
+
+def test_expired_cache_entry_is_read_again():
+    cache = BalanceCache(ttl=-1)
+    cache.put("user", {"paid_credits": 1})
+    assert cache.get("user") is None
+
+def test_failed_conversions_are_refunded_paid_credits_first():
+    ledger = _ledger(free_used=3, paid=4)
+    reservation = ledger.reserve("user", None, 4)
+    assert reservation == {"free": 2, "paid": 2}
+    # Three of the four images failed
+    ledger.refund("user", None, reservation, 3)
+    assert _stored(ledger) == (4, 4)
+
+def test_refund_of_the_whole_reservation_restores_the_balance():
+    ledger = _ledger(free_used=1, paid=2)
+    reservation = ledger.reserve("user", None, 6)
+    ledger.refund("user", None, reservation, 6)
+    assert _stored(ledger) == (1, 2)
@@ -0,0 +1,110 @@
+import io
+import os
+
+import pytest
+
+from converters import format_router
+from converters.format_router import MAX_HOPS, FormatGraph
+
+class FakeConverter:
+    """Appends '>format' to its input, remembering the readers and options it was given."""
+
+    def __init__(self, supported_formats, fail_on=None):
+        self.supported_formats = supported_formats
+        self.fail_on = fail_on
+        self.calls = []
+
+    def convert_stream(self, reader, writer, output_format, dpi=None, progress=None):
+        self.calls.append((getattr(reader, 'name', None), output_format, dpi))
+        if output_format == self.fail_on:
+            raise ValueError(f"cannot write {output_format}")
+        writer.write(reader.read() + f">{output_format}".encode())
+
+def _graph(*converters):
+    graph = FormatGraph()
+    for converter in converters:
+        graph.add_converter(converter)
+    return graph
+
+def _reader(data, name):
+    reader = io.BytesIO(data)
+    reader.name = name
+    return reader
+
+# Enough of a DOCX for the magic-byte check
+DOCX = b'PK\x03\x04' + b'\x00' * 26 + b'word/document.xml'
+
+DOCUMENTS = FakeConverter({'docx': ['pdf', 'txt'], 'txt': ['pdf']})
+IMAGES = FakeConverter({'pdf': ['png'], 'png': ['jpg']})
+
+def test_shortest_route_is_chosen():
+    graph = _graph(DOCUMENTS, IMAGES)
+    assert graph.route('docx', 'png') == ['docx', 'pdf', 'png']
+    assert graph.route('docx', 'jpg') == ['docx', 'pdf', 'png', 'jpg']
+
+def test_measured_costs_change_the_route():
+    graph = _graph(FakeConverter({'a': ['b', 'c'], 'b': ['d'], 'c': ['d']}))
+    graph.record('a', 'b', 50.0, 1)
+    assert graph.route('a', 'd') == ['a', 'c', 'd']
+
+def test_same_format_needs_no_conversion():
+    assert _graph(DOCUMENTS).route('docx', 'docx') == ['docx']
+
+def test_unreachable_pair_is_rejected():
+    with pytest.raises(ValueError, match="No conversion route from png to docx"):
+        _graph(DOCUMENTS, IMAGES).route('png', 'docx')
+
+def test_route_longer_than_max_hops_is_rejected():
+    chain = [f"f{i}" for i in range(MAX_HOPS + 2)]
+    graph = _graph(FakeConverter({source: [target] for source, target in zip(chain, chain[1:])}))
+    assert len(graph.route(chain[0], chain[MAX_HOPS])) == MAX_HOPS + 1
+    with pytest.raises(ValueError, match="No conversion route"):
+        graph.route(chain[0], chain[MAX_HOPS + 1])
+
+def test_convert_runs_every_hop_and_passes_accepted_options():
+    documents = FakeConverter({'docx': ['pdf']})
+    images = FakeConverter({'pdf': ['png']})
+    writer = io.BytesIO()
+    progress = []
+    route = _graph(documents, images).convert(_reader(DOCX, 'report.docx'), writer, 'png', dpi=150,
+                                               quality=90, progress=progress.append)
+    assert route == ['docx', 'pdf', 'png']
+    assert writer.getvalue() == DOCX + b'>pdf>png'
+    # Intermediate files keep their format's extension so the next converter can read the name
+    assert images.calls[0][0].endswith('.pdf')
+    assert (documents.calls[0][2], images.calls[0][2]) == (150, 150)
+    assert progress[-1]['unit'] == 'steps' and progress[-1]['done'] == 2
+
+def test_intermediate_files_are_deleted(monkeypatch):
+    created = []
+    named_temporary_file = format_router.tempfile.NamedTemporaryFile
+
+    def tracking(*args, **kwargs):
+        temp_file = named_temporary_file(*args, **kwargs)
+        created.append(temp_file.name)
+        return temp_file
+
+    monkeypatch.setattr(format_router.tempfile, "NamedTemporaryFile", tracking)
+    _graph(DOCUMENTS, IMAGES).convert(_reader(DOCX, 'report.docx'), io.BytesIO(), 'jpg')
+    assert len(created) == 2
+    assert not any(os.path.exists(path) for path in created)
+
+def test_intermediate_files_are_deleted_when_a_hop_fails(monkeypatch):
+    created = []
+    named_temporary_file = format_router.tempfile.NamedTemporaryFile
+
+    def tracking(*args, **kwargs):
+        temp_file = named_temporary_file(*args, **kwargs)
+        created.append(temp_file.name)
+        return temp_file
+
+    monkeypatch.setattr(format_router.tempfile, "NamedTemporaryFile", tracking)
+    graph = _graph(DOCUMENTS, FakeConverter({'pdf': ['png'], 'png': ['jpg']}, fail_on='jpg'))
+    with pytest.raises(ValueError, match="cannot write jpg"):
+        graph.convert(_reader(DOCX, 'report.docx'), io.BytesIO(), 'jpg')
+    assert created and not any(os.path.exists(path) for path in created)
+
+def test_real_graph_routes_documents_to_images_through_pdf():
+    graph = format_router.get_format_graph()
+    assert graph.route('docx', 'png') == ['docx', 'pdf', 'png']
+    assert graph.route('rtf', 'jpg') == ['rtf', 'pdf', 'jpg']
@@ -0,0 +1,47 @@
+import pytest
+
+from converters.formats import resolve_format, sniff_format
+
+SPREADSHEET_FORMATS = ['xlsx', 'xls', 'csv', 'ods', 'tsv', 'parquet', 'feather', 'arrow']
+VIDEO_FORMATS = ['mp4', 'avi', 'mov', 'mkv', 'wmv', 'flv', 'webm', 'mpeg4']
+
+PNG = b'\x89PNG\r\n\x1a\n\x00\x00\x00\rIHDR' + b'\x00' * 32
+BMP = b'BM\x36\x00\x0c\x00\x00\x00\x00\x00\x36\x00\x00\x00(\x00\x00\x00'
+
+@pytest.mark.parametrize("header, declared", [
+    (b'BMW,Audi\n1,2\n', 'csv'),
+    (b'FLV,count\nx,1\n', 'csv'),
+    (b'BZh,col\n1,2\n', 'tsv'),
+    (b'BMI is a ratio\n', 'txt'),
+    (b'ID3 tags are stored at the start of an MP3\n', 'txt'),
+    (b"I'm free to go\n", 'txt'),
+    (b'{"moov": 1}', 'json'),
+])
+def test_text_starting_with_a_short_signature_keeps_its_format(header, declared):
+    assert sniff_format(header) == 'text'
+    assert resolve_format(header, declared, SPREADSHEET_FORMATS + ['txt', 'json']) == declared
+
+def test_real_bmp_is_still_detected():
+    assert sniff_format(BMP) == 'bmp'
+
+def test_misnamed_binary_is_read_as_its_real_format():
+    assert resolve_format(PNG, 'jpg', ['jpg', 'png', 'gif']) == 'png'
+
+def test_binary_content_without_its_signature_is_rejected():
+    with pytest.raises(ValueError, match="does not look like PNG"):
+        resolve_format(b'\x00\x01\x02\x03' * 16, 'png', ['png', 'jpg'])
+
+def test_binary_content_named_as_text_is_rejected():
+    with pytest.raises(ValueError, match="named .csv but its content is PNG"):
+        resolve_format(PNG, 'csv', SPREADSHEET_FORMATS)
+
+@pytest.mark.parametrize("atom", [b'ftyp', b'moov', b'mdat', b'wide', b'free', b'skip'])
+def test_quicktime_top_level_atoms_are_accepted_as_mov(atom):
+    header = b'\x00\x00\x00\x08' + atom + b'\x00\x00\x12\x34' + b'\x00' * 32
+    assert sniff_format(header) == 'isobmff'
+    assert resolve_format(header, 'mov', VIDEO_FORMATS) == 'mov'
+
+def test_container_member_named_as_another_member_is_taken_at_its_word():
+    header = b'PK\x03\x04' + b'\x00' * 26 + b'xl/workbook.xml'
+    assert resolve_format(header, 'xlsx', SPREADSHEET_FORMATS) == 'xlsx'
+    assert resolve_format(header, 'xls', SPREADSHEET_FORMATS) == 'xlsx'
@@ -0,0 +1,10 @@
+import io
+
+from converters.image_converter import ImageConverter
+
+def test_pdf_input_reaches_the_rasterizer():
+    reader = io.BytesIO(b'%PDF-1.4\n1 0 obj\n<<>>\nendobj\n')
+    reader.name = 'scan.pdf'
+    converter = ImageConverter()
+    assert converter._get_input_format(reader) == 'pdf'
+    assert {'png', 'jpg'} <= set(converter.supported_formats['pdf'])
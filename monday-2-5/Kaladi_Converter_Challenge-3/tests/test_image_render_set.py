@@ -0,0 +1,38 @@
+import io
+
+import pytest
+from PIL import Image
+
+from converters.image_converter import ImageConverter, WEB_RENDITIONS
+
+def _encoded(image, fmt, **params):
+    data = io.BytesIO()
+    image.save(data, format=fmt, **params)
+    data.seek(0)
+    data.name = f"photo.{fmt.lower()}"
+    return data
+
+def _sizes(reader):
+    return {name: Image.open(io.BytesIO(data)).size for name, data in ImageConverter().render_set(reader, WEB_RENDITIONS)}
+
+@pytest.mark.parametrize("image, fmt", [
+    (Image.new('RGB', (4000, 2000), 'red').quantize(), 'GIF'),
+    (Image.new('1', (4000, 2000), 1), 'PNG'),
+])
+def test_palette_and_bilevel_images_are_downscaled(image, fmt):
+    sizes = _sizes(_encoded(image, fmt))
+    assert sizes['photo_480w.jpg'] == (480, 240)
+    assert sizes['photo_1920w.webp'] == (1920, 960)
+
+def test_transparent_palette_image_keeps_its_alpha():
+    reader = _encoded(Image.new('P', (2000, 1000)), 'PNG', transparency=0)
+    renditions = dict(ImageConverter().render_set(reader, [{'format': 'png', 'width': 500}]))
+    assert Image.open(io.BytesIO(renditions['photo_500w.png'])).mode == 'RGBA'
+
+def test_exif_rotated_photo_is_output_upright():
+    image = Image.new('RGB', (3000, 4000), 'blue')
+    exif = image.getexif()
+    exif[0x0112] = 6  # stored sideways, displayed rotated 90 degrees
+    sizes = _sizes(_encoded(image, 'JPEG', exif=exif.tobytes()))
+    assert sizes['photo_1920w.jpg'] == (1920, 1440)
+    assert sizes['photo_480w.webp'] == (480, 360)
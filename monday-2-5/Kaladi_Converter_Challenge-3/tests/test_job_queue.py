@@ -0,0 +1,103 @@
+import io
+import os
+import sqlite3
+import threading
+import time
+
+from converters import job_queue
+from converters.job_queue import DB_NAME, FAILED, QUEUED, RUNNING, JobQueue, _connect, _progress_writer
+from converters.spreadsheet_converter import SpreadsheetConverter
+
+OLD_SCHEMA = """
+CREATE TABLE jobs (
+    id TEXT PRIMARY KEY, converter TEXT NOT NULL, input_path TEXT NOT NULL, output_format TEXT NOT NULL,
+    options TEXT NOT NULL, status TEXT NOT NULL, progress REAL NOT NULL DEFAULT 0, output_path TEXT,
+    error TEXT, worker_pid INTEGER, created_at REAL NOT NULL, updated_at REAL NOT NULL
+);
+"""
+
+def _insert_running_job(db_path, job_id):
+    conn = _connect(db_path)
+    conn.execute(
+        "INSERT INTO jobs (id, converter, input_path, output_format, options, status, created_at, updated_at) "
+        "VALUES (?, 'm:C', 'in', 'mp4', '{}', ?, ?, ?)", (job_id, RUNNING, time.time(), time.time())
+    )
+    return conn
+
+def test_segment_progress_is_recorded_and_returned(tmp_path):
+    queue = JobQueue(str(tmp_path))
+    conn = _insert_running_job(queue.db_path, "job")
+    reporter = _progress_writer(conn, "job")
+    reporter.interval = 0
+    reporter.total = 30
+    reporter.update(15, segments=[1.0, 0.5, 0.0])
+    status = queue.status("job")
+    assert status["progress"] == 0.5
+    assert status["segments"] == [1.0, 0.5, 0.0]
+
+def test_plain_progress_has_no_segments(tmp_path):
+    queue = JobQueue(str(tmp_path))
+    conn = _insert_running_job(queue.db_path, "job")
+    reporter = _progress_writer(conn, "job")
+    reporter.total = 10
+    reporter.update(5)
+    assert queue.status("job")["segments"] is None
+
+def test_existing_job_database_gains_the_segments_column(tmp_path):
+    with sqlite3.connect(os.path.join(tmp_path, DB_NAME)) as conn:
+        conn.executescript(OLD_SCHEMA)
+    queue = JobQueue(str(tmp_path))
+    _insert_running_job(queue.db_path, "job")
+    assert queue.status("job")["segments"] is None
+
+def _csv(data=b'a,b\n1,2\n'):
+    reader = io.BytesIO(data)
+    reader.name = 'table.csv'
+    return reader
+
+def _fail(db_path, job_id):
+    conn = _connect(db_path)
+    conn.execute("UPDATE jobs SET status = ? WHERE id = ?", (FAILED, job_id))
+    conn.close()
+
+def test_resubmitting_a_failed_job_does_not_reset_a_claim_made_meanwhile(tmp_path, monkeypatch):
+    queue = JobQueue(str(tmp_path), workers=0)
+    job_id = queue.submit(SpreadsheetConverter(), _csv(), 'xlsx')
+    _fail(queue.db_path, job_id)
+    os.unlink(os.path.join(tmp_path, "inputs", f"{job_id}.csv"))
+    copy = job_queue.shutil.copyfileobj
+
+    def copy_while_a_worker_claims_the_job(source, target, length):
+        copy(source, target, length)
+        # Someone else resubmits and a worker picks the job up while this submit copies its input
+        conn = _connect(queue.db_path)
+        conn.execute("UPDATE jobs SET status = ?, worker_pid = ? WHERE id = ?", (RUNNING, os.getpid(), job_id))
+        conn.close()
+
+    monkeypatch.setattr(job_queue.shutil, "copyfileobj", copy_while_a_worker_claims_the_job)
+    assert queue.submit(SpreadsheetConverter(), _csv(), 'xlsx') == job_id
+    assert queue.status(job_id)["status"] == RUNNING
+
+def test_concurrent_resubmits_queue_the_job_once(tmp_path):
+    queue = JobQueue(str(tmp_path), workers=0)
+    job_id = queue.submit(SpreadsheetConverter(), _csv(), 'xlsx')
+    _fail(queue.db_path, job_id)
+    os.unlink(os.path.join(tmp_path, "inputs", f"{job_id}.csv"))
+
+    results, errors = [], []
+
+    def submit():
+        try:
+            results.append(queue.submit(SpreadsheetConverter(), _csv(), 'xlsx'))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=submit) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not errors
+    assert results == [job_id] * 8
+    assert queue.status(job_id)["status"] == QUEUED
+    assert os.listdir(os.path.join(tmp_path, "inputs")) == [f"{job_id}.csv"]
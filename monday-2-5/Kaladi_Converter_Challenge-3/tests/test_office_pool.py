@@ -0,0 +1,50 @@
+import subprocess
+import sys
+import time
+
+import pytest
+
+from converters.office_pool import OfficePool, OfficeWorker
+
+class FakeWorker(OfficeWorker):
+    """An OfficeWorker around a sleeping process; a "conversion" blocks until the process dies."""
+
+    def __init__(self, hang=True):
+        self.process = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(60)"])
+        self.profile_dir = None
+        self.jobs = 0
+        self.timed_out = False
+        self._desktop = object()
+        self.hang = hang
+
+    def _convert(self, input_path, output_path, filter_name):
+        if self.hang:
+            self.process.wait()
+            raise RuntimeError("Binary URP bridge disposed during call")
+        self.jobs += 1
+
+    def is_healthy(self):
+        return not self.timed_out and self.process.poll() is None
+
+    def close(self):
+        self.process.kill()
+        self.process.wait()
+
+def test_hung_conversion_is_killed_at_the_deadline():
+    worker = FakeWorker()
+    started = time.monotonic()
+    with pytest.raises(TimeoutError, match="longer than 0.2s"):
+        worker.convert("in.docx", "out.pdf", timeout=0.2)
+    assert time.monotonic() - started < 5
+    assert worker.process.poll() is not None
+    assert not worker.is_healthy()
+
+def test_pool_replaces_a_worker_that_timed_out(monkeypatch):
+    workers = [FakeWorker(hang=True), FakeWorker(hang=False)]
+    pool = OfficePool(size=1, convert_timeout=0.2)
+    monkeypatch.setattr(pool, "_checkout", lambda: workers.pop(0))
+    with pytest.raises(TimeoutError):
+        pool.convert("in.docx", "out.pdf")
+    pool.convert("in.docx", "out.pdf")
+    assert pool._idle.get_nowait().jobs == 1
+    pool.close()
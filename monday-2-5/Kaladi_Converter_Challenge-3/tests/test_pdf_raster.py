@@ -0,0 +1,66 @@
+import io
+import shutil
+import zipfile
+
+import pytest
+from PIL import Image
+
+from converters.pdf_raster import parse_page_range, rasterize_pdf
+
+needs_poppler = pytest.mark.skipif(shutil.which("pdftoppm") is None, reason="poppler is not installed")
+
+@pytest.mark.parametrize("spec, expected", [
+    ("1", [1]),
+    ("all", [1, 2, 3, 4, 5, 6, 7, 8, 9, 10]),
+    (None, [1, 2, 3, 4, 5, 6, 7, 8, 9, 10]),
+    ("1-3,5", [1, 2, 3, 5]),
+    ("8-", [8, 9, 10]),
+    ("-2", [1, 2]),
+    ("3,1-2, 2", [1, 2, 3]),
+    ("9-40", [9, 10]),
+])
+def test_page_range(spec, expected):
+    assert parse_page_range(spec, 10) == expected
+
+@pytest.mark.parametrize("spec, message", [
+    ("11", "selects no pages"),
+    ("20-30", "selects no pages"),
+    ("0", "Invalid page range: 0"),
+    ("5-3", "Invalid page range: 5-3"),
+    ("two", "Invalid page range: two"),
+    ("1-x", "Invalid page range: 1-x"),
+    ("1;3", "Invalid page range: 1;3"),
+])
+def test_bad_page_range_is_rejected(spec, message):
+    with pytest.raises(ValueError, match=message):
+        parse_page_range(spec, 10)
+
+@pytest.fixture
+def three_page_pdf(tmp_path):
+    from reportlab.pdfgen import canvas
+
+    path = tmp_path / "doc.pdf"
+    pdf = canvas.Canvas(str(path), pagesize=(200, 100))
+    for number in range(1, 4):
+        pdf.drawString(20, 50, f"Page {number}")
+        pdf.showPage()
+    pdf.save()
+    return str(path)
+
+@needs_poppler
+def test_single_page_is_written_as_a_bare_image(three_page_pdf):
+    writer = io.BytesIO()
+    assert rasterize_pdf(three_page_pdf, writer, 'png', pages="2", dpi=72) == 1
+    assert Image.open(io.BytesIO(writer.getvalue())).size == (200, 100)
+
+@needs_poppler
+def test_several_pages_are_written_as_a_zip(three_page_pdf):
+    writer = io.BytesIO()
+    assert rasterize_pdf(three_page_pdf, writer, 'jpg', pages="all", dpi=72, workers=2) == 3
+    with zipfile.ZipFile(io.BytesIO(writer.getvalue())) as archive:
+        assert sorted(archive.namelist()) == ['page_0001.jpg', 'page_0002.jpg', 'page_0003.jpg']
+        assert Image.open(archive.open('page_0003.jpg')).format == 'JPEG'
+
+def test_unsupported_raster_format_is_rejected(three_page_pdf):
+    with pytest.raises(ValueError, match="Unsupported image format: gif"):
+        rasterize_pdf(three_page_pdf, io.BytesIO(), 'gif')
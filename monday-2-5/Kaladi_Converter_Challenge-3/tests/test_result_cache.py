@@ -0,0 +1,34 @@
+import io
+
+from converters.result_cache import ResultCache, content_key
+from converters.spreadsheet_converter import SpreadsheetConverter
+
+TABLE = b'a,b\tc\n1,2\t3\n'
+
+def _named(data, name):
+    reader = io.BytesIO(data)
+    reader.name = name
+    return reader
+
+def test_key_depends_on_the_input_format():
+    converter = SpreadsheetConverter()
+    csv_key = content_key(_named(TABLE, 'data.csv'), converter, 'xlsx', {})
+    tsv_key = content_key(_named(TABLE, 'data.tsv'), converter, 'xlsx', {})
+    assert csv_key != tsv_key
+    assert csv_key == content_key(_named(TABLE, 'other.csv'), converter, 'xlsx', {})
+
+def test_key_leaves_the_reader_where_it_was():
+    reader = _named(TABLE, 'data.csv')
+    content_key(reader, SpreadsheetConverter(), 'xlsx', {})
+    assert reader.tell() == 0
+
+def test_same_bytes_under_another_extension_are_not_served_from_the_cache():
+    converter = SpreadsheetConverter()
+    converter.result_cache = ResultCache()
+    outputs = []
+    for name in ('data.csv', 'data.tsv'):
+        writer = io.BytesIO()
+        from_cache = converter.convert_cached(_named(TABLE, name), writer, 'csv')
+        outputs.append((from_cache, writer.getvalue()))
+    assert [from_cache for from_cache, _ in outputs] == [False, False]
+    assert outputs[0][1] != outputs[1][1]
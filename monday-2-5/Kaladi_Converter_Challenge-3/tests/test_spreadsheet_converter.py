@@ -0,0 +1,61 @@
+import io
+
+import pandas as pd
+import pytest
+
+from converters.spreadsheet_converter import SpreadsheetConverter
+
+def _workbook(fmt, sheets):
+    data = io.BytesIO()
+    with pd.ExcelWriter(data, engine='odf' if fmt == 'ods' else 'openpyxl') as workbook:
+        for name, df in sheets.items():
+            df.to_excel(workbook, sheet_name=name, index=False)
+    data.seek(0)
+    data.name = f"book.{fmt}"
+    return data
+
+@pytest.mark.parametrize("input_format, output_format", [('xlsx', 'ods'), ('ods', 'xlsx'), ('xlsx', 'xlsx')])
+def test_multi_sheet_workbook_keeps_its_sheets(input_format, output_format):
+    sheets = {'Prices': pd.DataFrame({'item': ['a', 'b'], 'price': [1, 2]}),
+              'Stock': pd.DataFrame({'item': ['a'], 'count': [7]})}
+    output = io.BytesIO()
+    SpreadsheetConverter().convert_stream(_workbook(input_format, sheets), output, output_format)
+    output.seek(0)
+    result = pd.read_excel(output, sheet_name=None, engine='odf' if output_format == 'ods' else None)
+    assert list(result) == ['Prices', 'Stock']
+    for name, df in sheets.items():
+        pd.testing.assert_frame_equal(result[name], df)
+
+def test_csv_to_ods_writes_one_sheet():
+    reader = io.BytesIO(b'a,b\n1,2\n3,4\n')
+    reader.name = 'table.csv'
+    output = io.BytesIO()
+    SpreadsheetConverter().convert_stream(reader, output, 'ods')
+    output.seek(0)
+    result = pd.read_excel(output, sheet_name=None, engine='odf')
+    assert list(result) == ['Sheet1']
+    assert result['Sheet1'].values.tolist() == [[1, 2], [3, 4]]
+
+@pytest.mark.parametrize("output_format", ['xlsx', 'ods'])
+def test_single_table_output_sheet_is_named_sheet1(output_format):
+    reader = io.BytesIO(b'a,b\n1,2\n')
+    reader.name = 'table.csv'
+    output = io.BytesIO()
+    SpreadsheetConverter().convert_stream(reader, output, output_format)
+    output.seek(0)
+    assert list(pd.read_excel(output, sheet_name=None, engine='odf' if output_format == 'ods' else None)) == ['Sheet1']
+
+def test_columns_are_pruned_per_sheet():
+    sheets = {'Prices': pd.DataFrame({'item': ['a'], 'price': [1], 'note': ['x']}),
+              'Stock': pd.DataFrame({'item': ['a'], 'count': [7]})}
+    output = io.BytesIO()
+    SpreadsheetConverter().convert_stream(_workbook('xlsx', sheets), output, 'xlsx', columns='item,price')
+    output.seek(0)
+    result = pd.read_excel(output, sheet_name=None)
+    assert list(result['Prices'].columns) == ['item', 'price']
+    assert list(result['Stock'].columns) == ['item']
+
+def test_column_missing_from_every_sheet_is_rejected():
+    sheets = {'Prices': pd.DataFrame({'item': ['a']}), 'Stock': pd.DataFrame({'count': [7]})}
+    with pytest.raises(ValueError, match="Columns not found in any sheet: price"):
+        SpreadsheetConverter().convert_stream(_workbook('xlsx', sheets), io.BytesIO(), 'csv', columns=['item', 'price'])